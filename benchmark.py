@@ -0,0 +1,40 @@
+#! /usr/bin/env python3
+import argparse
+
+from generator.basic_module_generator import BasicModuleGenerator
+from generator.advanced_module_generator import AdvancedModuleGenerator
+from generator.generator import GeneratorConfig
+from generator.records import load_conditions, load_symptoms
+from generator.serializers import benchmark
+from generator.snapshot import load_parsed
+
+
+def generate_modules(symptoms_file, conditions_file, config_file="", basic=False):
+    """Function for generating the modules of parsed conditions in memory."""
+    config = GeneratorConfig()
+    config.config_file = config_file
+    module_generator = BasicModuleGenerator(config) if basic else AdvancedModuleGenerator(config)
+    symptoms = load_symptoms(load_parsed(symptoms_file))
+    conditions = load_conditions(load_parsed(conditions_file))
+    modules = [module_generator.generate_module(condition, symptoms) for condition in conditions.values()]
+    return [module for module in modules if module is not None]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the throughput and output size of the json serializer backends"
+    )
+    parser.add_argument('--symptoms_json', required=True, help="Parsed symptoms")
+    parser.add_argument('--conditions_json', required=True, help="Parsed conditions")
+    parser.add_argument('--config_file', type=str, default="", help="Config file with priors")
+    parser.add_argument('--basic', action='store_true', help="Use the basic module generator")
+    parser.add_argument('--repeat', type=int, default=3, help="Number of runs per backend")
+    args = parser.parse_args()
+
+    modules = generate_modules(args.symptoms_json, args.conditions_json, args.config_file, args.basic)
+    print("%d modules" % len(modules))
+    print("%-8s %-8s %10s %12s %14s" % ("backend", "mode", "seconds", "modules/s", "bytes"))
+    for name, compact, seconds, rate, size in benchmark(modules, args.repeat):
+        print("%-8s %-8s %10.3f %12.1f %14d" % (
+            name, "compact" if compact else "indent", seconds, rate, size
+        ))
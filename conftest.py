@@ -0,0 +1,136 @@
+# fixtures shared by the test modules
+import hashlib
+import json
+
+import pytest
+
+from generator.daemon import GenerationService
+from generator.generator import Generator, GeneratorConfig
+
+
+@pytest.fixture
+def make_row():
+    """Returns a function building a csv row of `size` cells, `cells` mapping a position
+    to its value."""
+    def make(size, cells):
+        row = [""] * size
+        for idx, value in cells.items():
+            row[idx] = value
+        return ",".join(row)
+    return make
+
+
+@pytest.fixture
+def condition_definition():
+    """Returns a function building the parsed definition of appendicitis, stored under
+    `slug`."""
+    def build(slug="appendicitis"):
+        return {
+            "condition_name": "Appendicitis",
+            "condition_slug": slug,
+            "condition_hash": hashlib.sha224(slug.encode("utf-8")).hexdigest(),
+            "condition_description": "description",
+            "condition_remarks": "remarks",
+            "symptoms": {
+                "sharp-abdominal-pain": {"slug": "sharp-abdominal-pain", "probability": 86},
+                "nausea": {"slug": "nausea", "probability": 55},
+            },
+            "sex": {
+                "sex-male": {"name": "Male", "slug": "sex-male", "odds": 1.3},
+                "sex-female": {"name": "Female", "slug": "sex-female", "odds": 0.8},
+            },
+            "age": {},
+            "race": {
+                "race-ethnicity-white": {"name": "White", "slug": "race-ethnicity-white", "odds": 1.1},
+            },
+        }
+    return build
+
+
+@pytest.fixture
+def symptom_definition():
+    """Returns a function building the parsed definition of nausea, stored under `slug`."""
+    def build(slug="nausea"):
+        return {
+            "name": "Nausea",
+            "hash": hashlib.sha224(slug.encode("utf-8")).hexdigest(),
+            "description": "description",
+            "common_causes": {},
+            "sex": {},
+            "age": {
+                "age-75-years": {"name": "75+ years", "slug": "age-75-years", "odds": 0.5},
+            },
+            "race": {},
+        }
+    return build
+
+
+@pytest.fixture
+def as_dicts():
+    """Returns a function turning records, keyed on their slug, into json definitions."""
+    def convert(records):
+        return json.loads(json.dumps({key: value.to_dict() for key, value in records.items()}))
+    return convert
+
+
+@pytest.fixture
+def catalog(condition_definition, symptom_definition):
+    """Returns a function building the parsed symptoms and conditions of a catalog of
+    three symptoms and two conditions, appendicitis and flu."""
+    def build():
+        symptom = symptom_definition()
+        symptom["common_causes"] = {
+            "cause-appendicitis": {"name": "Appendicitis", "slug": "cause-appendicitis", "probability": 12.0}
+        }
+        symptoms = {
+            "nausea": symptom,
+            "sharp-abdominal-pain": symptom_definition("sharp-abdominal-pain"),
+            "fever": symptom_definition("fever"),
+        }
+        flu = condition_definition("flu")
+        flu["symptoms"] = {"fever": {"slug": "fever", "probability": 90}}
+        conditions = {"appendicitis": condition_definition(), "flu": flu}
+        return symptoms, conditions
+    return build
+
+
+@pytest.fixture
+def generate(catalog):
+    """Returns a function generating the modules of the catalog in `output_dir`, with
+    the given config options, which returns their content keyed on file name."""
+    def run(output_dir, **options):
+        symptoms, conditions = catalog()
+        config = GeneratorConfig()
+        config.output_dir = str(output_dir)
+        for key, value in options.items():
+            setattr(config, key, value)
+        Generator(config).generate(symptoms, conditions)
+        return {path.basename: path.read() for path in output_dir.listdir("*.json")}
+    return run
+
+
+@pytest.fixture
+def service(tmpdir, catalog):
+    """Returns a `GenerationService` reading the catalog from json files in `tmpdir`."""
+    symptoms, conditions = catalog()
+    conditions["flu"]["condition_name"] = "Flu"
+    config = GeneratorConfig()
+    config.symptom_file = str(tmpdir.join("symptoms.json"))
+    config.conditions_file = str(tmpdir.join("conditions.json"))
+    tmpdir.join("symptoms.json").write(json.dumps(symptoms))
+    tmpdir.join("conditions.json").write(json.dumps(conditions))
+    config.output_dir = str(tmpdir.join("modules"))
+    return GenerationService(config)
+
+
+@pytest.fixture
+def write_priors():
+    """Returns a function writing a config file of priors in a directory."""
+    def write(directory, appendicitis, male=0.5):
+        filename = directory.join("priors.ini")
+        filename.write(
+            "[Gender]\nsex-male = %s\nsex-female = %s\n[Conditions]\nappendicitis = %s\n"
+            % (male, 1 - male, appendicitis)
+        )
+        return str(filename)
+    return write
@@ -1,18 +1,131 @@
 from collections import OrderedDict
-import hashlib
 from functools import reduce
 import itertools
 
-from .basic_module_generator import ModuleGenerator
-from .helpers import load_config, TransitionStates, prob_val, round_val, AttrKeys
+from .basic_module_generator import ModuleGenerator, INITIAL_STATE, NO_INFECTION_STATE, \
+    ENCOUNTER_END_STATE, TERMINAL_STATE, ENCOUNTER_CODE, SYMPTOM_RANGE, get_history_age_guard, \
+    get_gender_condition, get_race_condition
+from .fragments import shared
+from .helpers import load_config, TransitionStates, round_val, AttrKeys
+from .records import load_condition, load_symptom
+from .registry import slug_hash
+from .schema import RACE_PRIOR_INDEX
+
+
+def get_age_condition(age_key):
+    """Returns the `Age` condition of an age group."""
+    def build():
+        if age_key == "age-1-years":
+            return {
+                "condition_type": "Age",
+                "operator": "<",
+                "unit": "years",
+                "quantity": 1
+            }
+        if age_key == "age-75-years":
+            return {
+                "condition_type": "Age",
+                "operator": ">",
+                "unit": "years",
+                "quantity": 75
+            }
+        parts = age_key.split("-")
+        return {
+            "condition_type": "And",
+            "conditions": [
+                {
+                    "condition_type": "Age",
+                    "operator": ">=",
+                    "unit": "years",
+                    "quantity": int(parts[1])
+                },
+                {
+                    "condition_type": "Age",
+                    "operator": "<=",
+                    "unit": "years",
+                    "quantity": int(parts[2])
+                }
+            ],
+        }
+    return shared(("age", age_key), build)
+
+
+def get_demographic_condition(sex_key, age_key, race):
+    """Returns the condition matching the given sex group, age group and Synthea race.
+
+    A None group is not conditioned on. When a single group is given its condition is
+    returned as is, None when no group is given.
+    """
+    def build():
+        conditions = []
+        if sex_key is not None:
+            conditions.append(get_gender_condition(sex_key))
+        if age_key is not None:
+            conditions.append(get_age_condition(age_key))
+        if race is not None:
+            conditions.append(get_race_condition(race))
+        if len(conditions) == 1:
+            return conditions[0]
+        return {
+            "condition_type": "And",
+            "conditions": conditions
+        }
+    if sex_key is None and age_key is None and race is None:
+        return None
+    return shared(("demographics", sex_key, age_key, race), build)
+
+
+def _num_races(race_indices):
+    # the other race group is split into the native, asian and other Synthea races
+    return sum(
+        3 if AttrKeys.RACE_KEYS[idx] == "race-ethnicity-other" else 1 for idx in race_indices
+    )
 
 
 class AdvancedModuleGenerator(ModuleGenerator):
+    symptom_fields = ("description", "sex", "age", "race")
+
     def __init__(self, config):
         super().__init__(config)
 
-        self.priors = load_config(self.config.config_file)
+        if self.config.priors is not None:
+            self.priors = self.config.priors
+        else:
+            self.priors = load_config(self.config.config_file)
         self.sep_key = '|'
+        # when set, the likelihood tables of `symptom_likelihoods`, which do not depend on
+        # the priors, are kept in this dict and shared by the generators of other priors
+        self.likelihood_cache = None
+
+    def estimate_cost(self, condition, symptoms):
+        """Returns the number of demographic transitions of the module of `condition`.
+
+        The module holds a transition per sex, age and race combination of the condition
+        and, for every symptom with demographic data, per combination of the groups the
+        symptom has data for. A symptom without demographic data has a single transition.
+        """
+        cost = _num_races(range(len(AttrKeys.RACE_KEYS))) * \
+            sum(1 for prob in condition.sex.probs if prob > 0) * \
+            sum(1 for prob in condition.age.probs if prob > 0)
+        for edge in condition.symptoms:
+            symptom = load_symptom(edge.slug, symptoms.get(edge.slug, None), self.symptom_fields)
+            if symptom is None:
+                cost += 1
+                continue
+            cost += (sum(symptom.sex.mask) or 1) * (sum(symptom.age.mask) or 1) * (
+                _num_races(idx for idx, flag in enumerate(symptom.race.mask) if flag) or 1
+            )
+        return cost
+
+    def module_inputs(self, condition, symptoms, fingerprint):
+        inputs = super().module_inputs(condition, symptoms, fingerprint)
+        inputs["priors"] = {
+            "Age": self.priors["Age"],
+            "Gender": self.priors["Gender"],
+            "Race": self.priors["Race"],
+            "Condition": self.priors["Conditions"].get(condition.name.lower()),
+        }
+        return inputs
 
     def generate_module(self, condition, symptoms):
         """
@@ -20,41 +133,31 @@ class AdvancedModuleGenerator(ModuleGenerator):
 
         Parameters
         -----------
-        condition: dict
-            dictionary containing symcat definitions for the condition
+        condition: ConditionRecord
+            symcat definition for the condition (or its parsed dictionary)
         symptoms: dict
-            dictionary containing definitions for symcat symptoms
+            dictionary of symcat symptom definitions (records or parsed dictionaries)
         """
-        if not condition.get("symptoms", None):
+        condition = load_condition(condition)
+        if not condition.symptoms:
             return None
 
         min_symptoms = self.config.min_symptoms
 
-        condition_name = condition.get("condition_name")
-        condition_slug = condition.get("condition_slug")
+        condition_name = condition.name
+        condition_slug = condition.slug
 
         num_symptom_attribute = "count_symptom_%s" % condition_slug
-        history_age_attribute = "age_time_to_the_end"
         node_infection_name = condition_name.replace(" ", "_") + "_Infection"
 
         states = OrderedDict()
 
         # add the initial onset
-        states["Initial"] = {
-            "type": "Initial",
-            "direct_transition": "Check_History_Age_Attribute"
-        }
+        states["Initial"] = INITIAL_STATE
 
-        states["Check_History_Age_Attribute"] = {
-            "type": "Guard",
-            "allow": {
-                "condition_type": "Attribute",
-                "attribute": history_age_attribute,
-                "operator": "<=",
-                "value": 0
-            },
-            "direct_transition": TransitionStates.POTENTIAL_INFECTION
-        }
+        states["Check_History_Age_Attribute"] = get_history_age_guard(
+            TransitionStates.POTENTIAL_INFECTION
+        )
 
         transitions, condition_dict_prob = self.generate_transition_for_sex_race_age(
             condition_name,
@@ -71,17 +174,12 @@ class AdvancedModuleGenerator(ModuleGenerator):
         # add No_Infection node
         # we will end this module if a patient does not catch the condition n
         # consecutive times.
-        states[TransitionStates.NO_INFECTION] = {
-            "type": "Simple",
-            "direct_transition": "TerminalState"
-        }
+        states[TransitionStates.NO_INFECTION] = NO_INFECTION_STATE
 
         # add the Condition state (a ConditionOnset) stage
-        condition_hash = hashlib.sha224(condition.get(
-            "condition_slug").encode("utf-8")).hexdigest()
         condition_code = {
             "system": "sha224",
-            "code": condition_hash,
+            "code": condition.hash,
             "display": condition_name
         }
 
@@ -99,13 +197,7 @@ class AdvancedModuleGenerator(ModuleGenerator):
             "type": "Encounter",
             "encounter_class": "ambulatory",
             "reason": "%s_Infection" % condition_name,
-            "codes": [
-                {
-                    "system": "SNOMED-CT",
-                    "code": "185345009",
-                    "display": "Encounter for symptom"
-                }
-            ],
+            "codes": [ENCOUNTER_CODE],
             "direct_transition": node_infection_name
         }
 
@@ -114,17 +206,16 @@ class AdvancedModuleGenerator(ModuleGenerator):
             "codes": [condition_code],
             "target_encounter": "Doctor_Visit",
             "remarks": [
-                condition.get("condition_description"),
-                condition.get("condition_remarks")
+                condition.description,
+                condition.remarks
             ],
             "direct_transition": next_stage
         }
 
         # now we start to model the symptoms, we use
-        condition_symptoms = condition.get("symptoms")
         keys = [
-            [k, float(condition_symptoms.get(k).get("probability")) * 1 / 100]
-            for k in condition_symptoms.keys()
+            [edge, float(edge.probability) * 1 / 100]
+            for edge in condition.symptoms
         ]
 
         for idx, key in enumerate(keys):
@@ -142,17 +233,17 @@ class AdvancedModuleGenerator(ModuleGenerator):
                     "direct_transition"] = "Simple_Transition_%d" % (keys[0][2] + 1)
 
         for idx in range(len(keys)):
-            curr_symptom = condition_symptoms.get(keys[idx][0])
+            curr_symptom = keys[idx][0]
             probability = keys[idx][1]
             index = keys[idx][2]
-            slug = curr_symptom.get("slug")
+            slug = curr_symptom.slug
             check_on_num_symptoms = False
             if min_symptoms > 0:
                 remaining = len(keys) - idx
                 if remaining <= min_symptoms:
                     check_on_num_symptoms = True
 
-            symptom_definition = symptoms.get(slug, None)
+            symptom_definition = load_symptom(slug, symptoms.get(slug, None), self.symptom_fields)
 
             if idx == len(keys) - 1:
                 next_target = TransitionStates.TARGET_ENCOUNTER_END
@@ -198,18 +289,15 @@ class AdvancedModuleGenerator(ModuleGenerator):
 
             if symptom_definition is None:
                 # a symptom which we dont have a definition for?
-                slug_hash = hashlib.sha224(slug.encode("utf-8")).hexdigest()
+                symptom_hash = slug_hash(slug)
                 symptom_transition = {
                     "type": "Symptom",
                     "symptom": slug,
-                    "range": {
-                        "low": 25,
-                        "high": 50
-                    },
+                    "range": SYMPTOM_RANGE,
                     "condition_codes": [condition_code],
                     "symptom_code": {
                         "system": "sha224",
-                        "code": slug_hash,
+                        "code": symptom_hash,
                         "display": slug
                     },
                     "value_code": {
@@ -237,24 +325,21 @@ class AdvancedModuleGenerator(ModuleGenerator):
             else:
                 symptom_transition = {
                     "type": "Symptom",
-                    "symptom": symptom_definition.get("name"),
-                    "range": {
-                        "low": 25,
-                        "high": 50
-                    },
+                    "symptom": symptom_definition.name,
+                    "range": SYMPTOM_RANGE,
                     "condition_codes": [condition_code],
                     "symptom_code": {
                         "system": "sha224",
-                        "code": symptom_definition.get("hash"),
-                        "display": symptom_definition.get("name")
+                        "code": symptom_definition.hash,
+                        "display": symptom_definition.name
                     },
                     "value_code": {
                         "system": "sha224",
-                        "code": symptom_definition.get("hash"),
-                        "display": "%s (finding)" % symptom_definition.get("name")
+                        "code": symptom_definition.hash,
+                        "display": "%s (finding)" % symptom_definition.name
                     },
                     "remarks": [
-                        symptom_definition.get("description")
+                        symptom_definition.description
                     ],
                     "direct_transition": next_stage
                 }
@@ -276,10 +361,7 @@ class AdvancedModuleGenerator(ModuleGenerator):
             states[simple_transition_name] = simple_transition
             states[symptom_transition_name] = symptom_transition
 
-        states[TransitionStates.TARGET_ENCOUNTER_END] = {
-            "type": "EncounterEnd",
-            "direct_transition": "ConditionEnds"
-        }
+        states[TransitionStates.TARGET_ENCOUNTER_END] = ENCOUNTER_END_STATE
 
         states["ConditionEnds"] = {
             "type": "ConditionEnd",
@@ -287,14 +369,12 @@ class AdvancedModuleGenerator(ModuleGenerator):
             "condition_onset": node_infection_name
         }
 
-        states["TerminalState"] = {
-            "type": "Terminal"
-        }
+        states["TerminalState"] = TERMINAL_STATE
 
-        return {
+        return self.profile.apply({
             "name": condition_name,
             "states": states
-        }
+        })
 
     def generate_transition_for_sex_race_age(self, condition, distribution, next_state, default_state=TransitionStates):
         """Function for defining age-based transitions in the generated PGM module
@@ -303,9 +383,9 @@ class AdvancedModuleGenerator(ModuleGenerator):
             ----------
             condition : str
                 The name of the condition for which the PGM is being generated.
-            distribution : dict
-                Dictionnary containing the odd values associated to each age category,
-                race category, and sex category
+            distribution : ConditionRecord
+                Record whose `records.Demographics` sex, age and race groups hold the
+                probability values associated to each age category, race category, and sex category
             next_state : str
                 The name of the node to transit in case we sample withing the
                 provided distribution
@@ -321,27 +401,10 @@ class AdvancedModuleGenerator(ModuleGenerator):
             """
         transitions = []
         transitions_dict = {}
-        sex_denom = sum([
-            prob_val(
-                distribution.get("sex").get(sex_key).get("odds")
-            ) * self.priors["Gender"][sex_key]
-            for sex_key in AttrKeys.SEX_KEYS
-        ])
-        age_denom = sum([
-            prob_val(
-                distribution.get("age").get(age_key).get("odds")
-            ) * self.priors["Age"][age_key]
-            for age_key in AttrKeys.AGE_KEYS
-        ])
-        race_denom = sum([
-            prob_val(
-                distribution.get("race").get(
-                    "race-ethnicity-other" if race_key in [
-                        "race-ethnicity-asian", "race-ethnicity-native"] else race_key
-                ).get("odds")
-            ) * self.priors["Race"][race_key]
-            for race_key in AttrKeys.RACE_PRIOR_KEYS
-        ])
+        sex_probs = distribution.sex.probs
+        age_probs = distribution.age.probs
+        race_probs = distribution.race.probs
+        sex_denom, age_denom, race_denom = self.get_denominators(distribution)
 
         assert sex_denom >= 0, "the sex denom probability must be greater or equal to 0"
         assert age_denom >= 0, "the age denom probability must be greater or equal to 0"
@@ -361,9 +424,8 @@ class AdvancedModuleGenerator(ModuleGenerator):
         # should I include default transition?
         default_flag = False
 
-        for sex_key in AttrKeys.SEX_KEYS:
-            sex_odds = distribution.get("sex").get(sex_key).get("odds")
-            sex_prob = prob_val(sex_odds)
+        for sex_idx, sex_key in enumerate(AttrKeys.SEX_KEYS):
+            sex_prob = sex_probs[sex_idx]
             if sex_prob <= 0:
                 default_flag = True
                 for age_key in AttrKeys.AGE_KEYS:
@@ -372,14 +434,8 @@ class AdvancedModuleGenerator(ModuleGenerator):
                         transitions_dict[global_key] = 0.0
                 continue
 
-            condition_sex = {
-                "condition_type": "Gender",
-                "gender": "M" if sex_key == "sex-male" else "F"
-            }
-
-            for age_key in AttrKeys.AGE_KEYS:
-                age_odds = distribution.get("age").get(age_key).get("odds")
-                age_prob = prob_val(age_odds)
+            for age_idx, age_key in enumerate(AttrKeys.AGE_KEYS):
+                age_prob = age_probs[age_idx]
                 if age_prob <= 0:
                     default_flag = True
                     for race_key in AttrKeys.RACE_PRIOR_KEYS:
@@ -387,45 +443,8 @@ class AdvancedModuleGenerator(ModuleGenerator):
                         transitions_dict[global_key] = 0.0
                     continue
 
-                if age_key == "age-1-years":
-                    condition_age = {
-                        "condition_type": "Age",
-                        "operator": "<",
-                        "unit": "years",
-                        "quantity": 1
-                    }
-                elif age_key == "age-75-years":
-                    condition_age = {
-                        "condition_type": "Age",
-                        "operator": ">",
-                        "unit": "years",
-                        "quantity": 75
-                    }
-                else:
-                    parts = age_key.split("-")
-                    age_lower = parts[1]
-                    age_upper = parts[2]
-                    condition_age = {
-                        "condition_type": "And",
-                        "conditions": [
-                            {
-                                "condition_type": "Age",
-                                "operator": ">=",
-                                "unit": "years",
-                                "quantity": int(age_lower)
-                            },
-                            {
-                                "condition_type": "Age",
-                                "operator": "<=",
-                                "unit": "years",
-                                "quantity": int(age_upper)
-                            }
-                        ],
-                    }
-
-                for race_key in AttrKeys.RACE_KEYS:
-                    race_odds = distribution.get("race").get(race_key).get("odds")
-                    race_prob = prob_val(race_odds)
+                for race_idx, race_key in enumerate(AttrKeys.RACE_KEYS):
+                    race_prob = race_probs[race_idx]
                     if race_key == "race-ethnicity-other":
                         # split this into three for : NATIVE, "ASIAN" and "OTHER"
                         # according to synthea
@@ -436,18 +455,7 @@ class AdvancedModuleGenerator(ModuleGenerator):
                         ]
                         for race_other in othersVal:
                             race_val, item = race_other
-                            condition_race = {
-                                "condition_type": "Race",
-                                "race": item
-                            }
-                            # do stuff here
-                            conditions = [
-                                condition_sex, condition_age, condition_race
-                            ]
-                            condition_node = {
-                                "condition_type": "And",
-                                "conditions": conditions
-                            }
+                            condition_node = get_demographic_condition(sex_key, age_key, item)
 
                             p_sex_race_age = sex_prob * age_prob * race_prob
                             p_cond_g_sex_race_age = (p_sex_race_age * prior_condition) / (
@@ -478,17 +486,9 @@ class AdvancedModuleGenerator(ModuleGenerator):
                                 ]
                             })
                     else:
-                        condition_race = {
-                            "condition_type": "Race",
-                            "race": distribution.get("race").get(race_key).get("name")
-                        }
-                        conditions = [
-                            condition_sex, condition_age, condition_race
-                        ]
-                        condition_node = {
-                            "condition_type": "And",
-                            "conditions": conditions
-                        }
+                        condition_node = get_demographic_condition(
+                            sex_key, age_key, distribution.race.names[race_idx]
+                        )
 
                         p_sex_race_age = sex_prob * age_prob * race_prob
                         p_cond_g_sex_race_age = (p_sex_race_age * prior_condition) / (
@@ -524,83 +524,115 @@ class AdvancedModuleGenerator(ModuleGenerator):
 
         return transitions, transitions_dict
 
+    def get_denominators(self, distribution):
+        """compute the P(risk_factor) normalization term of each risk factor of a condition
+        """
+        sex_probs = distribution.sex.probs
+        age_probs = distribution.age.probs
+        race_probs = distribution.race.probs
+        sex_denom = sum([
+            sex_probs[sex_idx] * self.priors["Gender"][sex_key]
+            for sex_idx, sex_key in enumerate(AttrKeys.SEX_KEYS)
+        ])
+        age_denom = sum([
+            age_probs[age_idx] * self.priors["Age"][age_key]
+            for age_idx, age_key in enumerate(AttrKeys.AGE_KEYS)
+        ])
+        race_denom = sum([
+            race_probs[RACE_PRIOR_INDEX[race_idx]] * self.priors["Race"][race_key]
+            for race_idx, race_key in enumerate(AttrKeys.RACE_PRIOR_KEYS)
+        ])
+        return sex_denom, age_denom, race_denom
+
     @staticmethod
-    def get_ind_prob_symptom_cond_given_sex(sex_dict, sex_cond_dict, sex_key):
-        """compute P(symptom, condition | sex) for a given sex category
+    def get_ind_prob_symptom_cond(group, cond_group, idx):
+        """compute P(symptom, condition | risk_factor) for the category at position `idx`
+        of a `records.Demographics` group
         """
-        return prob_val(
-            sex_dict.get(sex_key).get("odds")
-        ) * prob_val(
-            sex_cond_dict.get(sex_key).get("odds")
-        )
+        return group.probs[idx] * cond_group.probs[idx]
 
-    def get_prob_symptom_cond_given_sex(self, sex_dict, sex_cond_dict):
+    def get_prob_symptom_cond_given_sex(self, sex_group, sex_cond_group):
         """compute P(symptom, condition | sex) for all sex categories
         """
         return [
-            self.get_ind_prob_symptom_cond_given_sex(
-                sex_dict, sex_cond_dict, sex_key
+            self.get_ind_prob_symptom_cond(
+                sex_group, sex_cond_group, sex_idx
             ) * self.priors["Gender"][sex_key]
-            for sex_key in AttrKeys.SEX_KEYS
+            for sex_idx, sex_key in enumerate(AttrKeys.SEX_KEYS)
         ]
 
-    @staticmethod
-    def get_ind_prob_symptom_cond_given_age(age_dict, age_cond_dict, age_key):
-        """compute P(symptom, condition | age) for a given age category
-        """
-        return prob_val(
-            age_dict.get(age_key).get("odds")
-        ) * prob_val(
-            age_cond_dict.get(age_key).get("odds")
-        )
-
-    def get_prob_symptom_cond_given_age(self, age_dict, age_cond_dict):
+    def get_prob_symptom_cond_given_age(self, age_group, age_cond_group):
         """compute P(symptom, condition | age) for all age categories
         """
         return [
-            self.get_ind_prob_symptom_cond_given_age(
-                age_dict, age_cond_dict, age_key
+            self.get_ind_prob_symptom_cond(
+                age_group, age_cond_group, age_idx
             ) * self.priors["Age"][age_key]
-            for age_key in AttrKeys.AGE_KEYS
+            for age_idx, age_key in enumerate(AttrKeys.AGE_KEYS)
         ]
 
-    @staticmethod
-    def get_ind_prob_symptom_cond_given_race(race_dict, race_cond_dict, race_key):
-        """compute P(symptom, condition | race) for a given race category
-        """
-        return prob_val(
-            race_dict.get(
-                "race-ethnicity-other" if race_key in [
-                    "race-ethnicity-asian", "race-ethnicity-native"] else race_key
-            ).get("odds")
-        ) * prob_val(
-            race_cond_dict.get(
-                "race-ethnicity-other" if race_key in [
-                    "race-ethnicity-asian", "race-ethnicity-native"] else race_key
-            ).get("odds")
-        )
-
-    def get_prob_symptom_cond_given_race(self, race_dict, race_cond_dict):
+    def get_prob_symptom_cond_given_race(self, race_group, race_cond_group):
         """compute P(symptom, condition | race) for all race categories
         """
         return [
-            self.get_ind_prob_symptom_cond_given_race(
-                race_dict, race_cond_dict, race_key
+            self.get_ind_prob_symptom_cond(
+                race_group, race_cond_group, RACE_PRIOR_INDEX[race_idx]
             ) * self.priors["Race"][race_key]
-            for race_key in AttrKeys.RACE_PRIOR_KEYS
+            for race_idx, race_key in enumerate(AttrKeys.RACE_PRIOR_KEYS)
         ]
 
+    def symptom_likelihoods(self, condition_definition, symptom_definition):
+        """compute P(symptom, condition | sex, age, race) for every combination of the
+        sex, age and race categories
+
+        The table does not depend on the priors. It is computed once per condition and
+        symptom when `likelihood_cache` is set.
+        """
+        key = None
+        if self.likelihood_cache is not None:
+            key = (condition_definition.slug, symptom_definition.slug)
+            cross_product = self.likelihood_cache.get(key)
+            if cross_product is not None:
+                return cross_product
+
+        # compute P(symptom, condition | risk_factor) / risk_factor_demom
+        sex_numerator = [
+            self.get_ind_prob_symptom_cond(
+                symptom_definition.sex, condition_definition.sex, sex_idx
+            )
+            for sex_idx in range(len(AttrKeys.SEX_KEYS))
+        ]
+        age_numerator = [
+            self.get_ind_prob_symptom_cond(
+                symptom_definition.age, condition_definition.age, age_idx
+            )  # / age_denom if age_denom > 0 else 0.0
+            for age_idx in range(len(AttrKeys.AGE_KEYS))
+        ]
+        race_numerator = [
+            self.get_ind_prob_symptom_cond(
+                symptom_definition.race, condition_definition.race, race_idx
+            )  # / race_denom if race_denom > 0 else 0.0
+            for race_idx in RACE_PRIOR_INDEX
+        ]
+
+        # compute cross product of risk_factor numerators
+        cross_product = [
+            reduce((lambda x, y: x * y), element)
+            for element in itertools.product(sex_numerator, age_numerator, race_numerator)
+        ]
+        if key is not None:
+            self.likelihood_cache[key] = cross_product
+        return cross_product
+
     def get_symptom_stats_infos(self, condition_definition, symptom_definition, probability, condition_proba):
         """Function for getting stats info from a symptom given a condition and priors on risks factors
 
         Parameters
         ----------
         condition_definition : dict
-            Dictionnary containing the odd values associated to each age category,
-            race category, and sex category
+            `ConditionRecord` holding the demographic groups of the condition
         symptom_definition : dict
-            Dictionary containing all the symptoms of the database
-            with their related characteristics.
+            `SymptomRecord` holding the demographic groups of the symptom
         probability: float
             The absolute probablity value of the symtom given the cuurent condition.
         condition_proba : dict
@@ -613,13 +645,13 @@ class AdvancedModuleGenerator(ModuleGenerator):
             the condition prior value that gurantee non negative symptom probability values
         """
 
-        sex_cond_dict = condition_definition.get("sex", {})
-        race_cond_dict = condition_definition.get("race", {})
-        age_cond_dict = condition_definition.get("age", {})
+        sex_cond_dict = condition_definition.sex
+        race_cond_dict = condition_definition.race
+        age_cond_dict = condition_definition.age
 
-        sex_dict = symptom_definition.get("sex", {})
-        race_dict = symptom_definition.get("race", {})
-        age_dict = symptom_definition.get("age", {})
+        sex_dict = symptom_definition.sex
+        race_dict = symptom_definition.race
+        age_dict = symptom_definition.age
 
         sex_prob_values = self.get_prob_symptom_cond_given_sex(
             sex_dict, sex_cond_dict
@@ -632,43 +664,19 @@ class AdvancedModuleGenerator(ModuleGenerator):
         )
         sex_denom = sum(
             sex_prob_values
-        ) if (len(sex_dict) > 0 and len(sex_cond_dict) > 0) else 1
+        ) if (sex_dict.has_data and sex_cond_dict.has_data) else 1
         age_denom = sum(
             age_prob_values
-        ) if (len(age_dict) > 0 and len(age_cond_dict) > 0) else 1
+        ) if (age_dict.has_data and age_cond_dict.has_data) else 1
         race_denom = sum(
             race_prob_values
-        ) if (len(race_dict) > 0 and len(race_cond_dict) > 0) else 1
+        ) if (race_dict.has_data and race_cond_dict.has_data) else 1
 
         assert sex_denom >= 0, "the sex denom probability must be greater or equal to 0"
         assert age_denom >= 0, "the age denom probability must be greater or equal to 0"
         assert race_denom >= 0, "the race denom probability must be greater or equal to 0"
 
-        # compute P(symptom, condition | risk_factor) / risk_factor_demom
-        sex_numerator = [
-            self.get_ind_prob_symptom_cond_given_sex(
-                sex_dict, sex_cond_dict, sex_key
-            )
-            for sex_key in AttrKeys.SEX_KEYS
-        ]
-        age_numerator = [
-            self.get_ind_prob_symptom_cond_given_age(
-                age_dict, age_cond_dict, age_key
-            )  # / age_denom if age_denom > 0 else 0.0
-            for age_key in AttrKeys.AGE_KEYS
-        ]
-        race_numerator = [
-            self.get_ind_prob_symptom_cond_given_race(
-                race_dict, race_cond_dict, race_key
-            )  # / race_denom if race_denom > 0 else 0.0
-            for race_key in AttrKeys.RACE_PRIOR_KEYS
-        ]
-
-        # compute cross product of risk_factor numerators
-        cross_product = [
-            reduce((lambda x, y: x * y), element)
-            for element in itertools.product(sex_numerator, age_numerator, race_numerator)
-        ]
+        cross_product = self.symptom_likelihoods(condition_definition, symptom_definition)
 
         # global key separator
         sep_key = self.sep_key
@@ -701,13 +709,11 @@ class AdvancedModuleGenerator(ModuleGenerator):
             ----------
             probability : float
                 The absolute probablity value of the symtom given the cuurent condition.
-            distribution : dict
-                Dictionary containing the odd values associated to each age category,
-                race category, and sex category
-            condition_distribution : dict
-                Dictionary containing the odd values associated to each age category,
-                race category, and sex category for the condition related to the symptom
-                being generated
+            distribution : SymptomRecord
+                Record holding the demographic groups of the symptom
+            condition_distribution : ConditionRecord
+                Record holding the demographic groups of the condition
+                related to the symptom being generated
             condition_proba: dict
                 Dictionary containing the probabilities of the condition related to the symptom
                 being generated given each risk factor combination (sex, age, race).
@@ -731,8 +737,8 @@ class AdvancedModuleGenerator(ModuleGenerator):
         # global key separator
         sep_key = self.sep_key
 
-        if ((len(distribution.get("sex")) == 0) and (len(distribution.get("age")) == 0) and (
-                len(distribution.get("race")) == 0)):
+        if not (distribution.sex.has_data or distribution.age.has_data or
+                distribution.race.has_data):
             probability = round_val(probability)
             transitions.append({
                 "distributions": [
@@ -751,71 +757,45 @@ class AdvancedModuleGenerator(ModuleGenerator):
             return transitions, transitions_dict
 
         # Prob (condition | risk factors)
-        sex_cond_denom = sum([
-            prob_val(
-                condition_distribution.get("sex").get(sex_key).get("odds")
-            ) * self.priors["Gender"][sex_key]
-            for sex_key in AttrKeys.SEX_KEYS
-        ])
-        age_cond_denom = sum([
-            prob_val(
-                condition_distribution.get("age").get(age_key).get("odds")
-            ) * self.priors["Age"][age_key]
-            for age_key in AttrKeys.AGE_KEYS
-        ])
-        race_cond_denom = sum([
-            prob_val(
-                condition_distribution.get("race").get(
-                    "race-ethnicity-other" if race_key in [
-                        "race-ethnicity-asian", "race-ethnicity-native"] else race_key
-                ).get("odds")
-            ) * self.priors["Race"][race_key]
-            for race_key in AttrKeys.RACE_PRIOR_KEYS
-        ])
+        sex_cond_denom, age_cond_denom, race_cond_denom = self.get_denominators(
+            condition_distribution
+        )
 
         # should I include default transition?
         default_flag = False
 
-        sex_dict = distribution.get("sex", {})
-        race_dict = distribution.get("race", {})
-        age_dict = distribution.get("age", {})
+        sex_dict = distribution.sex
+        race_dict = distribution.race
+        age_dict = distribution.age
 
-        sex_cond_dict = condition_distribution.get("sex", {})
-        race_cond_dict = condition_distribution.get("race", {})
-        age_cond_dict = condition_distribution.get("age", {})
+        sex_cond_dict = condition_distribution.sex
+        race_cond_dict = condition_distribution.race
+        age_cond_dict = condition_distribution.age
 
         sex_denom, age_denom, race_denom, symp_prior_condition = self.get_symptom_stats_infos(
             condition_distribution, distribution,
             probability, condition_proba
         )
 
-        fake_sex_key = 'sex-none'
-        fake_age_key = 'age-none'
-        fake_race_key = 'race-none'
-
-        if len(sex_dict) == 0:
-            sex_dict[fake_sex_key] = 1.0
+        # the defined categories of each risk factor. A risk factor the symptom has
+        # no data for is not conditioned on, which is flagged by a None category.
+        sex_indices = [idx for idx, flag in enumerate(sex_dict.mask) if flag] or [None]
+        age_indices = [idx for idx, flag in enumerate(age_dict.mask) if flag] or [None]
+        race_indices = [idx for idx, flag in enumerate(race_dict.mask) if flag] or [None]
 
-        if len(age_dict) == 0:
-            age_dict[fake_age_key] = 1.0
+        for sex_idx in sex_indices:
 
-        if len(race_dict) == 0:
-            race_dict[fake_race_key] = 1.0
-
-        for sex_key in sex_dict.keys():
-
-            if sex_key == fake_sex_key: # fake_dict
+            if sex_idx is None:
                 sex_prob = 1
                 sex_cond_prob = 1
-                condition_sex = None
+                condition_sex_key = None
                 sex_key = "None"
             else:
-                sex_prob = self.get_ind_prob_symptom_cond_given_sex(
-                    sex_dict, sex_cond_dict, sex_key
-                )
-                sex_cond_prob = prob_val(
-                    condition_distribution.get("sex").get(sex_key).get("odds")
+                sex_key = AttrKeys.SEX_KEYS[sex_idx]
+                sex_prob = self.get_ind_prob_symptom_cond(
+                    sex_dict, sex_cond_dict, sex_idx
                 )
+                sex_cond_prob = sex_cond_dict.probs[sex_idx]
                 if sex_prob <= 0:
                     default_flag = True
                     for age_key in AttrKeys.AGE_KEYS:
@@ -824,24 +804,20 @@ class AdvancedModuleGenerator(ModuleGenerator):
                             transitions_dict[global_key] = 0.0
                     continue
 
-                condition_sex = {
-                    "condition_type": "Gender",
-                    "gender": "M" if sex_key == "sex-male" else "F"
-                }
+                condition_sex_key = sex_key
 
-            for age_key in age_dict.keys():
-                if age_key == fake_age_key:  # fake_dict
+            for age_idx in age_indices:
+                if age_idx is None:
                     age_prob = 1
                     age_cond_prob = 1
-                    condition_age = None
+                    condition_age_key = None
                     age_key = "None"
                 else:
-                    age_prob = self.get_ind_prob_symptom_cond_given_age(
-                        age_dict, age_cond_dict, age_key
-                    )
-                    age_cond_prob = prob_val(
-                        condition_distribution.get("age").get(age_key).get("odds")
+                    age_key = AttrKeys.AGE_KEYS[age_idx]
+                    age_prob = self.get_ind_prob_symptom_cond(
+                        age_dict, age_cond_dict, age_idx
                     )
+                    age_cond_prob = age_cond_dict.probs[age_idx]
                     if age_prob <= 0:
                         default_flag = True
                         for race_key in AttrKeys.RACE_PRIOR_KEYS:
@@ -849,57 +825,21 @@ class AdvancedModuleGenerator(ModuleGenerator):
                             transitions_dict[global_key] = 0.0
                         continue
 
-                    if age_key == "age-1-years":
-                        condition_age = {
-                            "condition_type": "Age",
-                            "operator": "<",
-                            "unit": "years",
-                            "quantity": 1
-                        }
-                    elif age_key == "age-75-years":
-                        condition_age = {
-                            "condition_type": "Age",
-                            "operator": ">",
-                            "unit": "years",
-                            "quantity": 75
-                        }
-                    else:
-                        parts = age_key.split("-")
-                        age_lower = parts[1]
-                        age_upper = parts[2]
-                        condition_age = {
-                            "condition_type": "And",
-                            "conditions": [
-                                {
-                                    "condition_type": "Age",
-                                    "operator": ">=",
-                                    "unit": "years",
-                                    "quantity": int(age_lower)
-                                },
-                                {
-                                    "condition_type": "Age",
-                                    "operator": "<=",
-                                    "unit": "years",
-                                    "quantity": int(age_upper)
-                                }
-                            ],
-                        }
+                    condition_age_key = age_key
 
-                for race_key in race_dict.keys():
-                    if race_key == fake_race_key:
+                for race_idx in race_indices:
+                    if race_idx is None:
                         race_prob = 1
                         race_cond_prob = 1
-                        condition_race = [None]
+                        condition_races = [None]
                         race_key = "None"
                         race_vals = [race_key]
                     else:
-                        race_prob = self.get_ind_prob_symptom_cond_given_race(
-                            race_dict, race_cond_dict, race_key
-                        )
-                        race_cond_prob = prob_val(
-                            condition_distribution.get(
-                                "race").get(race_key).get("odds")
+                        race_key = AttrKeys.RACE_KEYS[race_idx]
+                        race_prob = self.get_ind_prob_symptom_cond(
+                            race_dict, race_cond_dict, race_idx
                         )
+                        race_cond_prob = race_cond_dict.probs[race_idx]
                         if race_key == "race-ethnicity-other":
                             # split this into three for : NATIVE, "ASIAN" and "OTHER"
                             # according to synthea
@@ -908,19 +848,13 @@ class AdvancedModuleGenerator(ModuleGenerator):
                                 ("race-ethnicity-asian", "Asian"),
                                 ("race-ethnicity-other", "Other"),
                             ]
-                            condition_race = []
+                            condition_races = []
                             race_vals = []
                             for race_val, item in othersVal:
-                                condition_race.append({
-                                    "condition_type": "Race",
-                                    "race": item
-                                })
+                                condition_races.append(item)
                                 race_vals.append(race_val)
                         else:
-                            condition_race = [{
-                                "condition_type": "Race",
-                                "race": distribution.get("race").get(race_key).get("name")
-                            }]
+                            condition_races = [race_dict.names[race_idx]]
                             race_vals = [race_key]
 
                     for idx, race_val in enumerate(race_vals):
@@ -941,24 +875,9 @@ class AdvancedModuleGenerator(ModuleGenerator):
                         assert p_symp_g_cond_sex_race_age <= 1
                         transitions_dict[global_key] = p_symp_g_cond_sex_race_age
 
-                        conditions = []
-                        if condition_sex is not None:
-                            conditions.append(condition_sex)
-                        if condition_age is not None:
-                            conditions.append(condition_age)
-                        current_condition_race = condition_race[idx]
-                        if current_condition_race is not None:
-                            conditions.append(current_condition_race)
-
-                        if len(conditions) > 1:
-                            condition_node = {
-                                "condition_type": "And",
-                                "conditions": conditions
-                            }
-                        elif len(conditions) == 1:
-                            condition_node = conditions[0]
-                        else:
-                            condition_node = None
+                        condition_node = get_demographic_condition(
+                            condition_sex_key, condition_age_key, condition_races[idx]
+                        )
 
                         a_transition = {
                             "distributions": [
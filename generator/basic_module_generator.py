@@ -1,15 +1,101 @@
-import json
-import os
-import hashlib
+import time
 from collections import OrderedDict
-from .helpers import TransitionStates, AttrKeys, generate_synthea_common_history_module, prob_val, round_val
+from functools import partial
+from .fragments import freeze, shared
+from .helpers import TransitionStates, AttrKeys, generate_synthea_common_history_module, round_val
+from .manifest import generator_fingerprint, inputs_digest, output_digest, Manifest, \
+    MANIFEST_NAME, SHARD_MANIFEST_NAME
+from .profiles import get_profile
+from .records import load_condition, load_symptom
+from .registry import slug_hash
+from .scheduling import GenerationPlan, ModuleTask, TimingLog, generate_in_workers, \
+    longest_first
+from .serializers import get_serializer
+from .sinks import DirectorySink
+from .work_queue import WorkQueue
+
+
+# states and codes identical in every module, see `fragments.Fragment`
+INITIAL_STATE = freeze({
+    "type": "Initial",
+    "direct_transition": "Check_History_Age_Attribute"
+})
+
+NO_INFECTION_STATE = freeze({
+    "type": "Simple",
+    "direct_transition": TransitionStates.TERMINAL_STATE
+})
+
+ENCOUNTER_END_STATE = freeze({
+    "type": "EncounterEnd",
+    "direct_transition": "ConditionEnds"
+})
+
+TERMINAL_STATE = freeze({
+    "type": "Terminal"
+})
+
+ENCOUNTER_CODE = freeze({
+    "system": "SNOMED-CT",
+    "code": "185345009",
+    "display": "Encounter for symptom"
+})
+
+SYMPTOM_RANGE = freeze({
+    "low": 25,
+    "high": 50
+})
+
+_TRANSITION_TO_NO_INFECTION = freeze({
+    "type": "Simple",
+    "direct_transition": TransitionStates.NO_INFECTION
+})
 
 
 def get_transition_to_no_infection():
-    return {
-        "type": "Simple",
-        "direct_transition": TransitionStates.NO_INFECTION
-    }
+    return _TRANSITION_TO_NO_INFECTION
+
+
+def get_history_age_guard(next_state):
+    """Returns the `Guard` state letting a patient through once the history age is reached."""
+    return shared(("history_age_guard", next_state), lambda: {
+        "type": "Guard",
+        "allow": {
+            "condition_type": "Attribute",
+            "attribute": "age_time_to_the_end",
+            "operator": "<=",
+            "value": 0
+        },
+        "direct_transition": next_state
+    })
+
+
+def get_gender_condition(sex_key):
+    """Returns the `Gender` condition of a sex group."""
+    return shared(("gender", sex_key), lambda: {
+        "condition_type": "Gender",
+        "gender": "M" if sex_key == "sex-male" else "F"
+    })
+
+
+def get_race_condition(race):
+    """Returns the `Race` condition of a Synthea race."""
+    return shared(("race", race), lambda: {
+        "condition_type": "Race",
+        "race": race
+    })
+
+
+def _record_output(manifest, module_name, inputs, data):
+    manifest.record(module_name, inputs, output_digest(data))
+
+
+def _on_written(manifest, task):
+    # the sink may write the module in the background, its manifest entry (or work
+    # queue task) is only recorded once it is written
+    if manifest is None:
+        return None
+    return partial(_record_output, manifest, task.module_name, task.inputs)
 
 
 class ModuleGenerator():
@@ -24,7 +110,14 @@ class ModuleGenerator():
         Dictionary of symcat symptoms
     config: GeneratorConfig
         Generator config object
+    symptom_fields: tuple
+        Optional symptom fields (see `records.SYMPTOM_FIELDS`) the generator reads,
+        None for all of them. The other fields are not loaded.
+    profile: OutputProfile
+        Descriptive fields written in the modules, see `profiles.PROFILES`.
     """
+    symptom_fields = None
+
     def __init__(self, config):
         """
 
@@ -38,45 +131,253 @@ class ModuleGenerator():
             see class doc
         """
         self.config = config
-
-    def generate(self, conditions, symptoms):
-        for key, value in conditions.items():
-            module = self.generate_module(value, symptoms)
-            if module is None:
-                continue
-            filename = os.path.join(
-                self.config.output_dir,
-                "%s%s.json" % (self.config.prefix, key)
+        self.profile = get_profile(config.output_profile)
+        if not self.profile.remarks and self.symptom_fields is not None:
+            # the descriptions are only written in the remarks
+            self.symptom_fields = tuple(
+                field for field in self.symptom_fields if field != "description"
             )
 
-            with open(filename, "w") as fp:
-                json.dump(module, fp, indent=4)
+    def generate(self, conditions, symptoms, sink=None):
+        """Generates and writes the modules of the conditions.
 
-        if self.config.num_history_years > 0:
-            module = generate_synthea_common_history_module(self.config.num_history_years)
-            filename = os.path.join(
+        The run is planned first (see `plan`), then its tasks are generated by this
+        process, by worker processes or, with a work queue, by the processes sharing
+        the queue.
+
+        Returns
+        -------
+        int
+            the number of condition modules written, those the manifest finds up to date
+            or another process of the work queue generates being skipped.
+        """
+        if sink is None:
+            sink = DirectorySink(
                 self.config.output_dir,
-                "%s%s.json" % (self.config.prefix, "1_aaaa_" + module["name"])
+                get_serializer(self.config.json_backend, self.config.compact_output)
             )
-            with open(filename, "w") as fp:
-                json.dump(module, fp, indent=4)
+        plan = self.plan(conditions, symptoms, sink)
+
+        timing_log = TimingLog(self.config.timing_log) if self.config.timing_log else None
+        try:
+            if plan.queue is not None:
+                written = self._generate_from_queue(plan, symptoms, sink, timing_log)
+            elif self.config.num_workers > 1:
+                written = self._generate_in_pool(plan, symptoms, sink, timing_log)
+            else:
+                written = self._generate_serially(plan.tasks, plan, symptoms, sink, timing_log)
+        finally:
+            try:
+                sink.flush()
+            finally:
+                if plan.manifest is not None:
+                    plan.manifest.close()
+                    if self.config.num_shards > 1:
+                        # written even when empty, it tells that the shard ran
+                        plan.manifest.save()
+                if timing_log is not None:
+                    timing_log.close()
+
+        if plan.queue is not None and plan.manifest is not None:
+            # every task is done, by this process or by others
+            for task in plan.tasks:
+                plan.manifest.entries[task.module_name] = plan.queue.done_entry(
+                    task.module_name, task.inputs
+                )
+            plan.manifest.save()
+
+        # the shards of a run all need the same history module, only the first writes it
+        if self.config.num_history_years > 0 and self.config.shard_index == 0:
+            module = generate_synthea_common_history_module(self.config.num_history_years)
+            module_name = "%s%s.json" % (self.config.prefix, "1_aaaa_" + module["name"])
+            data = sink.serialize(module)
+            # the module only depends on num_history_years, it is left untouched unless
+            # that changed since it was written.
+            if not sink.is_unchanged(module_name, data):
+                sink.write(module_name, data)
+        return written
+
+    def plan(self, conditions, symptoms, sink):
+        """Selects the modules of a run which have to be generated.
+
+        Parameters
+        ----------
+        conditions: iterable
+            The conditions, either a dict or, when streamed, an iterable of
+            (slug, condition) pairs.
+        symptoms: dict
+            The symcat symptom definitions.
+        sink: ModuleSink
+            The sink the modules are written to.
+
+        Returns
+        -------
+        GenerationPlan
+            the tasks of the modules which are not up to date in the manifest, with the
+            manifest and work queue of the run. The cost of the tasks is estimated once
+            here when they are ordered by cost or timed.
+        """
+        queue = None
+        if self.config.work_queue_dir:
+            if sink.output_dir is None:
+                raise ValueError("A work queue requires the modules to be written to a directory")
+            if self.config.num_workers > 1:
+                raise ValueError("A work queue is shared by separate processes, not by workers")
+            queue = WorkQueue(self.config.work_queue_dir, lease_timeout=self.config.lease_timeout)
+        # modules whose inputs did not change since the last run are skipped. Only the
+        # files of a directory can be checked against the manifest.
+        manifest = None
+        if self.config.use_manifest and sink.output_dir is not None:
+            # the shards of a run may share the output directory, each keeps its manifest
+            name = MANIFEST_NAME
+            if self.config.num_shards > 1:
+                name = SHARD_MANIFEST_NAME % (self.config.shard_index, self.config.num_shards)
+            manifest = Manifest(sink.output_dir, name).load()
+        # the tasks of a work queue are identified by the digest of their inputs
+        fingerprint = None
+        if manifest is not None or queue is not None:
+            fingerprint = generator_fingerprint()
+
+        items = conditions.items() if hasattr(conditions, "items") else conditions
+        tasks = self.pending_tasks(items, symptoms, manifest, fingerprint)
+        if self.config.num_workers > 1 or queue is not None or self.config.timing_log:
+            tasks = self._estimate_costs(tasks, symptoms)
+        if self.config.num_workers > 1 or queue is not None:
+            # every condition is needed to order them by cost
+            tasks = list(tasks)
+        return GenerationPlan(tasks, manifest, queue)
+
+    def _estimate_costs(self, tasks, symptoms):
+        for task in tasks:
+            task.cost = self.estimate_cost(task.condition, symptoms)
+            yield task
+
+    def _generate_serially(self, tasks, plan, symptoms, sink, timing_log):
+        # generates the modules of `tasks` in this process, returns the number written
+        written = 0
+        for task in tasks:
+            start = time.perf_counter()
+            module = self.generate_module(task.condition, symptoms)
+            if timing_log is not None:
+                timing_log.record(task.module_name, task.cost, time.perf_counter() - start)
+            if module is None:
+                if plan.recorder is not None:
+                    plan.recorder.record(task.module_name, task.inputs, None)
+                continue
+            sink.write_module(task.module_name, module, _on_written(plan.recorder, task))
+            written += 1
+        return written
+
+    def _generate_in_pool(self, plan, symptoms, sink, timing_log):
+        written = 0
+        results = generate_in_workers(
+            self, plan.tasks, symptoms, sink.serializer, self.config.num_workers
+        )
+        for task, data, seconds in results:
+            if timing_log is not None:
+                timing_log.record(task.module_name, task.cost, seconds)
+            if data is None:
+                if plan.recorder is not None:
+                    plan.recorder.record(task.module_name, task.inputs, None)
+                continue
+            sink.write_serialized(task.module_name, data, _on_written(plan.recorder, task))
+            written += 1
+        return written
+
+    def _generate_from_queue(self, plan, symptoms, sink, timing_log):
+        # the processes sharing the queue generate the tasks in the same order, this one
+        # only those it claims
+        tasks = plan.queue.run(longest_first(plan.tasks))
+        return self._generate_serially(tasks, plan, symptoms, sink, timing_log)
+
+    def pending_tasks(self, items, symptoms, manifest=None, fingerprint=None):
+        """Yields the `ModuleTask` of the conditions whose module has to be generated.
+
+        Parameters
+        ----------
+        items: iterable
+            The (slug, condition) pairs, the conditions being records or parsed dictionaries.
+        symptoms: dict
+            The symcat symptom definitions.
+        manifest: Manifest
+            The manifest of the output directory, if any. The modules it holds for the
+            current inputs are skipped (default: None).
+        fingerprint: str
+            Fingerprint of the generator code, see `manifest.generator_fingerprint`. The
+            digest of the inputs of the tasks is only computed when provided (default: None).
+        """
+        for key, value in items:
+            condition = load_condition(value)
+            module_name = "%s%s.json" % (self.config.prefix, key)
+            inputs = None
+            if fingerprint is not None:
+                inputs = inputs_digest(self.module_inputs(condition, symptoms, fingerprint))
+                if manifest is not None and manifest.is_current(module_name, inputs):
+                    continue
+            yield ModuleTask(module_name, condition, inputs)
+
+    def estimate_cost(self, condition, symptoms):
+        """Returns the estimated cost of generating the module of `condition`.
+
+        The cost is in arbitrary units, it is only used to generate the most costly
+        modules first.
+        """
+        return 1 + len(condition.symptoms)
+
+    def module_inputs(self, condition, symptoms, fingerprint):
+        """Returns everything the module of `condition` depends on.
+
+        Parameters
+        ----------
+        condition: ConditionRecord
+            The condition of the module.
+        symptoms: dict
+            The symcat symptom definitions.
+        fingerprint: str
+            Fingerprint of the generator code (see `manifest.generator_fingerprint`).
+
+        Returns
+        -------
+        dict
+            the json serializable inputs of the module.
+        """
+        return {
+            "condition": condition.to_dict(),
+            "symptoms": {
+                edge.slug: symptom.to_dict() if symptom is not None else None
+                for edge in condition.symptoms
+                for symptom in [
+                    load_symptom(edge.slug, symptoms.get(edge.slug, None), self.symptom_fields)
+                ]
+            },
+            "generator": type(self).__name__,
+            "min_symptoms": self.config.min_symptoms,
+            "num_history_years": self.config.num_history_years,
+            "prefix": self.config.prefix,
+            "json_backend": self.config.json_backend,
+            "compact": self.config.compact_output,
+            "profile": self.profile.name,
+            "code": fingerprint,
+        }
 
     def generate_module(self, condition, symptoms):
         return {}
 
 
 class BasicModuleGenerator(ModuleGenerator):
+    symptom_fields = ("description",)
+
     def generate_module(self, condition, symptoms):
-        if not condition.get("symptoms", None):
+        condition = load_condition(condition)
+        if not condition.symptoms:
             return None
 
-        condition_name = condition.get("condition_name")
-        condition_slug = condition.get("condition_slug")
+        condition_name = condition.name
+        condition_slug = condition.slug
 
         begin_processing_transition = "Begin_Module_Transition"
         potential_infection_transition = "Potential_Infection"
         num_symptom_attribute = "count_symptom_%s" % condition_slug
-        history_age_attribute = "age_time_to_the_end"
         node_infection_name = condition_name.replace(" ", "_") + "_Infection"
         target_encounter_start = "Doctor_Visit"
         target_encounter_end = "End_Doctor_Visit"
@@ -85,26 +386,11 @@ class BasicModuleGenerator(ModuleGenerator):
 
         states = OrderedDict()
 
-        states["Initial"] = {
-            "type": "Initial",
-            "direct_transition": "Check_History_Age_Attribute"
-        }
-        states[no_infection] = {
-            "type": "Simple",
-            "direct_transition": "TerminalState"
-        }
+        states["Initial"] = INITIAL_STATE
+        states[no_infection] = NO_INFECTION_STATE
 
         # check if the time history is verified
-        states["Check_History_Age_Attribute"] = {
-            "type": "Guard",
-            "allow": {
-                "condition_type": "Attribute",
-                "attribute": history_age_attribute,
-                "operator": "<=",
-                "value": 0
-            },
-            "direct_transition": begin_processing_transition
-        }
+        states["Check_History_Age_Attribute"] = get_history_age_guard(begin_processing_transition)
 
         states[begin_processing_transition] = {
             "type": "Simple"
@@ -113,7 +399,7 @@ class BasicModuleGenerator(ModuleGenerator):
         # sex states
         race_check = "Check_Race"
         sex_conditional_transition, sex_states = self.generate_transition_for_sex(
-            condition_name, condition.get("sex"), race_check, TransitionStates.TERMINAL_STATE
+            condition_name, condition.sex, race_check, TransitionStates.TERMINAL_STATE
         )
         states[begin_processing_transition]["conditional_transition"] = sex_conditional_transition
         states.update(sex_states)
@@ -126,14 +412,14 @@ class BasicModuleGenerator(ModuleGenerator):
         # race states
         race_conditional_transition, race_states = self.generate_transition_for_race(
             condition_name,
-            condition.get("race"), potential_infection_transition, no_infection
+            condition.race, potential_infection_transition, no_infection
         )
         states[race_check]["conditional_transition"] = race_conditional_transition
         states.update(race_states)
 
         age_conditional_transition, age_states = self.generate_transition_for_age(
             condition_name,
-            condition.get("age"),
+            condition.age,
             target_encounter_start,
             potential_infection_transition
         )
@@ -148,24 +434,14 @@ class BasicModuleGenerator(ModuleGenerator):
             "type": "Encounter",
             "encounter_class": "ambulatory",
             "reason": "%s_Infection" % condition_name,
-            "codes": [
-                {
-                    "system": "SNOMED-CT",
-                    "code": "185345009",
-                    "display": "Encounter for symptom"
-                }
-            ],
+            "codes": [ENCOUNTER_CODE],
             "direct_transition": node_infection_name
         }
 
         # add the Condition state (a ConditionOnset) stage
-        condition_hash = hashlib.sha224(
-            condition.get("condition_slug").encode("utf-8")
-        ).hexdigest()
-
         condition_code = {
             "system": "sha224",
-            "code": condition_hash,
+            "code": condition.hash,
             "display": condition_name
         }
 
@@ -184,17 +460,16 @@ class BasicModuleGenerator(ModuleGenerator):
             "codes": [condition_code],
             "target_encounter": "Doctor_Visit",
             "remarks": [
-                condition.get("condition_description"),
-                condition.get("condition_remarks")
+                condition.description,
+                condition.remarks
             ],
             "direct_transition": next_stage
         }
 
         # now we start to model the symptoms, we use
-        condition_symptoms = condition.get("symptoms")
         keys = [
-            [k, float(condition_symptoms.get(k).get("probability")) * 1 / 100]
-            for k in condition_symptoms.keys()
+            [edge, float(edge.probability) * 1 / 100]
+            for edge in condition.symptoms
         ]
 
         for idx, key in enumerate(keys):
@@ -212,10 +487,10 @@ class BasicModuleGenerator(ModuleGenerator):
                     "direct_transition"] = "Simple_Transition_%d" % (keys[0][2] + 1)
 
         for idx in range(len(keys)):
-            curr_symptom = condition_symptoms.get(keys[idx][0])
+            curr_symptom = keys[idx][0]
             probability = keys[idx][1]
             index = keys[idx][2]
-            slug = curr_symptom.get("slug")
+            slug = curr_symptom.slug
             check_on_num_symptoms = False
 
             if self.config.min_symptoms > 0:
@@ -223,7 +498,7 @@ class BasicModuleGenerator(ModuleGenerator):
                 if remaining <= self.config.min_symptoms:
                     check_on_num_symptoms = True
 
-            symptom_definition = symptoms.get(slug, None)
+            symptom_definition = load_symptom(slug, symptoms.get(slug, None), self.symptom_fields)
             if idx == len(keys) - 1:
                 next_target = target_encounter_end
             else:
@@ -268,18 +543,15 @@ class BasicModuleGenerator(ModuleGenerator):
 
             if symptom_definition is None:
                 # a symptom which we dont have a definition for?
-                slug_hash = hashlib.sha224(slug.encode("utf-8")).hexdigest()
+                symptom_hash = slug_hash(slug)
                 symptom_transition = {
                     "type": "Symptom",
                     "symptom": slug,
-                    "range": {
-                        "low": 25,
-                        "high": 50
-                    },
+                    "range": SYMPTOM_RANGE,
                     "condition_codes": [condition_code],
                     "symptom_code": {
                         "system": "sha224",
-                        "code": slug_hash,
+                        "code": symptom_hash,
                         "display": slug
                     },
                     "value_code": {
@@ -306,24 +578,21 @@ class BasicModuleGenerator(ModuleGenerator):
             else:
                 symptom_transition = {
                     "type": "Symptom",
-                    "symptom": symptom_definition.get("name"),
-                    "range": {
-                        "low": 25,
-                        "high": 50
-                    },
+                    "symptom": symptom_definition.name,
+                    "range": SYMPTOM_RANGE,
                     "condition_codes": [condition_code],
                     "symptom_code": {
                         "system": "sha224",
-                        "code": symptom_definition.get("hash"),
-                        "display": symptom_definition.get("name")
+                        "code": symptom_definition.hash,
+                        "display": symptom_definition.name
                     },
                     "value_code": {
                         "system": "sha224",
-                        "code": symptom_definition.get("hash"),
-                        "display": "%s (finding)" % symptom_definition.get("name")
+                        "code": symptom_definition.hash,
+                        "display": "%s (finding)" % symptom_definition.name
                     },
                     "remarks": [
-                        symptom_definition.get("description")
+                        symptom_definition.description
                     ],
                     "direct_transition": next_stage
                 }
@@ -345,10 +614,7 @@ class BasicModuleGenerator(ModuleGenerator):
             states[symptom_transition_name] = symptom_transition
 
         # always end the encounter
-        states[target_encounter_end] = {
-            "type": "EncounterEnd",
-            "direct_transition": "ConditionEnds"
-        }
+        states[target_encounter_end] = ENCOUNTER_END_STATE
 
         states["ConditionEnds"] = {
             "type": "ConditionEnd",
@@ -356,21 +622,19 @@ class BasicModuleGenerator(ModuleGenerator):
             "condition_onset": node_infection_name
         }
 
-        states[TransitionStates.TERMINAL_STATE] = {
-            "type": "Terminal"
-        }
+        states[TransitionStates.TERMINAL_STATE] = TERMINAL_STATE
 
-        return {
+        return self.profile.apply({
             "name": condition_name,
             "states": states
-        }
+        })
 
     @staticmethod
     def generate_transition_for_age(condition, age_distribution, next_state,
                                     default_state=TransitionStates.TERMINAL_STATE):
         """
-        :param condition:
-        :param age_distribution:
+        :param condition: name of the condition
+        :param age_distribution: `records.Demographics` age group of the condition
         :param next_state:
         :param default_state:
         :return:
@@ -381,7 +645,7 @@ class BasicModuleGenerator(ModuleGenerator):
         default_flag = False
 
         for idx, key in enumerate(AttrKeys.AGE_KEYS):
-            prob = prob_val(age_distribution.get(key).get("odds"))
+            prob = age_distribution.probs[idx]
 
             if prob <= 0:
                 # then terminate module
@@ -390,12 +654,12 @@ class BasicModuleGenerator(ModuleGenerator):
             if key == "age-1-years":
                 next_node_name = "Ages_Less_1"
                 curr_transition = {
-                    "condition": {
+                    "condition": shared(("basic_age", key), lambda: {
                         "condition_type": "Age",
                         "operator": "<",
                         "unit": "years",
                         "quantity": 1
-                    },
+                    }),
                     "transition": next_node_name
                 }
                 state = get_transition_to_no_infection() if prob <= 0 else {
@@ -421,12 +685,12 @@ class BasicModuleGenerator(ModuleGenerator):
             elif key == "age-75-years":
                 next_node_name = "Ages_75_More"
                 curr_transition = {
-                    "condition": {
+                    "condition": shared(("basic_age", key), lambda: {
                         "condition_type": "Age",
                         "operator": ">=",
                         "unit": "years",
                         "quantity": 75
-                    },
+                    }),
                     "transition": next_node_name
                 }
                 state = get_transition_to_no_infection() if prob <= 0 else {
@@ -455,7 +719,7 @@ class BasicModuleGenerator(ModuleGenerator):
                 age_upper = parts[2]
                 next_node_name = "Ages_{}_{}".format(age_lower, age_upper)
                 curr_transition = {
-                    "condition": {
+                    "condition": shared(("basic_age", key), lambda: {
                         "condition_type": "And",
                         "conditions": [
                             {
@@ -471,7 +735,7 @@ class BasicModuleGenerator(ModuleGenerator):
                                 "quantity": age_upper
                             }
                         ],
-                    },
+                    }),
                     "transition": next_node_name
                 }
                 state = get_transition_to_no_infection() if prob <= 0 else {
@@ -508,10 +772,8 @@ class BasicModuleGenerator(ModuleGenerator):
     @staticmethod
     def generate_transition_for_sex(condition, sex_distribution, next_state,
                                     default_state=TransitionStates.TERMINAL_STATE):
-        male_prob = prob_val(sex_distribution.get("sex-male").get("odds"))
-        female_prob = prob_val(sex_distribution.get("sex-female").get("odds"))
-
-        probabilities = [male_prob, female_prob]
+        # probabilities of the male and female groups
+        probabilities = sex_distribution.probs
 
         transition = []
         adjacent_states = {}
@@ -521,10 +783,7 @@ class BasicModuleGenerator(ModuleGenerator):
             if probabilities[idx] > 0:
                 next_node_name = "Male" if idx == 0 else "Female"
                 transition.append({
-                    "condition": {
-                        "condition_type": "Gender",
-                        "gender": "M" if idx == 0 else "F"
-                    },
+                    "condition": get_gender_condition(AttrKeys.SEX_KEYS[idx]),
                     "transition": next_node_name
                 })
 
@@ -564,8 +823,9 @@ class BasicModuleGenerator(ModuleGenerator):
         transitions = []
         adjacent_states = {}
 
-        for key in AttrKeys.RACE_KEYS:
-            prob = prob_val(race_distribution.get(key).get("odds"))
+        for race_idx, key in enumerate(AttrKeys.RACE_KEYS):
+            prob = race_distribution.probs[race_idx]
+            race_name = race_distribution.names[race_idx]
 
             if prob <= 0:
                 prob = 0.001
@@ -576,10 +836,7 @@ class BasicModuleGenerator(ModuleGenerator):
                 for idx, item in enumerate(["Native", "Asian", "Other"]):
                     next_node_name = "Race_{}".format(item)
                     curr_transition = {
-                        "condition": {
-                            "condition_type": "Race",
-                            "race": item
-                        },
+                        "condition": get_race_condition(item),
                         "transition": next_node_name
                     }
                     transitions.append(curr_transition)
@@ -606,14 +863,9 @@ class BasicModuleGenerator(ModuleGenerator):
                     }
                     adjacent_states[next_node_name] = state
             else:
-                next_node_name = "Race_{}".format(
-                    race_distribution.get(key).get("name")
-                )
+                next_node_name = "Race_{}".format(race_name)
                 curr_transition = {
-                    "condition": {
-                        "condition_type": "Race",
-                        "race": race_distribution.get(key).get("name")
-                    },
+                    "condition": get_race_condition(race_name),
                     "transition": next_node_name
                 }
                 transitions.append(curr_transition)
@@ -632,7 +884,7 @@ class BasicModuleGenerator(ModuleGenerator):
                     ],
                     "remarks": [
                         "{} have an approx lifetime risk of {} of {}%.".format(
-                            race_distribution.get(key).get("name") + " people",
+                            race_name + " people",
                             condition,
                             prob * 100
                         )
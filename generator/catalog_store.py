@@ -0,0 +1,357 @@
+import sqlite3
+from collections import OrderedDict
+
+from .records import load_condition, load_symptom, SYMPTOM_FIELDS
+from .registry import slug_hash
+from .schema import get_demographics, CATEGORY_NAMES, DEMOGRAPHIC_KEYS
+
+# bump whenever the tables change
+STORE_VERSION = 1
+
+SYMPTOMS = "symptoms"
+CONDITIONS = "conditions"
+
+_TABLES = """
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS conditions (
+    slug TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT,
+    hash TEXT,
+    description TEXT,
+    remarks TEXT
+);
+CREATE TABLE IF NOT EXISTS symptoms (
+    slug TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT,
+    hash TEXT,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS condition_symptoms (
+    condition_slug TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    symptom_slug TEXT NOT NULL,
+    probability
+);
+CREATE INDEX IF NOT EXISTS condition_symptoms_condition ON condition_symptoms (condition_slug);
+CREATE INDEX IF NOT EXISTS condition_symptoms_symptom ON condition_symptoms (symptom_slug);
+CREATE TABLE IF NOT EXISTS common_causes (
+    symptom_slug TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    cause_slug TEXT NOT NULL,
+    name TEXT,
+    probability
+);
+CREATE INDEX IF NOT EXISTS common_causes_symptom ON common_causes (symptom_slug);
+CREATE TABLE IF NOT EXISTS demographics (
+    kind TEXT NOT NULL,
+    slug TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    grp_slug TEXT NOT NULL,
+    name TEXT,
+    odds REAL
+);
+CREATE INDEX IF NOT EXISTS demographics_slug ON demographics (kind, slug);
+"""
+
+# sqlite limits the number of parameters of a statement
+_BATCH_SIZE = 500
+
+
+def _batches(values):
+    values = list(values)
+    for idx in range(0, len(values), _BATCH_SIZE):
+        yield values[idx:idx + _BATCH_SIZE]
+
+
+class CatalogStore(object):
+    """
+    SQLite database holding parsed Symcat conditions and symptoms.
+
+    Conditions, symptoms, the condition-symptom edges, the symptom common causes and
+    the demographic odds are stored in separate tables indexed on slug, so that any
+    subset of the catalog can be read without loading the rest of it.
+
+    Attributes
+    ----------
+    filename: str
+        Path of the SQLite database.
+    """
+    def __init__(self, filename):
+        """
+
+        Parameters
+        ----------
+        filename: str
+            See class doc
+        """
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript(_TABLES)
+        version = self.connection.execute(
+            "SELECT value FROM catalog_meta WHERE key = 'version'"
+        ).fetchone()
+        if version is None:
+            with self.connection:
+                self.connection.execute(
+                    "INSERT INTO catalog_meta (key, value) VALUES ('version', ?)",
+                    (str(STORE_VERSION),)
+                )
+        elif int(version[0]) != STORE_VERSION:
+            self.connection.close()
+            raise ValueError(
+                "%s uses catalog version %s, version %d is required. Parse the exports again"
+                % (filename, version[0], STORE_VERSION)
+            )
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, kind, data):
+        """Replaces all the stored symptoms or conditions with the parsed `data`.
+
+        Parameters
+        ----------
+        kind : str
+            Either `SYMPTOMS` or `CONDITIONS`.
+        data : dict
+            The parsed definitions, keyed on their slug.
+        """
+        if kind not in [SYMPTOMS, CONDITIONS]:
+            raise ValueError("Invalid catalog kind: %s" % kind)
+        with self.connection as connection:
+            connection.execute("DELETE FROM demographics WHERE kind = ?", (kind,))
+            if kind == SYMPTOMS:
+                connection.execute("DELETE FROM symptoms")
+                connection.execute("DELETE FROM common_causes")
+                connection.executemany(
+                    "INSERT INTO symptoms (slug, position, name, hash, description) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (slug, position, definition.get("name"), definition.get("hash"),
+                         definition.get("description"))
+                        for position, (slug, definition) in enumerate(data.items())
+                    )
+                )
+                connection.executemany(
+                    "INSERT INTO common_causes (symptom_slug, position, cause_slug, name, "
+                    "probability) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (slug, position, cause_slug, cause.get("name"), cause.get("probability"))
+                        for slug, definition in data.items()
+                        for position, (cause_slug, cause) in enumerate(
+                            (definition.get("common_causes") or {}).items()
+                        )
+                    )
+                )
+            else:
+                connection.execute("DELETE FROM conditions")
+                connection.execute("DELETE FROM condition_symptoms")
+                connection.executemany(
+                    "INSERT INTO conditions (slug, position, name, hash, description, remarks) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        (slug, position, definition.get("condition_name"),
+                         definition.get("condition_hash") or slug_hash(slug),
+                         definition.get("condition_description"),
+                         definition.get("condition_remarks"))
+                        for position, (slug, definition) in enumerate(data.items())
+                    )
+                )
+                connection.executemany(
+                    "INSERT INTO condition_symptoms (condition_slug, position, symptom_slug, "
+                    "probability) VALUES (?, ?, ?, ?)",
+                    (
+                        (slug, position, edge.get("slug"), edge.get("probability"))
+                        for slug, definition in data.items()
+                        for position, edge in enumerate(
+                            (definition.get("symptoms") or {}).values()
+                        )
+                    )
+                )
+            connection.executemany(
+                "INSERT INTO demographics (kind, slug, grp, position, grp_slug, name, odds) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (kind, slug, group, position, grp_slug, CATEGORY_NAMES[grp_slug],
+                     compact["odds"][position])
+                    for slug, definition in data.items()
+                    for group, compact in get_demographics(definition).items()
+                    for position, grp_slug in enumerate(DEMOGRAPHIC_KEYS[group])
+                    if compact["mask"][position]
+                )
+            )
+
+    def _select(self, query, slugs):
+        """Runs `query` over all the rows or, when `slugs` is given, the matching ones only."""
+        if slugs is None:
+            return self.connection.execute(query % "1").fetchall()
+        rows = []
+        for batch in _batches(slugs):
+            condition = "slug IN (%s)" % ", ".join("?" * len(batch))
+            rows.extend(self.connection.execute(query % condition, batch).fetchall())
+        return rows
+
+    def _demographics(self, kind, slugs):
+        groups = {}
+        for batch in (_batches(slugs) if slugs is not None else [None]):
+            query = "SELECT slug, grp, grp_slug, name, odds FROM demographics WHERE kind = ?"
+            params = [kind]
+            if batch is not None:
+                query += " AND slug IN (%s)" % ", ".join("?" * len(batch))
+                params.extend(batch)
+            for slug, group, grp_slug, name, odds in self.connection.execute(
+                    query + " ORDER BY slug, grp, position", params):
+                groups.setdefault(slug, {}).setdefault(group, OrderedDict())[grp_slug] = {
+                    "name": name,
+                    "slug": grp_slug,
+                    "odds": odds
+                }
+        return groups
+
+    def condition_names(self):
+        """Returns the `(slug, name)` of all the stored conditions, in the parsed order."""
+        return self.connection.execute(
+            "SELECT slug, name FROM conditions ORDER BY position"
+        ).fetchall()
+
+    def condition_slugs(self):
+        """Returns the slugs of all the stored conditions, in the parsed order."""
+        return [
+            row[0] for row in self.connection.execute(
+                "SELECT slug FROM conditions ORDER BY position"
+            )
+        ]
+
+    def load_conditions(self, slugs=None):
+        """Loads the `ConditionRecord` of the given conditions (default: all).
+
+        Parameters
+        ----------
+        slugs : list
+            Slugs of the conditions to load. Unknown slugs are ignored (default: None).
+
+        Returns
+        -------
+        OrderedDict
+            the records keyed on their slug, in the parsed order.
+        """
+        rows = self._select(
+            "SELECT slug, position, name, hash, description, remarks FROM conditions WHERE %s",
+            slugs
+        )
+        rows.sort(key=lambda row: row[1])
+        edges = {}
+        for batch in (_batches([row[0] for row in rows]) if slugs is not None else [None]):
+            query = "SELECT condition_slug, symptom_slug, probability FROM condition_symptoms"
+            if batch is not None:
+                query += " WHERE condition_slug IN (%s)" % ", ".join("?" * len(batch))
+            for condition_slug, symptom_slug, probability in self.connection.execute(
+                    query + " ORDER BY condition_slug, position", batch or []):
+                edges.setdefault(condition_slug, OrderedDict())[symptom_slug] = {
+                    "slug": symptom_slug,
+                    "probability": probability
+                }
+        groups = self._demographics(CONDITIONS, [row[0] for row in rows] if slugs is not None else None)
+
+        conditions = OrderedDict()
+        for slug, _, name, code, description, remarks in rows:
+            definition = {
+                "condition_name": name,
+                "condition_slug": slug,
+                "condition_hash": code,
+                "condition_description": description,
+                "condition_remarks": remarks,
+                "symptoms": edges.get(slug, {}),
+            }
+            definition.update(
+                (group, groups.get(slug, {}).get(group, {})) for group in DEMOGRAPHIC_KEYS.keys()
+            )
+            conditions[slug] = load_condition(definition)
+        return conditions
+
+    def load_symptoms(self, slugs=None, fields=None):
+        """Loads the `SymptomRecord` of the given symptoms (default: all).
+
+        Parameters
+        ----------
+        slugs : list
+            Slugs of the symptoms to load. Unknown slugs are ignored (default: None).
+        fields : tuple
+            The optional fields to load (see `records.load_symptom`). The tables of the
+            other fields are not read. All the fields are loaded when None (default: None).
+
+        Returns
+        -------
+        OrderedDict
+            the records keyed on their slug, in the parsed order.
+        """
+        rows = self._select(
+            "SELECT slug, position, name, hash, description FROM symptoms WHERE %s", slugs
+        )
+        rows.sort(key=lambda row: row[1])
+        if fields is None:
+            fields = SYMPTOM_FIELDS
+        causes = {}
+        for batch in (_batches([row[0] for row in rows]) if slugs is not None else [None]):
+            if "common_causes" not in fields:
+                break
+            query = "SELECT symptom_slug, cause_slug, name, probability FROM common_causes"
+            if batch is not None:
+                query += " WHERE symptom_slug IN (%s)" % ", ".join("?" * len(batch))
+            for symptom_slug, cause_slug, name, probability in self.connection.execute(
+                    query + " ORDER BY symptom_slug, position", batch or []):
+                causes.setdefault(symptom_slug, OrderedDict())[cause_slug] = {
+                    "name": name,
+                    "slug": cause_slug,
+                    "probability": probability
+                }
+        groups = {}
+        if any(group in fields for group in DEMOGRAPHIC_KEYS.keys()):
+            groups = self._demographics(
+                SYMPTOMS, [row[0] for row in rows] if slugs is not None else None
+            )
+
+        symptoms = OrderedDict()
+        for slug, _, name, code, description in rows:
+            definition = {
+                "name": name,
+                "hash": code,
+                "description": description,
+                "common_causes": causes.get(slug, {}),
+            }
+            definition.update(
+                (group, groups.get(slug, {}).get(group, {})) for group in DEMOGRAPHIC_KEYS.keys()
+            )
+            symptoms[slug] = load_symptom(slug, definition, fields)
+        return symptoms
+
+    def load_catalog(self, condition_slugs=None, symptom_fields=None):
+        """Loads the given conditions (default: all) and only the symptoms they reference.
+
+        Only the `symptom_fields` optional fields of the symptoms are loaded, see
+        `load_symptoms`.
+
+        Returns
+        -------
+        symptoms: OrderedDict
+            the `SymptomRecord` of the referenced symptoms.
+        conditions: OrderedDict
+            the `ConditionRecord` of the conditions.
+        """
+        conditions = self.load_conditions(condition_slugs)
+        symptom_slugs = set(
+            edge.slug for condition in conditions.values() for edge in condition.symptoms
+        )
+        return self.load_symptoms(symptom_slugs, symptom_fields), conditions
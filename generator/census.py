@@ -0,0 +1,107 @@
+import csv
+from collections import OrderedDict
+
+from .helpers import load_config, AttrKeys
+from .sweep import PriorsVariant, variant_name
+
+# name of the first column, the header row is repeated before every block of regions
+STATE_COLUMN = "State"
+
+GENDER_COLUMNS = OrderedDict([
+    ("TOT_MALE", "sex-male"),
+    ("TOT_FEMALE", "sex-female"),
+])
+
+RACE_COLUMNS = OrderedDict([
+    ("WHITE", "race-ethnicity-white"),
+    ("HISPANIC", "race-ethnicity-hispanic"),
+    ("BLACK", "race-ethnicity-black"),
+    ("ASIAN", "race-ethnicity-asian"),
+    ("NATIVE", "race-ethnicity-native"),
+    ("OTHER", "race-ethnicity-other"),
+])
+
+
+def load_census(filename):
+    """Function for reading the sex, race and age distributions of every region of a census export.
+
+    The export (e.g `us_states_census_data_15.csv`) holds a row per region with the share
+    of each sex (`TOT_MALE`, `TOT_FEMALE`) and race (`WHITE`, ..., `OTHER`) and a column
+    per age group of `AttrKeys.AGE_KEYS`. Empty rows are skipped and the header may be
+    repeated.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the census export.
+
+    Returns
+    -------
+    OrderedDict
+        the `{"Gender": ..., "Race": ..., "Age": ...}` distributions of every region,
+        keyed on its name, as config file sections (see `helpers.load_config`).
+    """
+    regions = OrderedDict()
+    header = None
+    with open(filename, newline="") as fp:
+        for row in csv.reader(fp):
+            if not row or not row[0].strip():
+                continue
+            if row[0].strip() == STATE_COLUMN:
+                header = [column.strip() for column in row]
+                missing = [
+                    column for column in list(GENDER_COLUMNS) + list(RACE_COLUMNS) + AttrKeys.AGE_KEYS
+                    if column not in header
+                ]
+                if missing:
+                    raise ValueError("Missing census columns: %s" % ", ".join(missing))
+                continue
+            if header is None:
+                raise ValueError("The census export %s has no %s header" % (filename, STATE_COLUMN))
+            values = dict(zip(header, row))
+            regions[row[0].strip()] = OrderedDict([
+                ("Gender", OrderedDict(
+                    (key, values[column]) for column, key in GENDER_COLUMNS.items()
+                )),
+                ("Race", OrderedDict(
+                    (key, values[column]) for column, key in RACE_COLUMNS.items()
+                )),
+                ("Age", OrderedDict((key, values[key]) for key in AttrKeys.AGE_KEYS)),
+            ])
+    return regions
+
+
+def census_variants(filename, states=None, config_file=""):
+    """Function for building the priors of every region of a census export.
+
+    The sex, race and age priors of a region are those of its row (see `load_census`),
+    the condition and symptom priors those of `config_file`. Every variant is named after
+    its region, e.g `New-York`, and can be generated with `sweep.generate_sweep`.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the census export.
+    states : list
+        Names of the regions to build the priors of, case insensitive. Every region of
+        the export, the national `USA` row included, when not provided (default: None).
+    config_file : str
+        Path of the config file of the other priors (default: "").
+
+    Returns
+    -------
+    list
+        the `sweep.PriorsVariant` of the regions.
+    """
+    regions = load_census(filename)
+    names = list(regions.keys())
+    if states:
+        by_name = {name.lower(): name for name in names}
+        unknown = [state for state in states if state.strip().lower() not in by_name]
+        if unknown:
+            raise ValueError("Unknown census regions: %s" % ", ".join(unknown))
+        names = list(OrderedDict.fromkeys(by_name[state.strip().lower()] for state in states))
+    return [
+        PriorsVariant(variant_name([name]), load_config(config_file, regions[name]))
+        for name in names
+    ]
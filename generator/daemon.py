@@ -0,0 +1,271 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from .generator import Generator, BASIC_MODULE_GENERATOR
+from .helpers import load_config
+from .records import load_conditions, load_symptoms
+from .selection import changed_priors, ConditionSelection
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+def changed_conditions(previous_symptoms, previous_conditions, symptoms, conditions):
+    """Function for finding the conditions whose module changes with a new catalog.
+
+    Parameters
+    ----------
+    previous_symptoms, previous_conditions : dict
+        The records of the previous catalog.
+    symptoms, conditions : dict
+        The records of the new catalog.
+
+    Returns
+    -------
+    set
+        the slugs of the conditions which were added or changed, or one of whose
+        symptoms was added, changed or removed.
+    """
+    changed_symptoms = set(
+        slug for slug in set(previous_symptoms.keys()) | set(symptoms.keys())
+        if slug not in previous_symptoms or slug not in symptoms or
+        previous_symptoms[slug].to_dict() != symptoms[slug].to_dict()
+    )
+    return set(
+        slug for slug, condition in conditions.items()
+        if slug not in previous_conditions or
+        previous_conditions[slug].to_dict() != condition.to_dict() or
+        any(edge.slug in changed_symptoms for edge in condition.symptoms)
+    )
+
+
+class GenerationService(object):
+    """
+    Generator keeping the parsed catalog and the priors of its last run in memory.
+
+    The catalog is loaded on the first request and only loaded again when its files
+    change. Each request then only regenerates the modules of the conditions which
+    changed since the previous one and of those affected by the priors which changed,
+    see `selection.changed_priors`, on top of the modules the manifest finds out of date.
+    The requests share a module generator, whose likelihood tables (see
+    `AdvancedModuleGenerator.symptom_likelihoods`) do not depend on the priors and are only
+    computed again for the conditions which changed.
+
+    Attributes
+    ----------
+    config: GeneratorConfig
+        Config of the generated modules, the config file may change between requests.
+    symptoms: OrderedDict
+        The loaded `SymptomRecord`, None until the catalog is loaded.
+    conditions: OrderedDict
+        The loaded `ConditionRecord`, None until the catalog is loaded.
+    priors: dict
+        The priors of the last generated modules, None before the first request.
+    module_generator: ModuleGenerator
+        The module generator of the requests, created by the first one.
+    stats: OrderedDict
+        Counters of the requests, catalog loads, cache hits, generated modules and
+        generation times.
+    """
+    def __init__(self, config):
+        """
+
+        Parameters
+        ----------
+        config: GeneratorConfig
+            See class doc
+        """
+        self.config = config
+        self.symptoms = None
+        self.conditions = None
+        self.priors = None
+        self.module_generator = None
+        # likelihood tables of the advanced modules, keyed on condition and symptom slugs
+        self._likelihoods = {}
+        self._catalog_version = None
+        # slugs of the conditions changed since the previous request
+        self._pending = set()
+        self.stats = OrderedDict([
+            ("requests", 0),
+            ("catalog_loads", 0),
+            ("catalog_cache_hits", 0),
+            ("priors_cache_hits", 0),
+            ("modules_generated", 0),
+            ("modules_reused", 0),
+            ("last_seconds", 0.0),
+            ("total_seconds", 0.0),
+        ])
+
+    def _catalog_files(self):
+        # none when the catalog is given with `update_catalog`
+        if self.config.catalog_db:
+            return [self.config.catalog_db]
+        return [filename for filename in [self.config.symptom_file, self.config.conditions_file]
+                if filename]
+
+    def _current_catalog_version(self):
+        return [(os.stat(filename).st_mtime_ns, os.stat(filename).st_size)
+                for filename in self._catalog_files()]
+
+    def load_catalog(self):
+        """Loads the symptoms and conditions from the files of the config, only keeping the
+        symptom fields the module generator reads."""
+        version = self._current_catalog_version()
+        self.update_catalog(*Generator(self.config).load_catalog())
+        self._catalog_version = version
+
+    def update_catalog(self, symptoms, conditions):
+        """Replaces the catalog, e.g parsed again from the Symcat exports.
+
+        The conditions which were added or changed, or one of whose symptoms changed,
+        are generated by the next request.
+
+        Parameters
+        ----------
+        symptoms : dict
+            The parsed symptoms (definitions or records).
+        conditions : dict
+            The parsed conditions (definitions or records).
+        """
+        fields = Generator(self.config).create_module_generator().symptom_fields
+        symptoms = load_symptoms(symptoms, fields)
+        conditions = load_conditions(conditions)
+        if self.conditions is not None:
+            changed = changed_conditions(self.symptoms, self.conditions, symptoms, conditions)
+            self._pending |= changed
+            # the tables of the changed conditions are computed again
+            for key in [key for key in self._likelihoods.keys() if key[0] in changed]:
+                del self._likelihoods[key]
+        self.symptoms = symptoms
+        self.conditions = conditions
+        self._catalog_version = self._current_catalog_version()
+        self.stats["catalog_loads"] += 1
+
+    def generate(self, config_file=None, condition_slugs=None, reload=False):
+        """Generates the modules affected by the changes since the previous request.
+
+        Parameters
+        ----------
+        config_file : str
+            If provided, the config file of the priors from now on (default: None).
+        condition_slugs : list
+            Slugs or glob patterns of conditions to regenerate in any case (default: None).
+        reload : bool
+            Whether to load the catalog again even if its files did not change
+            (default: False).
+
+        Returns
+        -------
+        dict
+            the number of conditions selected, of modules written (those the manifest finds
+            up to date are skipped) and the generation time.
+        """
+        start = time.perf_counter()
+        if config_file is not None:
+            self.config.config_file = config_file
+
+        if reload or self.conditions is None or \
+                self._current_catalog_version() != self._catalog_version:
+            self.load_catalog()
+        else:
+            self.stats["catalog_cache_hits"] += 1
+
+        priors = load_config(self.config.config_file)
+        conditions = self.conditions
+        if self.priors is not None:
+            if self.config.generator_mode == BASIC_MODULE_GENERATOR:
+                # the basic modules do not depend on the priors
+                changed_names = set()
+            else:
+                changed_names = changed_priors(self.priors, priors)
+            if changed_names is not None:
+                if not changed_names:
+                    self.stats["priors_cache_hits"] += 1
+                selection = ConditionSelection(condition_slugs, None, changed_names)
+                conditions = OrderedDict(
+                    (slug, condition) for slug, condition in self.conditions.items()
+                    if slug in self._pending or selection.matches(slug, condition.name)
+                )
+
+        generator = Generator(self.config)
+        if self.module_generator is None:
+            self.module_generator = generator.create_module_generator()
+            if self.config.generator_mode != BASIC_MODULE_GENERATOR:
+                self.module_generator.likelihood_cache = self._likelihoods
+        if self.config.generator_mode != BASIC_MODULE_GENERATOR:
+            self.module_generator.priors = priors
+        written = generator.generate(self.symptoms, conditions, self.module_generator)
+        self.priors = priors
+        self._pending = set()
+
+        seconds = time.perf_counter() - start
+        self.stats["requests"] += 1
+        self.stats["modules_generated"] += written
+        self.stats["modules_reused"] += len(self.conditions) - written
+        self.stats["last_seconds"] = seconds
+        self.stats["total_seconds"] += seconds
+        return OrderedDict([
+            ("conditions", len(conditions)), ("modules", written), ("seconds", seconds)
+        ])
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._reply(200, self.server.service.stats)
+        else:
+            self._reply(404, {"error": "Unknown path: %s" % self.path})
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self._reply(404, {"error": "Unknown path: %s" % self.path})
+            return
+        try:
+            size = int(self.headers.get("Content-Length") or 0)
+            options = json.loads(self.rfile.read(size).decode("utf-8") or "{}")
+            if not isinstance(options, dict):
+                raise ValueError("The request body must be a json object")
+            result = self.server.service.generate(
+                config_file=options.get("config_file"),
+                condition_slugs=options.get("condition_slugs"),
+                reload=bool(options.get("reload"))
+            )
+        except (OSError, ValueError, KeyError, AssertionError) as error:
+            # load_config asserts that the condition priors are probabilities
+            self._reply(400, {"error": str(error)})
+            return
+        self._reply(200, result)
+
+    def log_message(self, format, *args):
+        # the requests are not logged
+        pass
+
+
+def create_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Function for creating the local http server of a `GenerationService`.
+
+    The server answers one request at a time:
+        - `POST /generate` with an optional json object holding the `config_file`,
+          `condition_slugs` and `reload` arguments of `GenerationService.generate`
+        - `GET /stats` with the counters of the service
+
+    Returns
+    -------
+    HTTPServer
+        the server, call its `serve_forever` method to handle requests.
+    """
+    server = HTTPServer((host, port), _RequestHandler)
+    server.service = service
+    return server
@@ -0,0 +1,175 @@
+import json
+from json.encoder import encode_basestring_ascii
+
+_INDENT = "    "
+
+
+class Fragment(dict):
+    """
+    Read-only subtree shared by the generated modules.
+
+    Parts of a module which are identical in every module (e.g the `Terminal` state or
+    the `Gender`, `Age` and `Race` conditions of the demographic branches) are built
+    once with `shared` and the same `Fragment` is used in every module. The serializer
+    encodes a fragment once per indentation level, or once in compact mode, and splices
+    the cached text in every module, see `dumps_indented` and `dumps_compact`.
+
+    Fragments are regular dictionaries for every other purpose, but modifying one would
+    modify every module and raises a `TypeError`.
+    """
+    __slots__ = ("_texts",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._texts = {}
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Fragments are shared between modules and cannot be modified")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return Fragment, (dict(self),)
+
+    def text(self, level):
+        """Returns the indented json text of the fragment nested at `level`, or its compact
+        text when `level` is None."""
+        text = self._texts.get(level)
+        if text is None:
+            if level is None:
+                text = json.dumps(self, separators=(",", ":"), allow_nan=False)
+            else:
+                text = json.dumps(self, indent=4, allow_nan=False).replace(
+                    "\n", "\n" + _INDENT * level
+                )
+            self._texts[level] = text
+        return text
+
+
+def freeze(value):
+    """Function for turning the dictionaries of a json value into fragments."""
+    if isinstance(value, dict):
+        return value if isinstance(value, Fragment) else Fragment(
+            (key, freeze(item)) for key, item in value.items()
+        )
+    if isinstance(value, list):
+        return [freeze(item) for item in value]
+    return value
+
+
+_SHARED = {}
+
+
+def shared(key, build):
+    """Function for getting the fragment identified by `key`, built by `build()` on first use.
+
+    Parameters
+    ----------
+    key : hashable
+        Identifier of the fragment, e.g `("gender", "M")`.
+    build : callable
+        Returns the json value of the fragment.
+
+    Returns
+    -------
+    Fragment
+        the same fragment for every call with `key`.
+    """
+    fragment = _SHARED.get(key)
+    if fragment is None:
+        fragment = _SHARED[key] = freeze(build())
+    return fragment
+
+
+def _encode_float(value):
+    if value != value or value in (float("inf"), -float("inf")):
+        # like json.dumps(allow_nan=False)
+        raise ValueError("Out of range float values are not JSON compliant")
+    return float.__repr__(value)
+
+
+def _encode_key(key):
+    if isinstance(key, str):
+        return encode_basestring_ascii(key)
+    if key is True:
+        return '"true"'
+    if key is False:
+        return '"false"'
+    if key is None:
+        return '"null"'
+    if isinstance(key, float):
+        return '"%s"' % _encode_float(key)
+    return '"%s"' % int.__repr__(key)
+
+
+def _layout(level):
+    # the line break before the items of a container nested at `level`, before its closing
+    # bracket, the level of its items and the separator of its keys. Everything is written
+    # on a single line when `level` is None.
+    if level is None:
+        return "", "", None, ":"
+    return "\n" + _INDENT * (level + 1), "\n" + _INDENT * level, level + 1, ": "
+
+
+def _encode(value, level, chunks):
+    if isinstance(value, str):
+        chunks.append(encode_basestring_ascii(value))
+    elif isinstance(value, Fragment):
+        chunks.append(value.text(level))
+    elif isinstance(value, dict):
+        if not value:
+            chunks.append("{}")
+            return
+        newline, end, item_level, colon = _layout(level)
+        separator = "{"
+        for key, item in value.items():
+            chunks.append(separator)
+            chunks.append(newline)
+            chunks.append(_encode_key(key))
+            chunks.append(colon)
+            _encode(item, item_level, chunks)
+            separator = ","
+        chunks.append(end + "}")
+    elif isinstance(value, (list, tuple)):
+        if not value:
+            chunks.append("[]")
+            return
+        newline, end, item_level, _ = _layout(level)
+        separator = "["
+        for item in value:
+            chunks.append(separator)
+            chunks.append(newline)
+            _encode(item, item_level, chunks)
+            separator = ","
+        chunks.append(end + "]")
+    elif value is None:
+        chunks.append("null")
+    elif value is True:
+        chunks.append("true")
+    elif value is False:
+        chunks.append("false")
+    elif isinstance(value, int):
+        chunks.append(int.__repr__(value))
+    elif isinstance(value, float):
+        chunks.append(_encode_float(value))
+    else:
+        raise TypeError("Object of type %s is not JSON serializable" % type(value).__name__)
+
+
+def dumps_indented(value):
+    """Function for serializing a module like `json.dumps(value, indent=4, allow_nan=False)`.
+
+    The cached text of the fragments of the module is spliced instead of encoding them
+    again.
+    """
+    chunks = []
+    _encode(value, 0, chunks)
+    return "".join(chunks)
+
+
+def dumps_compact(value):
+    """Function for serializing a module like
+    `json.dumps(value, separators=(",", ":"), allow_nan=False)`, see `dumps_indented`."""
+    chunks = []
+    _encode(value, None, chunks)
+    return "".join(chunks)
@@ -1,7 +1,14 @@
-import json
-import os
 from .basic_module_generator import BasicModuleGenerator
 from .advanced_module_generator import AdvancedModuleGenerator
+from .catalog_store import CatalogStore
+from .records import load_condition, load_conditions, load_symptoms
+from .selection import ConditionSelection
+from .sharding import Shard
+from .profiles import FULL_PROFILE
+from .serializers import DEFAULT_BACKEND, get_serializer
+from .sinks import DIRECTORY_FORMAT, open_sink
+from .snapshot import is_snapshot, load_parsed, load_parsed_symptoms, SnapshotView
+from .streaming import iter_parsed
 
 
 ADVANCED_MODULE_GENERATOR = 1
@@ -27,6 +34,9 @@ class GeneratorConfig(object):
         priors associated to age, race, sex categories
         as well as conditions and symptoms
         (default:"")
+    priors: dict
+        If provided, the priors (see `helpers.load_config`) used instead of those of
+        `config_file`, e.g the priors of a sweep variant. (default: None)
     num_history_years: int
         given the target age of a patient, this is the number of years from
         that target age from which pathologies are generated.
@@ -36,15 +46,105 @@ class GeneratorConfig(object):
         (default: 1)
     prefix: string
         prefix to be preppended to a module's output file name
+    catalog_db: str
+        Path of a SQLite catalog (see `catalog_store.CatalogStore`) to read the parsed
+        conditions and symptoms from instead of `symptom_file` and `conditions_file`.
+        (default: "")
+    condition_slugs: list
+        If provided, only the modules of the conditions matching these slugs or glob
+        patterns are generated. (default: None)
+    condition_regex: str
+        If provided, the modules of the conditions whose slug matches this regular
+        expression are generated too. (default: "")
+    changed_priors_file: str
+        Path of the config file previously used. If provided, the modules of the
+        conditions whose prior differs in `config_file` are generated too, or every
+        module if an age, sex or race prior changed. (default: "")
+
+        Whenever conditions are selected, only the symptoms they reference are loaded.
+    use_manifest: bool
+        Whether to keep a manifest of the generated modules in `output_dir` and skip
+        the modules whose inputs did not change since they were written. (default: True)
+    stream_conditions: bool
+        Whether to read `conditions_file` (json or jsonl) one condition at a time, each
+        condition being released once its module is written, instead of loading the
+        whole file. (default: False)
+    output_format: str
+        Where the modules are written, one of `sinks.OUTPUT_FORMATS`: one file per module
+        in `output_dir` ("dir"), a single "zip", "tar.gz" or "jsonl" archive, or jsonl
+        lines on "stdout". (default: "dir")
+    output_file: str
+        Path of the archive for the zip, tar.gz and jsonl formats. Defaults to
+        `output_dir` with the format as extension. (default: "")
+    max_pending_writes: int
+        Number of generated modules which may wait to be written while the next ones are
+        generated. The modules are written in a background thread, or synchronously
+        when 0. (default: 16)
+    json_backend: str
+        Name of the json library the modules are serialized with, see
+        `serializers.BACKENDS`. Every backend writes the same json values, the layout of
+        the indented modules depends on the backend. (default: "json")
+    compact_output: bool
+        Whether to write the modules without indentation and with minimal separators.
+        (default: False)
+    output_profile: str
+        Name of the set of descriptive fields written in the modules, see
+        `profiles.PROFILES`: "full" writes all of them, "lean" drops the remarks (the
+        condition and symptom descriptions) and "minimal" also drops the display text of
+        the codes. (default: "full")
+    num_workers: int
+        Number of processes generating the modules. With several workers, the conditions
+        are generated from the most to the least costly one (see
+        `ModuleGenerator.estimate_cost`) and the streamed conditions are all loaded to
+        be ordered. (default: 1)
+    timing_log: str
+        If provided, path of a jsonl file where the estimated cost and the generation
+        time of every module are logged. (default: "")
+    shard_index: int
+        Index of the shard to generate when the conditions are split in `num_shards`
+        shards, see `sharding.Shard`. Only the first shard writes the history module.
+        (default: 0)
+    num_shards: int
+        Number of shards the conditions are split in. (default: 1)
+    balance_shards: bool
+        Whether to assign the conditions to the shards from their estimated cost rather
+        than from a hash of their slug. Every condition is then loaded. (default: False)
+    work_queue_dir: str
+        If provided, directory shared by the generator processes of a run, possibly on
+        several hosts, which take the modules to generate from a common work queue, see
+        `work_queue.WorkQueue`. The modules must be written to a directory. (default: "")
+    lease_timeout: float
+        Number of seconds after which a module claimed from the work queue by a process
+        which stopped is generated by another one. (default: 600)
     """
     symptom_file = None
     conditions_file = None
     output_dir = None
     config_file = ""
+    priors = None
     num_history_years = 1
     min_symptoms = 1
     prefix = ""
     generator_mode = ADVANCED_MODULE_GENERATOR
+    catalog_db = ""
+    condition_slugs = None
+    condition_regex = ""
+    changed_priors_file = ""
+    stream_conditions = False
+    use_manifest = True
+    output_format = DIRECTORY_FORMAT
+    output_file = ""
+    max_pending_writes = 16
+    json_backend = DEFAULT_BACKEND
+    compact_output = False
+    output_profile = FULL_PROFILE
+    num_workers = 1
+    timing_log = ""
+    shard_index = 0
+    num_shards = 1
+    balance_shards = False
+    work_queue_dir = ""
+    lease_timeout = 600
 
 
 class Generator(object):
@@ -65,19 +165,124 @@ class Generator(object):
         """
         self.config = config
 
-    def generate(self):
-        with open(self.config.symptom_file) as fp:
-            symptoms_data = json.load(fp)
+    def create_module_generator(self):
+        """Returns the module generator of `config.generator_mode`."""
+        if self.config.generator_mode == BASIC_MODULE_GENERATOR:
+            return BasicModuleGenerator(config=self.config)
+        return AdvancedModuleGenerator(config=self.config)
 
-        with open(self.config.conditions_file) as fp:
-            conditions_data = json.load(fp)
+    def load_catalog(self):
+        """Loads the whole catalog from `config.catalog_db` or the json (or snapshot) files
+        of the config, only keeping the symptom fields the module generator reads.
 
-        if not os.path.isdir(self.config.output_dir):
-            os.mkdir(self.config.output_dir)
+        Returns
+        -------
+        tuple
+            the `records.SymptomRecord` and the `records.ConditionRecord`, keyed on
+            their slug.
+        """
+        fields = self.create_module_generator().symptom_fields
+        if self.config.catalog_db:
+            with CatalogStore(self.config.catalog_db) as store:
+                symptoms, conditions = store.load_catalog(None, fields)
+        else:
+            symptoms = load_parsed_symptoms(self.config.symptom_file, fields)
+            conditions = load_parsed(self.config.conditions_file)
+        return load_symptoms(symptoms, fields), load_conditions(conditions)
 
-        if self.config.generator_mode == BASIC_MODULE_GENERATOR:
-            module_generator = BasicModuleGenerator(config=self.config)
+    def generate(self, symptoms_data=None, conditions_data=None, module_generator=None):
+        """
+        Generates the modules for the parsed symptoms and conditions
+
+        Parameters
+        ----------
+        symptoms_data: dict
+            Parsed symptoms (definitions or `records.SymptomRecord`). Loaded from `config.symptom_file`
+            (json or binary snapshot) when not provided.
+        conditions_data: dict
+            Parsed conditions (definitions or `records.ConditionRecord`). Loaded from
+            `config.conditions_file` (json or binary snapshot) when not provided.
+        module_generator: ModuleGenerator
+            The generator of the modules, e.g sharing its caches with the generators of
+            other runs. Created from the config when not provided.
+
+        Returns
+        -------
+        int
+            the number of condition modules written, see `ModuleGenerator.generate`.
+        """
+        if module_generator is None:
+            module_generator = self.create_module_generator()
+
+        # only the symptom fields the module generator reads are loaded
+        symptom_fields = module_generator.symptom_fields
+
+        selection = ConditionSelection.from_config(self.config)
+        shard = Shard.from_config(self.config)
+        # hashed shards are selected from the slugs alone, balanced ones from the costs of
+        # all the conditions once they are loaded
+        hashed_shard = shard if shard is not None and not shard.balanced else None
+
+        if symptoms_data is None and conditions_data is None and self.config.catalog_db:
+            with CatalogStore(self.config.catalog_db) as store:
+                slugs = None
+                if selection is not None or hashed_shard is not None:
+                    slugs = [
+                        slug for slug, name in store.condition_names()
+                        if (selection is None or selection.matches(slug, name)) and
+                        (hashed_shard is None or hashed_shard.owns(slug))
+                    ]
+                symptoms_data, conditions_data = store.load_catalog(slugs, symptom_fields)
+
+        if conditions_data is None and self.config.stream_conditions and \
+                not is_snapshot(self.config.conditions_file):
+            conditions_data = iter_parsed(self.config.conditions_file)
         else:
-            module_generator = AdvancedModuleGenerator(config=self.config)
+            if conditions_data is None:
+                conditions_data = load_parsed(self.config.conditions_file)
+            conditions_data = conditions_data.items()
+
+        if selection is not None:
+            conditions_data = (
+                (slug, definition) for slug, definition in conditions_data
+                if selection.matches_definition(slug, definition)
+            )
+        if hashed_shard is not None:
+            conditions_data = (
+                (slug, definition) for slug, definition in conditions_data
+                if hashed_shard.owns(slug)
+            )
+
+        # the definitions are turned into slotted records once here, rather than
+        # looked up by key every time a module uses them. Conditions are converted
+        # lazily, one at a time, so that streamed ones are never all held in memory.
+        conditions_data = (
+            (slug, load_condition(definition)) for slug, definition in conditions_data
+        )
+
+        if symptoms_data is None:
+            symptom_slugs = None
+            if selection is not None or hashed_shard is not None:
+                # the selected conditions are read first so that only the symptoms
+                # they reference get loaded
+                conditions_data = list(conditions_data)
+                symptom_slugs = set(
+                    edge.slug for _, condition in conditions_data for edge in condition.symptoms
+                )
+            symptoms_data = load_parsed_symptoms(
+                self.config.symptom_file, symptom_fields, symptom_slugs
+            )
+        if not isinstance(symptoms_data, SnapshotView):
+            # a mapped snapshot is read in place, its records are decoded on access
+            symptoms_data = load_symptoms(symptoms_data, symptom_fields)
+
+        if shard is not None and shard.balanced:
+            conditions_data = shard.select(
+                conditions_data,
+                lambda condition: module_generator.estimate_cost(condition, symptoms_data)
+            )
 
-        module_generator.generate(conditions_data, symptoms_data)
+        serializer = get_serializer(self.config.json_backend, self.config.compact_output)
+        with open_sink(self.config.output_format, self.config.output_dir, self.config.output_file,
+                       self.config.max_pending_writes, serializer) as sink:
+            return module_generator.generate(conditions_data, symptoms_data, sink)
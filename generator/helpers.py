@@ -261,11 +261,14 @@ def convert_to_float(val):
     return float(val)
 
 
-def load_config(filename):
+def load_config(filename, overrides=None):
     # create an empty config data structure.
     config = configparser.ConfigParser()
     if (filename is not None) and (filename != ""):
         config.read(filename)
+    # {section: {key: value}} replacing values of the file before the priors are normalized
+    if overrides:
+        config.read_dict(overrides)
 
     priors = {}
     priors['Age'] = { key: None for key in AttrKeys.AGE_KEYS }
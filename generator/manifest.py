@@ -0,0 +1,165 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+# bump whenever the layout of the manifest changes
+MANIFEST_VERSION = 1
+
+# the manifest does not end with .json so that Synthea never mistakes it for a module
+MANIFEST_NAME = ".symcat_manifest.jsonl"
+
+# manifest of one of the shards of a run, see `sharding.Shard`
+SHARD_MANIFEST_NAME = ".symcat_manifest.shard-%d-of-%d.jsonl"
+
+
+def generator_fingerprint():
+    """Function for identifying the module generation code currently in use.
+
+    Returns
+    -------
+    str
+        the sha256 of the source files of the `generator` package.
+    """
+    digest = hashlib.sha256()
+    for filename in sorted(glob.glob(os.path.join(os.path.dirname(__file__), "*.py"))):
+        with open(filename, "rb") as fp:
+            digest.update(fp.read())
+    return digest.hexdigest()
+
+
+def inputs_digest(inputs):
+    """Function for hashing the inputs of a module (a json serializable dictionary)."""
+    data = json.dumps(inputs, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def output_digest(data):
+    """Function for hashing the serialized content of a module."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class Manifest(object):
+    """
+    Record of the modules written in an output directory.
+
+    Every entry holds the digest of the inputs a module was generated from and the
+    digest of the written file, so that modules whose inputs did not change are not
+    generated again. Entries are appended to the manifest as soon as a module is
+    written, which lets an interrupted run resume where it stopped; `close` then
+    rewrites the manifest with one line per module.
+
+    Attributes
+    ----------
+    output_dir: str
+        Directory of the modules.
+    name: str
+        File name of the manifest in `output_dir`.
+    filename: str
+        Path of the manifest.
+    entries: dict
+        Mapping from a module file name to its `{inputs, output}` digests.
+    """
+    def __init__(self, output_dir, name=MANIFEST_NAME):
+        """
+
+        Parameters
+        ----------
+        output_dir: str
+            See class doc
+        name: str
+            See class doc (default: `MANIFEST_NAME`)
+        """
+        self.output_dir = output_dir
+        self.name = name
+        self.filename = os.path.join(output_dir, name)
+        self.entries = {}
+        self._fp = None
+        # modules may be recorded by a background writer, see `sinks.QueuedSink`
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Loads the entries of the manifest, if any."""
+        self.entries = {}
+        if not os.path.isfile(self.filename):
+            return self
+        with open(self.filename) as fp:
+            lines = fp.read().splitlines()
+        if not lines or lines[0] != json.dumps({"version": MANIFEST_VERSION}):
+            # written by another version, every module is generated again
+            return self
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # the last line of an interrupted run may be truncated
+                continue
+            self.entries[entry["module"]] = {"inputs": entry["inputs"], "output": entry["output"]}
+        return self
+
+    def is_current(self, module, inputs):
+        """Returns whether `module` was generated from `inputs` and its file is unchanged.
+
+        Parameters
+        ----------
+        module : str
+            File name of the module.
+        inputs : str
+            Digest of the inputs of the module, see `inputs_digest`.
+        """
+        entry = self.entries.get(module)
+        if entry is None or entry["inputs"] != inputs:
+            return False
+        if entry["output"] is None:
+            # no module is written for this condition
+            return True
+        path = os.path.join(self.output_dir, module)
+        if not os.path.isfile(path):
+            return False
+        with open(path, "rb") as fp:
+            return output_digest(fp.read()) == entry["output"]
+
+    def record(self, module, inputs, output):
+        """Records that `module` was generated from `inputs` with the `output` digest.
+
+        The entry is appended to the manifest right away.
+        """
+        with self._lock:
+            if self._fp is None:
+                # start from a clean copy of the manifest, dropping any truncated line
+                self._rewrite()
+                self._fp = open(self.filename, "a")
+            self.entries[module] = {"inputs": inputs, "output": output}
+            self._fp.write(self._line(module) + "\n")
+            self._fp.flush()
+
+    def close(self):
+        """Rewrites the manifest with the latest entry of every module."""
+        with self._lock:
+            if self._fp is None:
+                return
+            self._fp.close()
+            self._fp = None
+            self._rewrite()
+
+    def save(self):
+        """Writes the manifest with the current entries."""
+        with self._lock:
+            self._rewrite()
+
+    def _line(self, module):
+        entry = self.entries[module]
+        return json.dumps({"module": module, "inputs": entry["inputs"], "output": entry["output"]})
+
+    def _rewrite(self):
+        # the processes sharing a work queue may all write the manifest at the end
+        tmp_filename = "%s.%s.tmp" % (self.filename, uuid.uuid4().hex)
+        with open(tmp_filename, "w") as fp:
+            fp.write(json.dumps({"version": MANIFEST_VERSION}) + "\n")
+            for module in sorted(self.entries.keys()):
+                fp.write(self._line(module) + "\n")
+        os.replace(tmp_filename, self.filename)
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+
+from .fragments import Fragment, shared
+
+FULL_PROFILE = "full"
+LEAN_PROFILE = "lean"
+MINIMAL_PROFILE = "minimal"
+
+# state fields holding a list of codes, and a single code
+_CODE_LISTS = ("codes", "condition_codes")
+_CODES = ("symptom_code", "value_code")
+
+
+def _without_display(code):
+    if "display" not in code:
+        return code
+    if isinstance(code, Fragment):
+        return shared(
+            ("without_display", code["system"], code["code"]),
+            lambda: {key: value for key, value in code.items() if key != "display"}
+        )
+    # the code of a condition is shared by several states of its module
+    del code["display"]
+    return code
+
+
+class OutputProfile(object):
+    """
+    Set of the descriptive fields written in the generated modules.
+
+    These fields are only informational: Synthea does not need them to run a simulation.
+
+    Attributes
+    ----------
+    name: str
+        Name of the profile.
+    remarks: bool
+        Whether to write the `remarks` of the states, i.e the condition description and
+        remarks, the symptom descriptions and the risks of the basic generator.
+    displays: bool
+        Whether to write the `display` text of the codes.
+    """
+    def __init__(self, name, remarks=True, displays=True):
+        """
+
+        Parameters
+        ----------
+        name: str
+            See class doc
+        remarks: bool
+            See class doc
+        displays: bool
+            See class doc
+        """
+        self.name = name
+        self.remarks = remarks
+        self.displays = displays
+
+    def apply(self, module):
+        """Removes the fields excluded by the profile from the states of `module`.
+
+        Parameters
+        ----------
+        module : dict
+            A generated module, modified in place.
+
+        Returns
+        -------
+        dict
+            the module.
+        """
+        if module is None or (self.remarks and self.displays):
+            return module
+        states = module["states"]
+        for name, state in states.items():
+            if isinstance(state, Fragment):
+                # the shared states have no descriptive field
+                continue
+            if not self.remarks:
+                state.pop("remarks", None)
+            if not self.displays:
+                for field in _CODE_LISTS:
+                    if field in state:
+                        state[field] = [_without_display(code) for code in state[field]]
+                for field in _CODES:
+                    if field in state:
+                        state[field] = _without_display(state[field])
+        return module
+
+
+PROFILES = OrderedDict([
+    (FULL_PROFILE, OutputProfile(FULL_PROFILE)),
+    (LEAN_PROFILE, OutputProfile(LEAN_PROFILE, remarks=False)),
+    (MINIMAL_PROFILE, OutputProfile(MINIMAL_PROFILE, remarks=False, displays=False)),
+])
+
+
+def get_profile(name):
+    """Function for getting an output profile from its name, see `PROFILES`."""
+    if name not in PROFILES:
+        raise ValueError("Invalid output profile: %s" % name)
+    return PROFILES[name]
@@ -0,0 +1,321 @@
+from array import array
+from collections import OrderedDict
+
+from .registry import REGISTRY
+from .schema import category_names, compact_group, get_demographics, DEMOGRAPHIC_KEYS, \
+    SCHEMA_VERSION
+
+
+class Demographics(object):
+    """
+    Compact definition of a demographic group (sex, age or race) of a condition or symptom
+
+    Attributes
+    ----------
+    odds: array
+        Symcat odds of each category, ordered like the matching `AttrKeys` list.
+    probs: array
+        Probability (i.e `prob_val(odds)`) of each category.
+    names: tuple
+        Display name of each category.
+    mask: bytes
+        1 for the categories Symcat has data for, 0 otherwise.
+    """
+    __slots__ = ("odds", "probs", "names", "mask")
+
+    def __init__(self, odds, probs, names, mask):
+        self.odds = odds
+        self.probs = probs
+        self.names = names
+        self.mask = mask
+
+    @property
+    def has_data(self):
+        return any(self.mask)
+
+    @classmethod
+    def build(cls, odds, probs, names, mask):
+        """Builds the record from its arrays, sharing category names and empty groups."""
+        names = _shared_names(names)
+        if not any(mask):
+            # groups without data are all alike, share a single instance
+            group = _EMPTY_GROUPS.get(names)
+            if group is None:
+                group = _EMPTY_GROUPS[names] = cls(odds, probs, names, mask)
+            return group
+        return cls(odds, probs, names, mask)
+
+    @classmethod
+    def build_all(cls, odds, probs, names, mask):
+        """Builds the records of consecutive groups from arrays holding all of them, e.g the
+        groups of every entry of a snapshot.
+
+        Parameters
+        ----------
+        odds, probs : array
+            The odds and probabilities of the categories of every group.
+        names : tuple
+            The category names of a group, which gives the size of the groups.
+        mask : bytes
+            The mask of the categories of every group.
+
+        Returns
+        -------
+        list
+            the record of every group, in order.
+        """
+        names = _shared_names(names)
+        size = len(names)
+        no_data = bytes(size)
+        empty = None
+        groups = []
+        for start in range(0, len(mask), size):
+            end = start + size
+            group_mask = mask[start:end]
+            if group_mask == no_data:
+                if empty is None:
+                    empty = cls.build(odds[start:end], probs[start:end], names, group_mask)
+                groups.append(empty)
+            else:
+                groups.append(cls(odds[start:end], probs[start:end], names, group_mask))
+        return groups
+
+    @classmethod
+    def from_compact(cls, compact, keys):
+        """Builds the record of the `keys` categories from a compact group (see
+        `schema.compact_group`)."""
+        return cls.build(
+            array("d", compact["odds"]),
+            array("d", compact["probs"]),
+            category_names(keys),
+            bytes(compact["mask"])
+        )
+
+    def to_dict(self):
+        """Returns the group in the parsed compact format."""
+        return OrderedDict([
+            ("odds", list(self.odds)),
+            ("probs", list(self.probs)),
+            ("mask", list(self.mask)),
+        ])
+
+
+# optional fields of a symptom, see `load_symptom`
+SYMPTOM_FIELDS = ("description", "common_causes", "sex", "age", "race")
+
+_EMPTY_GROUPS = {}
+_NAMES = {}
+
+
+def _shared_names(names):
+    # the same few tuples of category names are repeated for every definition
+    names = tuple(REGISTRY.intern(name) for name in names)
+    return _NAMES.setdefault(names, names)
+
+
+class SymptomEdge(object):
+    """
+    A symptom of a condition
+
+    Attributes
+    ----------
+    slug: str
+        Slug of the symptom.
+    probability: float
+        Probability (in %) of the symptom given the condition.
+    """
+    __slots__ = ("slug", "probability")
+
+    def __init__(self, slug, probability):
+        self.slug = slug
+        self.probability = probability
+
+
+class ConditionRecord(object):
+    """
+    A parsed Symcat condition
+
+    Attributes
+    ----------
+    slug: str
+    name: str
+    description: str
+    remarks: str
+    hash: str
+        sha224 code of the condition slug.
+    sex: Demographics
+    age: Demographics
+    race: Demographics
+    symptoms: tuple
+        The condition's `SymptomEdge` objects, in the parsed order.
+    """
+    __slots__ = ("slug", "name", "description", "remarks", "hash", "sex", "age", "race", "symptoms")
+
+    def __init__(self, slug, name, description, remarks, hash, sex, age, race, symptoms):
+        self.slug = slug
+        self.name = name
+        self.description = description
+        self.remarks = remarks
+        self.hash = hash
+        self.sex = sex
+        self.age = age
+        self.race = race
+        self.symptoms = symptoms
+
+    def to_dict(self):
+        """Returns the condition in the parsed json format."""
+        data = OrderedDict([
+            ("condition_name", self.name),
+            ("condition_slug", self.slug),
+            ("condition_hash", self.hash),
+            ("condition_description", self.description),
+            ("condition_remarks", self.remarks),
+            ("symptoms", OrderedDict(
+                (edge.slug, {"slug": edge.slug, "probability": edge.probability})
+                for edge in self.symptoms
+            )),
+        ])
+        for group in DEMOGRAPHIC_KEYS.keys():
+            data[group] = getattr(self, group).to_dict()
+        data["schema_version"] = SCHEMA_VERSION
+        return data
+
+
+class SymptomRecord(object):
+    """
+    A parsed Symcat symptom
+
+    Attributes
+    ----------
+    slug: str
+    name: str
+    hash: str
+        sha224 code of the symptom slug.
+    description: str
+    sex: Demographics
+    age: Demographics
+    race: Demographics
+    common_causes: dict
+        The parsed common causes of the symptom.
+
+    The description, demographic groups and common causes are None when they were
+    not loaded (see `load_symptom`).
+    """
+    __slots__ = ("slug", "name", "hash", "description", "sex", "age", "race", "common_causes")
+
+    def __init__(self, slug, name, hash, description, sex, age, race, common_causes=None):
+        self.slug = slug
+        self.name = name
+        self.hash = hash
+        self.description = description
+        self.sex = sex
+        self.age = age
+        self.race = race
+        self.common_causes = common_causes
+
+    def to_dict(self):
+        """Returns the symptom in the parsed json format."""
+        data = OrderedDict([
+            ("name", self.name),
+            ("hash", self.hash),
+            ("description", self.description),
+            ("common_causes", self.common_causes if self.common_causes is not None else {}),
+        ])
+        for group, keys in DEMOGRAPHIC_KEYS.items():
+            demographics = getattr(self, group)
+            data[group] = demographics.to_dict() if demographics is not None else \
+                compact_group(None, keys)
+        data["schema_version"] = SCHEMA_VERSION
+        return data
+
+
+def load_condition(definition):
+    """Function for building a `ConditionRecord` from a parsed condition definition.
+
+    Records are returned as is. Strings are interned and the condition code is read from
+    (or, for files parsed before codes were stored, added to) the shared slug registry.
+    """
+    if isinstance(definition, ConditionRecord):
+        return definition
+    slug = REGISTRY.intern(definition.get("condition_slug"))
+    demographics = get_demographics(definition)
+    return ConditionRecord(
+        slug=slug,
+        name=REGISTRY.intern(definition.get("condition_name")),
+        description=definition.get("condition_description"),
+        remarks=definition.get("condition_remarks"),
+        hash=REGISTRY.register(slug, definition.get("condition_hash")),
+        sex=Demographics.from_compact(demographics["sex"], DEMOGRAPHIC_KEYS["sex"]),
+        age=Demographics.from_compact(demographics["age"], DEMOGRAPHIC_KEYS["age"]),
+        race=Demographics.from_compact(demographics["race"], DEMOGRAPHIC_KEYS["race"]),
+        symptoms=tuple(
+            SymptomEdge(REGISTRY.intern(edge.get("slug")), edge.get("probability"))
+            for edge in (definition.get("symptoms") or {}).values()
+        )
+    )
+
+
+def load_symptom(slug, definition, fields=None):
+    """Function for building a `SymptomRecord` from a parsed symptom definition.
+
+    Records and None are returned as is. Strings are interned and the symptom code is
+    recorded in the shared slug registry.
+
+    Parameters
+    ----------
+    slug : str
+        The slug of the symptom.
+    definition : dict
+        The parsed symptom definition.
+    fields : tuple
+        If provided, only these optional fields (see `SYMPTOM_FIELDS`) are loaded, the
+        others are left to None. The name and hash are always loaded (default: None).
+
+    Returns
+    -------
+    SymptomRecord
+        the record of the symptom.
+    """
+    if definition is None or isinstance(definition, SymptomRecord):
+        return definition
+    if fields is None:
+        fields = SYMPTOM_FIELDS
+    slug = REGISTRY.intern(slug)
+    groups = dict.fromkeys(DEMOGRAPHIC_KEYS.keys())
+    if any(group in fields for group in groups):
+        demographics = get_demographics(definition)
+        for group in groups:
+            if group in fields:
+                groups[group] = Demographics.from_compact(
+                    demographics[group], DEMOGRAPHIC_KEYS[group]
+                )
+    return SymptomRecord(
+        slug=slug,
+        name=REGISTRY.intern(definition.get("name")),
+        hash=REGISTRY.register(slug, definition.get("hash")),
+        description=definition.get("description") if "description" in fields else None,
+        sex=groups["sex"],
+        age=groups["age"],
+        race=groups["race"],
+        common_causes=definition.get("common_causes") if "common_causes" in fields else None
+    )
+
+
+def load_conditions(data):
+    """Function for building the records of all the conditions of a parsed export."""
+    return OrderedDict(
+        (key, load_condition(value)) for key, value in data.items()
+    )
+
+
+def load_symptoms(data, fields=None):
+    """Function for building the records of all the symptoms of a parsed export.
+
+    `data` is either a dictionary or an iterable of `(slug, definition)` pairs, e.g the
+    one `streaming.iter_parsed` returns; in the latter case only the loaded fields (see
+    `load_symptom`) of each definition are kept in memory.
+    """
+    items = data.items() if hasattr(data, "items") else data
+    return OrderedDict(
+        (key, load_symptom(key, value, fields)) for key, value in items
+    )
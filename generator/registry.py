@@ -0,0 +1,72 @@
+import hashlib
+import sys
+
+
+class SlugRegistry(object):
+    """
+    Registry of the slugs, names and sha224 codes used across a run.
+
+    Slugs, names and group labels are repeated thousands of times in the Symcat
+    exports; they are interned so that every occurrence shares one string object.
+    The sha224 code of each slug is computed at most once, and the codes stored in
+    the parsed data are checked against it.
+
+    Attributes
+    ----------
+    hashes: dict
+        Mapping from a slug to its sha224 code.
+    """
+    def __init__(self):
+        self.hashes = {}
+
+    @staticmethod
+    def intern(value):
+        """Returns the interned copy of `value`. Anything but strings is returned as is."""
+        if type(value) is str:
+            return sys.intern(value)
+        return value
+
+    def slug_hash(self, slug):
+        """Returns the sha224 code of `slug`, computing it on the first request only."""
+        code = self.hashes.get(slug)
+        if code is None:
+            slug = self.intern(slug)
+            code = self.intern(hashlib.sha224(slug.encode("utf-8")).hexdigest())
+            self.hashes[slug] = code
+        return code
+
+    def register(self, slug, code):
+        """Checks a code read from parsed data and returns the interned code of `slug`.
+
+        The code is compared with the sha224 code of the slug, computed once per slug, so
+        that a wrong code in the parsed data is not written in every module. A missing
+        code is computed.
+        """
+        expected = self.slug_hash(slug)
+        if code and code != expected:
+            raise ValueError("Invalid sha224 code for %s: %s" % (slug, code))
+        return expected
+
+    def update(self, hashes):
+        """Records all the `{slug: code}` pairs of `hashes`."""
+        for slug, code in hashes.items():
+            self.register(slug, code)
+
+    def to_dict(self):
+        """Returns the `{slug: code}` pairs recorded so far."""
+        return dict(self.hashes)
+
+    def clear(self):
+        self.hashes.clear()
+
+
+# registry shared by the parser and the module generators
+REGISTRY = SlugRegistry()
+
+
+def intern_string(value):
+    return REGISTRY.intern(value)
+
+
+def slug_hash(slug):
+    return REGISTRY.slug_hash(slug)
@@ -0,0 +1,235 @@
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from .records import load_symptoms
+from .snapshot import open_snapshot, write_snapshot, CONDITIONS, SYMPTOMS
+
+# memory backed file system of linux, the catalog shared with the workers is written
+# there when available
+_SHARED_MEMORY_DIR = "/dev/shm"
+
+# state of the worker processes, set once by `_init_worker`
+_worker = {}
+
+
+class ModuleTask(object):
+    """
+    A module to generate.
+
+    Attributes
+    ----------
+    module_name: str
+        File name of the module.
+    condition: ConditionRecord
+        The condition of the module.
+    inputs: str
+        Digest of the inputs of the module, None without a manifest.
+    cost: float
+        Estimated generation cost, see `ModuleGenerator.estimate_cost`.
+    """
+    __slots__ = ("module_name", "condition", "inputs", "cost")
+
+    def __init__(self, module_name, condition, inputs=None, cost=None):
+        """
+
+        Parameters
+        ----------
+        module_name: str
+            See class doc
+        condition: ConditionRecord
+            See class doc
+        inputs: str
+            See class doc
+        cost: float
+            See class doc
+        """
+        self.module_name = module_name
+        self.condition = condition
+        self.inputs = inputs
+        self.cost = cost
+
+
+class GenerationPlan(object):
+    """
+    The modules a run generates, see `ModuleGenerator.plan`.
+
+    Attributes
+    ----------
+    tasks: iterable
+        The `ModuleTask` to generate. A list of tasks with their estimated cost when
+        they are ordered by cost, a lazy iterable otherwise.
+    manifest: Manifest
+        The manifest of the output directory, None when it is not used.
+    queue: WorkQueue
+        The work queue shared with other processes, None without a queue.
+    """
+    __slots__ = ("tasks", "manifest", "queue")
+
+    def __init__(self, tasks, manifest=None, queue=None):
+        """
+
+        Parameters
+        ----------
+        tasks: iterable
+            See class doc
+        manifest: Manifest
+            See class doc
+        queue: WorkQueue
+            See class doc
+        """
+        self.tasks = tasks
+        self.manifest = manifest
+        self.queue = queue
+
+    @property
+    def recorder(self):
+        """The queue, or else the manifest, recording the modules once they are written.
+
+        The modules of a queue are marked as done in the queue rather than recorded in
+        the manifest, which is written once every task is done."""
+        return self.queue if self.queue is not None else self.manifest
+
+
+def longest_first(tasks):
+    """Function for ordering tasks from the most to the least costly one."""
+    return sorted(tasks, key=lambda task: task.cost, reverse=True)
+
+
+class TimingLog(object):
+    """
+    Log of the estimated cost and the actual generation time of every module.
+
+    Each line of the log is a `{"module", "cost", "seconds"}` json object, which is used
+    to recalibrate the cost model of the generators.
+
+    Attributes
+    ----------
+    filename: str
+        Path of the log.
+    """
+    def __init__(self, filename):
+        """
+
+        Parameters
+        ----------
+        filename: str
+            See class doc
+        """
+        self.filename = filename
+        self._fp = open(filename, "w")
+
+    def record(self, module_name, cost, seconds):
+        self._fp.write(json.dumps({"module": module_name, "cost": cost, "seconds": seconds}) + "\n")
+
+    def close(self):
+        self._fp.close()
+
+
+def _init_worker(generator_class, config, symptoms_file, conditions_file, serializer):
+    generator = generator_class(config)
+    _worker["generator"] = generator
+    _worker["symptoms"] = open_snapshot(symptoms_file, generator.symptom_fields)
+    _worker["conditions"] = open_snapshot(conditions_file)
+    _worker["serializer"] = serializer
+
+
+def _generate_in_worker(module_name):
+    condition = _worker["conditions"][module_name]
+    start = time.perf_counter()
+    module = _worker["generator"].generate_module(condition, _worker["symptoms"])
+    seconds = time.perf_counter() - start
+    data = _worker["serializer"].dumps(module) if module is not None else None
+    return data, seconds
+
+
+def _catalog_dir():
+    if os.path.isdir(_SHARED_MEMORY_DIR) and os.access(_SHARED_MEMORY_DIR, os.W_OK):
+        return _SHARED_MEMORY_DIR
+    return None
+
+
+@contextmanager
+def shared_catalog(symptoms, conditions):
+    """Context manager writing the catalog as snapshots for worker processes.
+
+    The snapshots are written in memory when possible and removed on exit. Every worker
+    maps them with `snapshot.open_snapshot`, so that the workers share the pages of the
+    catalog instead of each receiving a copy of it.
+
+    Parameters
+    ----------
+    symptoms : dict
+        The `records.SymptomRecord`, keyed on their slug.
+    conditions : dict
+        The `records.ConditionRecord`, keyed on the name the workers look them up with.
+
+    Yields
+    ------
+    tuple
+        the paths of the symptoms and the conditions snapshots.
+    """
+    with tempfile.TemporaryDirectory(prefix="symcat-", dir=_catalog_dir()) as catalog_dir:
+        symptoms_file = os.path.join(catalog_dir, "symptoms.snapshot")
+        write_snapshot(symptoms_file, SYMPTOMS, symptoms)
+        conditions_file = os.path.join(catalog_dir, "conditions.snapshot")
+        write_snapshot(conditions_file, CONDITIONS, conditions)
+        yield symptoms_file, conditions_file
+
+
+def generate_in_workers(module_generator, tasks, symptoms, serializer, num_workers):
+    """Function for generating modules in worker processes.
+
+    The tasks are queued from the most to the least costly one and every worker takes
+    the next task as soon as it is done with the previous one, so that the costly
+    modules do not end up waiting behind the cheap ones while other workers are idle.
+
+    The symptoms and the conditions of the tasks are written once as snapshots which
+    every worker maps in memory (see `shared_catalog`), and only the module name is sent
+    with a task.
+
+    Parameters
+    ----------
+    module_generator : ModuleGenerator
+        The generator, re-created from its config in every worker.
+    tasks : list
+        The `ModuleTask` to generate, with their estimated cost.
+    symptoms : dict
+        The symptom definitions or records.
+    serializer : JsonSerializer
+        Serializer of the modules, the workers return the serialized modules.
+    num_workers : int
+        Number of worker processes.
+
+    Yields
+    ------
+    tuple
+        the task, the serialized module (None when no module is generated for the
+        condition) and the generation time in seconds, as soon as every module is done.
+    """
+    with shared_catalog(
+            load_symptoms(symptoms, module_generator.symptom_fields),
+            OrderedDict((task.module_name, task.condition) for task in tasks)
+    ) as (symptoms_file, conditions_file):
+        with ProcessPoolExecutor(
+                max_workers=num_workers, initializer=_init_worker,
+                initargs=(
+                    type(module_generator), module_generator.config, symptoms_file,
+                    conditions_file, serializer
+                )
+        ) as executor:
+            futures = {
+                executor.submit(_generate_in_worker, task.module_name): task
+                for task in longest_first(tasks)
+            }
+            try:
+                for future in as_completed(futures):
+                    data, seconds = future.result()
+                    yield futures[future], data, seconds
+            finally:
+                for future in futures:
+                    future.cancel()
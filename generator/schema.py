@@ -0,0 +1,153 @@
+from collections import OrderedDict
+
+from .helpers import AttrKeys, prob_val
+
+# version of the parsed data layout. Version 1 holds the demographic groups as nested
+# `{name, slug, odds}` dictionaries, version 2 adds their compact form next to them and
+# version 3 only holds the compact form.
+SCHEMA_VERSION = 3
+
+DEMOGRAPHIC_KEYS = OrderedDict([
+    ("sex", AttrKeys.SEX_KEYS),
+    ("age", AttrKeys.AGE_KEYS),
+    ("race", AttrKeys.RACE_KEYS),
+])
+
+# Symcat name of every category. The names are the same in every definition, so they are
+# kept once here rather than in each compact group.
+CATEGORY_NAMES = OrderedDict([
+    ("sex-male", "Male"),
+    ("sex-female", "Female"),
+    ("age-1-years", "< 1 years"),
+    ("age-1-4-years", "1-4 years"),
+    ("age-5-14-years", "5-14 years"),
+    ("age-15-29-years", "15-29 years"),
+    ("age-30-44-years", "30-44 years"),
+    ("age-45-59-years", "45-59 years"),
+    ("age-60-74-years", "60-74 years"),
+    ("age-75-years", "75+ years"),
+    ("race-ethnicity-black", "Black"),
+    ("race-ethnicity-hispanic", "Hispanic"),
+    ("race-ethnicity-white", "White"),
+    ("race-ethnicity-other", "Other"),
+])
+
+# position in `AttrKeys.RACE_KEYS` of each key in `AttrKeys.RACE_PRIOR_KEYS`.
+# Symcat has no data for the asian and native groups, they use the "other" group.
+RACE_PRIOR_INDEX = [
+    AttrKeys.RACE_KEYS.index(
+        "race-ethnicity-other" if key in ["race-ethnicity-asian", "race-ethnicity-native"] else key
+    )
+    for key in AttrKeys.RACE_PRIOR_KEYS
+]
+
+
+def category_names(keys):
+    """Function for getting the names of the categories of a demographic group.
+
+    Parameters
+    ----------
+    keys : list
+        The ordered group slugs (one of the `AttrKeys` lists).
+
+    Returns
+    -------
+    tuple
+        the name of every key, in the order of `keys`.
+    """
+    return tuple(CATEGORY_NAMES[key] for key in keys)
+
+
+def compact_group(group, keys):
+    """Function for converting a nested demographic group into fixed-order arrays.
+
+    Parameters
+    ----------
+    group : dict
+        Dictionary mapping a group slug (e.g `sex-male`) to its `{name, slug, odds}`
+        definition.
+    keys : list
+        The ordered group slugs (one of the `AttrKeys` lists).
+
+    Returns
+    -------
+    dict
+        the `odds`, `probs` (i.e `prob_val(odds)`) and presence `mask` of every key,
+        in the order of `keys`. Missing keys have a zero mask, odds and probability.
+
+    Raises
+    ------
+    ValueError
+        if the group holds a slug which is not one of `keys`, or names a category
+        differently than `CATEGORY_NAMES`.
+    """
+    group = group or {}
+    for key, item in group.items():
+        if key not in keys:
+            raise ValueError("Unknown demographic category: %s" % key)
+        if item.get("name") is not None and item.get("name") != CATEGORY_NAMES[key]:
+            raise ValueError("The %s category is named %s, expected %s" % (
+                key, item.get("name"), CATEGORY_NAMES[key]
+            ))
+    odds = []
+    probs = []
+    mask = []
+    for key in keys:
+        item = group.get(key)
+        if item is None or item.get("odds") is None:
+            odds.append(0.0)
+            probs.append(0.0)
+            mask.append(0)
+        else:
+            odds.append(item.get("odds"))
+            probs.append(prob_val(item.get("odds")))
+            mask.append(1)
+    return {
+        "odds": odds,
+        "probs": probs,
+        "mask": mask
+    }
+
+
+def normalize_definition(definition):
+    """Function for upgrading a parsed condition or symptom definition to the current schema.
+
+    The nested demographic groups are replaced by their compact form (see `compact_group`).
+    The definition is updated in place and returned.
+    """
+    for group, keys in DEMOGRAPHIC_KEYS.items():
+        definition[group] = compact_group(definition.get(group), keys)
+    # compact form of the version 2 files, now held by the groups themselves
+    definition.pop("demographics", None)
+    definition["schema_version"] = SCHEMA_VERSION
+    return definition
+
+
+def normalize_catalog(data):
+    """Function for upgrading all the definitions of a parsed export to the current schema.
+
+    The definitions are updated in place and `data` is returned.
+    """
+    for definition in data.values():
+        if definition.get("schema_version") != SCHEMA_VERSION:
+            normalize_definition(definition)
+    return data
+
+
+def get_demographics(definition):
+    """Function for getting the compact demographic groups of a definition.
+
+    They are read from the definition when it follows the current schema and
+    computed from its nested groups otherwise.
+    """
+    if definition.get("schema_version") == SCHEMA_VERSION:
+        return {group: definition[group] for group in DEMOGRAPHIC_KEYS.keys()}
+    return {
+        group: compact_group(definition.get(group), keys)
+        for group, keys in DEMOGRAPHIC_KEYS.items()
+    }
+
+
+def has_demographics(group):
+    """Function for checking whether any key of a compact demographic group is defined."""
+    return any(group["mask"])
@@ -0,0 +1,115 @@
+import fnmatch
+import re
+
+from .helpers import load_config
+from .records import ConditionRecord
+
+# priors which affect every condition of the advanced generator
+GLOBAL_PRIORS = ["Age", "Gender", "Race"]
+
+# prior used for the conditions missing from the config, see `AdvancedModuleGenerator`
+DEFAULT_CONDITION_PRIOR = 0.5
+
+
+def changed_priors(previous, current):
+    """Function for finding the conditions whose prior differs between two sets of priors.
+
+    Parameters
+    ----------
+    previous : dict
+        The priors the modules were previously generated with, see `helpers.load_config`.
+    current : dict
+        The current priors.
+
+    Returns
+    -------
+    set
+        the lower cased names of the conditions whose `[Conditions]` prior changed, or
+        None when an age, sex or race prior changed, i.e every condition is affected.
+    """
+    if any(previous[section] != current[section] for section in GLOBAL_PRIORS):
+        return None
+    names = set(previous["Conditions"].keys()) | set(current["Conditions"].keys())
+    return set(
+        name for name in names
+        if previous["Conditions"].get(name, DEFAULT_CONDITION_PRIOR) !=
+        current["Conditions"].get(name, DEFAULT_CONDITION_PRIOR)
+    )
+
+
+def changed_condition_priors(previous_config_file, config_file):
+    """Function for finding the conditions whose prior differs between two config files.
+
+    Parameters
+    ----------
+    previous_config_file : str
+        Path of the config file the modules were previously generated with.
+    config_file : str
+        Path of the current config file.
+
+    Returns
+    -------
+    set
+        see `changed_priors`.
+    """
+    return changed_priors(load_config(previous_config_file), load_config(config_file))
+
+
+class ConditionSelection(object):
+    """
+    Selection of the conditions to generate modules for.
+
+    A condition is selected when it matches any of the criteria.
+
+    Attributes
+    ----------
+    patterns: list
+        Slugs or glob patterns (e.g `otitis-*`) matched against the condition slugs.
+    regex: str
+        Regular expression searched in the condition slugs.
+    changed_names: set
+        Lower cased names of the conditions whose prior changed.
+    """
+    def __init__(self, patterns=None, regex=None, changed_names=None):
+        """
+
+        Parameters
+        ----------
+        patterns: list
+            See class doc
+        regex: str
+            See class doc
+        changed_names: set
+            See class doc
+        """
+        self.patterns = list(patterns or [])
+        self.regex = re.compile(regex) if regex else None
+        self.changed_names = changed_names
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds the selection described by a `GeneratorConfig`, None when every condition
+        is to be generated."""
+        changed_names = None
+        if config.changed_priors_file:
+            changed_names = changed_condition_priors(config.changed_priors_file, config.config_file)
+            if changed_names is None:
+                # the demographic priors changed, every condition is affected
+                return None
+        if config.condition_slugs is None and not config.condition_regex and changed_names is None:
+            return None
+        return cls(config.condition_slugs, config.condition_regex, changed_names)
+
+    def matches(self, slug, name):
+        """Returns whether the condition with the given slug and name is selected."""
+        if any(fnmatch.fnmatchcase(slug, pattern) for pattern in self.patterns):
+            return True
+        if self.regex is not None and self.regex.search(slug):
+            return True
+        return self.changed_names is not None and (name or "").lower() in self.changed_names
+
+    def matches_definition(self, slug, definition):
+        """Returns whether the condition (a parsed definition or its record) is selected."""
+        if isinstance(definition, ConditionRecord):
+            return self.matches(slug, definition.name)
+        return self.matches(slug, definition.get("condition_name"))
@@ -0,0 +1,153 @@
+import time
+from collections import OrderedDict
+
+from .fragments import dumps_compact, dumps_indented
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _non_finite(value):
+    # whether a json value holds a NaN or infinite float
+    if isinstance(value, float):
+        return value != value or value in (float("inf"), -float("inf"))
+    if isinstance(value, dict):
+        return any(_non_finite(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_non_finite(item) for item in value)
+    return False
+
+
+class JsonSerializer(object):
+    """
+    Serializer of modules and parsed data using the standard library, the default one.
+
+    NaN and infinite floats are not valid json and raise a `ValueError`, with every
+    backend.
+
+    Attributes
+    ----------
+    compact: bool
+        Whether to serialize without indentation and with minimal separators instead of
+        the default 4 spaces indentation.
+    """
+    name = "json"
+
+    def __init__(self, compact=False):
+        """
+
+        Parameters
+        ----------
+        compact: bool
+            See class doc
+        """
+        self.compact = compact
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def dumps(self, obj):
+        """Returns the json text of `obj`."""
+        # same text as json.dumps, splicing the cached module fragments
+        if self.compact:
+            return dumps_compact(obj)
+        return dumps_indented(obj)
+
+    def dump(self, obj, fp):
+        """Writes the json text of `obj` to the text file `fp`."""
+        fp.write(self.dumps(obj))
+
+
+class OrjsonSerializer(JsonSerializer):
+    """
+    Serializer using `orjson`, when installed.
+
+    orjson only indents with 2 spaces and, unlike the standard library, writes non ascii
+    characters as is. It writes NaN and infinite floats as null, they are rejected
+    beforehand like with the standard library.
+    """
+    name = "orjson"
+
+    @classmethod
+    def is_available(cls):
+        return orjson is not None
+
+    def dumps(self, obj):
+        option = orjson.OPT_NON_STR_KEYS
+        if not self.compact:
+            option |= orjson.OPT_INDENT_2
+        data = orjson.dumps(obj, option=option)
+        # only values written as null may have been non finite floats
+        if b"null" in data and _non_finite(obj):
+            raise ValueError("Out of range float values are not JSON compliant")
+        return data.decode("utf-8")
+
+
+BACKENDS = OrderedDict([
+    (JsonSerializer.name, JsonSerializer),
+    (OrjsonSerializer.name, OrjsonSerializer),
+])
+
+# the modules do not depend on which optional library is installed
+DEFAULT_BACKEND = JsonSerializer.name
+
+
+def available_backends():
+    """Returns the names of the backends which can be used in this environment."""
+    return [name for name, backend in BACKENDS.items() if backend.is_available()]
+
+
+def get_serializer(backend=DEFAULT_BACKEND, compact=False):
+    """Function for creating a serializer.
+
+    Parameters
+    ----------
+    backend : str
+        Name of the backend in `BACKENDS` (default: "json").
+    compact : bool
+        Whether to serialize without indentation (default: False).
+
+    Returns
+    -------
+    JsonSerializer
+        the serializer.
+    """
+    if backend not in BACKENDS:
+        raise ValueError("Invalid json backend: %s" % backend)
+    if not BACKENDS[backend].is_available():
+        raise ValueError("The %s json backend is not installed" % backend)
+    return BACKENDS[backend](compact)
+
+
+def benchmark(documents, repeat=3):
+    """Function for comparing the available backends on the same documents.
+
+    Parameters
+    ----------
+    documents : list
+        The json serializable documents, e.g generated modules.
+    repeat : int
+        Number of times the documents are serialized, the fastest run is kept (default: 3).
+
+    Returns
+    -------
+    list
+        a `(backend, compact, seconds, documents per second, bytes)` tuple for every
+        backend and mode.
+    """
+    results = []
+    for name in available_backends():
+        for compact in [False, True]:
+            serializer = get_serializer(name, compact)
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                size = sum(len(serializer.dumps(document).encode("utf-8")) for document in documents)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            rate = len(documents) / best if best > 0 else float("inf")
+            results.append((name, compact, best, rate, size))
+    return results
@@ -0,0 +1,207 @@
+import hashlib
+import os
+import re
+import shutil
+
+from .manifest import Manifest
+
+_SHARD_MANIFEST = re.compile(r"^\.symcat_manifest\.shard-(\d+)-of-(\d+)\.jsonl$")
+
+
+def parse_shard(text):
+    """Function for parsing a shard given as `index/count`, e.g `0/4`.
+
+    Returns
+    -------
+    tuple
+        the index and the number of shards.
+    """
+    match = re.match(r"^\s*(\d+)\s*/\s*(\d+)\s*$", text or "")
+    if match is None:
+        raise ValueError("Invalid shard: %s. Expected <index>/<number of shards>" % text)
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or index >= count:
+        raise ValueError("Invalid shard: %s. The index must be lower than the number of shards" % text)
+    return index, count
+
+
+def assign_balanced(costs, count):
+    """Function for assigning conditions to shards so that the shards have similar costs.
+
+    The conditions are taken from the most to the least costly one, each being assigned
+    to the shard with the lowest total cost. Ties are broken on the slug and the shard
+    index so that every run computes the same assignment from the same catalog.
+
+    Parameters
+    ----------
+    costs : dict
+        The estimated cost of every condition, keyed on its slug.
+    count : int
+        Number of shards.
+
+    Returns
+    -------
+    dict
+        the shard index of every condition.
+    """
+    loads = [0] * count
+    shards = {}
+    for slug in sorted(costs.keys(), key=lambda slug: (-costs[slug], slug)):
+        index = min(range(count), key=lambda idx: (loads[idx], idx))
+        loads[index] += costs[slug]
+        shards[slug] = index
+    return shards
+
+
+class Shard(object):
+    """
+    Part of the conditions generated by one of several independent runs, e.g on
+    different machines.
+
+    By default a condition belongs to the shard given by a stable hash of its slug, which
+    only depends on the slug. Balanced shards are assigned from the estimated cost of
+    every condition instead (see `assign_balanced`), every run then needs the whole
+    catalog to compute the same assignment.
+
+    Attributes
+    ----------
+    index: int
+        Index of the shard, from 0 to `count - 1`.
+    count: int
+        Number of shards.
+    balanced: bool
+        Whether the conditions are assigned from their estimated cost.
+    """
+    def __init__(self, index, count, balanced=False):
+        """
+
+        Parameters
+        ----------
+        index: int
+            See class doc
+        count: int
+            See class doc
+        balanced: bool
+            See class doc
+        """
+        if not 0 <= index < count:
+            raise ValueError("Invalid shard %d of %d" % (index, count))
+        self.index = index
+        self.count = count
+        self.balanced = balanced
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds the shard of a `GeneratorConfig`, None when the run is not sharded."""
+        if config.num_shards <= 1:
+            return None
+        return cls(config.shard_index, config.num_shards, config.balance_shards)
+
+    def owns(self, slug):
+        """Returns whether the condition with the given slug belongs to the shard (hashed shards)."""
+        digest = hashlib.sha224(slug.encode("utf-8")).hexdigest()
+        return int(digest[:16], 16) % self.count == self.index
+
+    def select(self, conditions, cost):
+        """Returns the conditions of the shard.
+
+        Parameters
+        ----------
+        conditions : iterable
+            The (slug, condition record) pairs of all the conditions.
+        cost : callable
+            Returns the estimated cost of a condition record, for balanced shards.
+
+        Returns
+        -------
+        list
+            the (slug, condition record) pairs of the conditions of the shard.
+        """
+        if not self.balanced:
+            return [(slug, condition) for slug, condition in conditions if self.owns(slug)]
+        conditions = list(conditions)
+        shards = assign_balanced(
+            {slug: cost(condition) for slug, condition in conditions}, self.count
+        )
+        return [(slug, condition) for slug, condition in conditions if shards[slug] == self.index]
+
+
+def merge_shards(output_dir, shard_dirs, expected_modules=None):
+    """Function for merging the modules generated by the shards of a run.
+
+    The manifests of the shards are combined in the manifest of `output_dir`, into which
+    the modules are copied when they were written in other directories. The merge fails
+    if a shard is missing, if a module was generated by several shards or, when
+    `expected_modules` is given, if a module was not generated at all.
+
+    Parameters
+    ----------
+    output_dir : str
+        Directory of the merged modules.
+    shard_dirs : list
+        The module directories of the shards. Several shards may have written to the
+        same directory.
+    expected_modules : iterable
+        File names of the modules of every condition (default: None).
+
+    Returns
+    -------
+    Manifest
+        the merged manifest.
+    """
+    manifests = {}
+    num_shards = None
+    for shard_dir in sorted(set(os.path.abspath(path) for path in shard_dirs)):
+        for filename in sorted(os.listdir(shard_dir)):
+            match = _SHARD_MANIFEST.match(filename)
+            if match is None:
+                continue
+            index, count = int(match.group(1)), int(match.group(2))
+            if num_shards is None:
+                num_shards = count
+            elif count != num_shards:
+                raise ValueError(
+                    "%s is the manifest of a run in %d shards, not %d"
+                    % (os.path.join(shard_dir, filename), count, num_shards)
+                )
+            if index in manifests:
+                raise ValueError("The manifest of shard %d was found twice" % index)
+            manifests[index] = Manifest(shard_dir, filename).load()
+    if num_shards is None:
+        raise ValueError("No shard manifest found in %s" % ", ".join(shard_dirs))
+    missing_shards = sorted(set(range(num_shards)) - set(manifests.keys()))
+    if missing_shards:
+        raise ValueError("Missing the manifest of shards %s" % ", ".join(map(str, missing_shards)))
+
+    owners = {}
+    duplicates = set()
+    for index in range(num_shards):
+        for module in manifests[index].entries.keys():
+            if module in owners:
+                duplicates.add(module)
+            owners[module] = index
+    if duplicates:
+        raise ValueError("Modules generated by several shards: %s" % ", ".join(sorted(duplicates)))
+    if expected_modules is not None:
+        missing = sorted(set(expected_modules) - set(owners.keys()))
+        if missing:
+            raise ValueError("Modules generated by no shard: %s" % ", ".join(missing))
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_dir = os.path.abspath(output_dir)
+    merged = Manifest(output_dir)
+    for module, index in owners.items():
+        manifest = manifests[index]
+        entry = manifest.entries[module]
+        merged.entries[module] = entry
+        if entry["output"] is not None and manifest.output_dir != output_dir:
+            shutil.copyfile(os.path.join(manifest.output_dir, module), os.path.join(output_dir, module))
+
+    # the history module is only written by the first shard and is in no manifest
+    first_dir = manifests[0].output_dir
+    if first_dir != output_dir:
+        for filename in os.listdir(first_dir):
+            if filename.endswith(".json") and filename not in owners:
+                shutil.copyfile(os.path.join(first_dir, filename), os.path.join(output_dir, filename))
+    merged.save()
+    return merged
@@ -0,0 +1,296 @@
+import io
+import json
+import os
+import queue
+import sys
+import tarfile
+import threading
+import time
+import zipfile
+
+from .serializers import JsonSerializer, get_serializer
+
+DIRECTORY_FORMAT = "dir"
+ZIP_FORMAT = "zip"
+TAR_FORMAT = "tar.gz"
+JSONL_FORMAT = "jsonl"
+STDOUT_FORMAT = "stdout"
+
+OUTPUT_FORMATS = [DIRECTORY_FORMAT, ZIP_FORMAT, TAR_FORMAT, JSONL_FORMAT, STDOUT_FORMAT]
+
+
+class OutputSink(object):
+    """
+    Destination of the generated modules.
+
+    Attributes
+    ----------
+    output_dir: str
+        Directory holding one file per module, None for the sinks bundling all the
+        modules together.
+    serializer: JsonSerializer
+        Serializer of the modules, see `serializers.get_serializer`.
+    """
+    output_dir = None
+    serializer = JsonSerializer()
+
+    def serialize(self, module):
+        """Returns the serialized content of a module."""
+        return self.serializer.dumps(module)
+
+    def is_unchanged(self, name, data):
+        """Returns whether the sink already holds `name` with the serialized `data`."""
+        return False
+
+    def write(self, name, data):
+        """Writes the module file `name` with the serialized `data`."""
+        raise NotImplementedError
+
+    def write_module(self, name, module, on_written=None):
+        """Serializes and writes `module` as the file `name`.
+
+        Parameters
+        ----------
+        name : str
+            File name of the module.
+        module : dict
+            The module to write.
+        on_written : callable
+            Called with the serialized module once it is written (default: None).
+        """
+        self.write_serialized(name, self.serialize(module), on_written)
+
+    def write_serialized(self, name, data, on_written=None):
+        """Writes the module file `name` with the serialized `data`, see `write_module`."""
+        self.write(name, data)
+        if on_written is not None:
+            on_written(data)
+
+    def flush(self):
+        """Waits until all the modules handed to the sink are written."""
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class DirectorySink(OutputSink):
+    """Writes every module to its own file of `output_dir`."""
+
+    def __init__(self, output_dir, serializer=None):
+        self.output_dir = output_dir
+        self.serializer = serializer or self.serializer
+        # several processes may write to the same directory, e.g from a work queue
+        os.makedirs(output_dir, exist_ok=True)
+
+    def is_unchanged(self, name, data):
+        filename = os.path.join(self.output_dir, name)
+        if not os.path.isfile(filename):
+            return False
+        with open(filename) as fp:
+            return fp.read() == data
+
+    def write(self, name, data):
+        with open(os.path.join(self.output_dir, name), "w") as fp:
+            fp.write(data)
+
+
+class ZipSink(OutputSink):
+    """Streams the modules into a single zip archive."""
+
+    def __init__(self, filename, serializer=None):
+        self.serializer = serializer or self.serializer
+        self.archive = zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED)
+
+    def write(self, name, data):
+        self.archive.writestr(name, data)
+
+    def close(self):
+        self.archive.close()
+
+
+class TarSink(OutputSink):
+    """Streams the modules into a single gzip compressed tar archive."""
+
+    def __init__(self, filename, serializer=None):
+        self.serializer = serializer or self.serializer
+        self.archive = tarfile.open(filename, "w:gz")
+
+    def write(self, name, data):
+        data = data.encode("utf-8")
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = time.time()
+        self.archive.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self.archive.close()
+
+
+class JsonlSink(OutputSink):
+    """Writes one `{"name": ..., "module": ...}` object per line to a file or a stream.
+
+    The modules are always serialized in compact mode.
+    """
+
+    def __init__(self, filename=None, stream=None, serializer=None):
+        self.serializer = get_serializer((serializer or self.serializer).name, compact=True)
+        self.stream = stream if stream is not None else open(filename, "w")
+        self.owned = stream is None
+
+    def write(self, name, data):
+        self.stream.write('{"name": %s, "module": %s}\n' % (json.dumps(name), data))
+
+    def close(self):
+        if self.owned:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+
+class QueuedSink(OutputSink):
+    """
+    Sink serializing and writing the modules of another sink in a background thread.
+
+    The modules handed to `write_module` are queued, so that the generator builds the
+    next modules while the previous ones are written. The queue is bounded: once
+    `max_pending` modules wait to be written, `write_module` blocks until the writer
+    catches up. An error raised while writing is raised again by the next call to
+    `write_module`, `flush` or `close`, the modules queued after it are dropped.
+
+    Attributes
+    ----------
+    sink: OutputSink
+        The sink the modules are written to.
+    max_pending: int
+        Maximum number of modules waiting to be written.
+    """
+    _STOP = object()
+
+    def __init__(self, sink, max_pending=16):
+        """
+
+        Parameters
+        ----------
+        sink: OutputSink
+            See class doc
+        max_pending: int
+            See class doc
+        """
+        self.sink = sink
+        self.output_dir = sink.output_dir
+        self.serializer = sink.serializer
+        self.max_pending = max_pending
+        self.error = None
+        self.failed = False
+        self.queue = queue.Queue(max_pending)
+        self.thread = threading.Thread(target=self._run, name="module-writer")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is self._STOP:
+                    return
+                if not self.failed:
+                    function, args = item
+                    function(*args)
+            except BaseException as error:
+                self.error = error
+                self.failed = True
+            finally:
+                self.queue.task_done()
+
+    def _raise_error(self):
+        # the error is only raised once, later modules are still dropped
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def serialize(self, module):
+        return self.sink.serialize(module)
+
+    def is_unchanged(self, name, data):
+        return self.sink.is_unchanged(name, data)
+
+    def write(self, name, data):
+        self._raise_error()
+        self.queue.put((self.sink.write, (name, data)))
+
+    def write_module(self, name, module, on_written=None):
+        self._raise_error()
+        self.queue.put((self.sink.write_module, (name, module, on_written)))
+
+    def write_serialized(self, name, data, on_written=None):
+        self._raise_error()
+        self.queue.put((self.sink.write_serialized, (name, data, on_written)))
+
+    def flush(self):
+        self.queue.join()
+        self._raise_error()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(self._STOP)
+            self.thread.join()
+        self.sink.close()
+        self._raise_error()
+
+
+def default_output_file(output_dir, output_format):
+    """Returns the path of the archive used for `output_format` when none is given."""
+    return "%s.%s" % (output_dir.rstrip("/" + os.sep), output_format)
+
+
+def open_sink(output_format, output_dir, output_file="", max_pending=0, serializer=None):
+    """Function for opening the sink of an output format.
+
+    Parameters
+    ----------
+    output_format : str
+        One of `OUTPUT_FORMATS`.
+    output_dir : str
+        Directory of the modules for the directory format.
+    output_file : str
+        Path of the archive for the zip, tar.gz and jsonl formats. Defaults to
+        `output_dir` with the format as extension (default: "").
+    max_pending : int
+        If positive, the modules are written in a background thread with at most
+        `max_pending` modules waiting to be written, see `QueuedSink` (default: 0).
+    serializer : JsonSerializer
+        Serializer of the modules. The standard library with a 4 spaces indentation is
+        used when None (default: None).
+
+    Returns
+    -------
+    OutputSink
+        the opened sink.
+    """
+    sink = _open_sink(output_format, output_dir, output_file, serializer)
+    if max_pending > 0:
+        return QueuedSink(sink, max_pending)
+    return sink
+
+
+def _open_sink(output_format, output_dir, output_file, serializer):
+    if output_format == DIRECTORY_FORMAT:
+        return DirectorySink(output_dir, serializer)
+    if output_format == STDOUT_FORMAT:
+        return JsonlSink(stream=sys.stdout, serializer=serializer)
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError("Invalid output format: %s" % output_format)
+    if not output_file:
+        output_file = default_output_file(output_dir, output_format)
+    if output_format == ZIP_FORMAT:
+        return ZipSink(output_file, serializer)
+    if output_format == TAR_FORMAT:
+        return TarSink(output_file, serializer)
+    return JsonlSink(output_file, serializer=serializer)
@@ -0,0 +1,473 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from .records import ConditionRecord, Demographics, SymptomEdge, SymptomRecord, \
+    load_conditions, load_symptoms, SYMPTOM_FIELDS
+from .registry import REGISTRY
+from .schema import category_names, DEMOGRAPHIC_KEYS
+from .streaming import iter_jsonl_entries, iter_parsed, JSONL_EXTENSION
+
+# bump whenever the layout of the snapshot changes
+SNAPSHOT_VERSION = 3
+
+SNAPSHOT_MAGIC = b"SYMCATSN"
+
+SYMPTOMS = "symptoms"
+CONDITIONS = "conditions"
+
+_KINDS = [SYMPTOMS, CONDITIONS]
+
+# magic, version, byte order (0: little, 1: big), kind, number of entries
+_HEADER = struct.Struct("<8sHBBI")
+
+# typecode and size in bytes of a serialized array
+_ARRAY_HEADER = struct.Struct("<cQ")
+
+_BYTE_ORDER = 0 if sys.byteorder == "little" else 1
+
+# string fields of each entry, in the order they are stored
+_SYMPTOM_FIELDS = ["slug", "name", "hash", "description"]
+_CONDITION_FIELDS = ["slug", "name", "hash", "description", "remarks"]
+
+# Layout of a snapshot file, every array is stored as its typecode, size and raw bytes:
+#   header          magic, version, byte order, kind and number of entries
+#   string table    byte offsets (I) and utf-8 text (B) of all the strings. Index 0
+#                   stands for None.
+#   keys            string index of the key of each entry (I)
+#   fields          string index of each field of each entry (I)
+#   demographics    for each of sex, age and race: odds (d), probs (d) and mask (B) of
+#                   every category of every entry. The category names are those of
+#                   `schema.CATEGORY_NAMES`.
+#   edges           offsets (I) of the edges of each entry, then their slugs (I), values
+#                   (q or d) and, for common causes, names (I)
+
+
+class StringTable(object):
+    """Collects the distinct strings of a snapshot and assigns them an index."""
+
+    def __init__(self):
+        self.strings = [None]
+        self.index = {None: 0}
+
+    def add(self, value):
+        idx = self.index.get(value)
+        if idx is None:
+            idx = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return idx
+
+    def to_arrays(self):
+        offsets = array("I", [0])
+        for value in self.strings[1:]:
+            offsets.append(offsets[-1] + len(value.encode("utf-8")))
+        text = "".join(self.strings[1:]).encode("utf-8")
+        return offsets, array("B", text)
+
+
+def _write_array(fp, values):
+    data = values.tobytes()
+    fp.write(_ARRAY_HEADER.pack(values.typecode.encode("ascii"), len(data)))
+    fp.write(data)
+
+
+def _number_array(values):
+    # integer values (e.g the condition symptom probabilities) keep their type
+    if all(type(value) is int for value in values):
+        return array("q", values)
+    return array("d", values)
+
+
+def is_snapshot(filename):
+    """Function for checking whether `filename` holds a binary snapshot."""
+    with open(filename, "rb") as fp:
+        return fp.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+def write_snapshot(filename, kind, data):
+    """Function for writing parsed symptoms or conditions as a binary snapshot.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the snapshot file.
+    kind : str
+        Either `SYMPTOMS` or `CONDITIONS`.
+    data : dict
+        The parsed definitions (dictionaries or records), keyed on their slug. The
+        demographic groups which were not loaded in the records are written without data.
+    """
+    if kind == SYMPTOMS:
+        records = load_symptoms(data)
+        fields = _SYMPTOM_FIELDS
+    elif kind == CONDITIONS:
+        records = load_conditions(data)
+        fields = _CONDITION_FIELDS
+    else:
+        raise ValueError("Invalid snapshot kind: %s" % kind)
+
+    table = StringTable()
+    keys = array("I", [table.add(key) for key in records.keys()])
+    values = list(records.values())
+    field_idx = array("I", [
+        table.add(getattr(record, field)) for record in values for field in fields
+    ])
+
+    groups = []
+    for group in DEMOGRAPHIC_KEYS.keys():
+        odds = array("d")
+        probs = array("d")
+        mask = array("B")
+        size = len(DEMOGRAPHIC_KEYS[group])
+        for record in values:
+            demographics = getattr(record, group)
+            if demographics is None:
+                # group which was not loaded (see `records.load_symptom`)
+                odds.extend([0.0] * size)
+                probs.extend([0.0] * size)
+                mask.frombytes(bytes(size))
+                continue
+            odds.extend(demographics.odds)
+            probs.extend(demographics.probs)
+            mask.frombytes(bytes(demographics.mask))
+        groups.append((odds, probs, mask))
+
+    offsets = array("I", [0])
+    edge_slugs = array("I")
+    edge_values = []
+    edge_names = array("I")
+    for record in values:
+        if kind == CONDITIONS:
+            for edge in record.symptoms:
+                edge_slugs.append(table.add(edge.slug))
+                edge_values.append(edge.probability)
+        else:
+            for slug, cause in (record.common_causes or {}).items():
+                edge_slugs.append(table.add(slug))
+                edge_values.append(cause.get("probability"))
+                edge_names.append(table.add(cause.get("name")))
+        offsets.append(len(edge_slugs))
+
+    string_offsets, text = table.to_arrays()
+    tmp_filename = "%s.tmp" % filename
+    with open(tmp_filename, "wb") as fp:
+        fp.write(_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _BYTE_ORDER, _KINDS.index(kind), len(records)
+        ))
+        for values_array in [string_offsets, text, keys, field_idx]:
+            _write_array(fp, values_array)
+        for group_arrays in groups:
+            for values_array in group_arrays:
+                _write_array(fp, values_array)
+        for values_array in [offsets, edge_slugs, _number_array(edge_values), edge_names]:
+            _write_array(fp, values_array)
+    # replace the previous snapshot only once the new one is complete
+    os.replace(tmp_filename, filename)
+
+
+def _parse(buffer, name):
+    # returns the kind, number of entries and arrays of the snapshot held in `buffer`,
+    # the arrays are views on the buffer unless their byte order must be swapped
+    view = memoryview(buffer)
+    magic, version, byte_order, kind_idx, count = _HEADER.unpack_from(view)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("%s is not a Symcat snapshot" % name)
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(
+            "%s uses snapshot version %d, version %d is required. Parse the export again"
+            % (name, version, SNAPSHOT_VERSION)
+        )
+    swap = byte_order != _BYTE_ORDER
+    offset = _HEADER.size
+    arrays = []
+    while offset < len(view):
+        typecode, size = _ARRAY_HEADER.unpack_from(view, offset)
+        offset += _ARRAY_HEADER.size
+        data = view[offset:offset + size]
+        offset += size
+        typecode = typecode.decode("ascii")
+        if swap and array(typecode).itemsize > 1:
+            values = array(typecode)
+            values.frombytes(data)
+            values.byteswap()
+        else:
+            values = data.cast(typecode)
+        arrays.append(values)
+    return _KINDS[kind_idx], count, arrays
+
+
+class SnapshotView(Mapping):
+    """
+    Read-only mapping over a snapshot held in memory, e.g a memory-mapped file.
+
+    Nothing is decoded up front: the record of an entry is built from the buffer each
+    time it is accessed and released with it, so that the memory used by a view does not
+    depend on the size of the snapshot. The processes which map the same snapshot file
+    share its pages instead of holding a copy of the catalog each.
+
+    Attributes
+    ----------
+    kind: str
+        Either `SYMPTOMS` or `CONDITIONS`.
+    fields: tuple
+        For symptoms, the optional fields of the records (see `records.load_symptom`).
+    """
+
+    def __init__(self, buffer, fields=None, name="<buffer>"):
+        """
+
+        Parameters
+        ----------
+        buffer : bytes-like
+            The content of the snapshot file.
+        fields : tuple
+            See class doc, all the fields are loaded when None (default: None).
+        name : str
+            Name of the snapshot in error messages (default: "<buffer>").
+        """
+        self.kind, self._count, arrays = _parse(buffer, name)
+        if self.kind == CONDITIONS or fields is None:
+            fields = SYMPTOM_FIELDS
+        self.fields = fields
+        self._string_offsets, self._text, self._keys, self._field_idx = arrays[:4]
+        self._groups = [arrays[4 + 3 * idx:7 + 3 * idx] for idx in range(len(DEMOGRAPHIC_KEYS))]
+        self._offsets, self._edge_slugs, self._edge_values, self._edge_names = arrays[13:]
+        self._index = None
+
+    def _string(self, idx):
+        if idx == 0:
+            return None
+        start = self._string_offsets[idx - 1]
+        end = self._string_offsets[idx]
+        return REGISTRY.intern(bytes(self._text[start:end]).decode("utf-8"))
+
+    def strings(self):
+        """Returns every string of the snapshot, by index."""
+        data = self._text.tobytes()
+        offsets = self._string_offsets.tolist()
+        text = data.decode("utf-8")
+        if len(text) == len(data):
+            # ascii text, the byte offsets are character offsets
+            strings = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+        else:
+            strings = [data[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+        return [None] + list(map(sys.intern, strings))
+
+    def record(self, idx):
+        """Builds the record of the entry at position `idx`.
+
+        Parameters
+        ----------
+        idx : int
+            Position of the entry in the snapshot.
+        """
+        string = self._string
+        demographics = []
+        for (group, keys), (odds, probs, mask) in zip(DEMOGRAPHIC_KEYS.items(), self._groups):
+            if group not in self.fields:
+                demographics.append(None)
+                continue
+            size = len(odds) // self._count
+            start = idx * size
+            end = start + size
+            demographics.append(Demographics.build(
+                array("d", odds[start:end]), array("d", probs[start:end]),
+                category_names(keys), bytes(mask[start:end])
+            ))
+        sex, age, race = demographics
+
+        edges = range(self._offsets[idx], self._offsets[idx + 1])
+        if self.kind == SYMPTOMS:
+            num_fields = len(_SYMPTOM_FIELDS)
+            slug, name, code, description = [
+                string(i) for i in self._field_idx[idx * num_fields:(idx + 1) * num_fields]
+            ]
+            if "description" not in self.fields:
+                description = None
+            common_causes = None
+            if "common_causes" in self.fields:
+                common_causes = OrderedDict()
+                for jdx in edges:
+                    cause_slug = string(self._edge_slugs[jdx])
+                    common_causes[cause_slug] = {
+                        "name": string(self._edge_names[jdx]),
+                        "slug": cause_slug,
+                        "probability": self._edge_values[jdx]
+                    }
+            return SymptomRecord(
+                slug, name, REGISTRY.register(slug, code), description,
+                sex, age, race, common_causes
+            )
+        num_fields = len(_CONDITION_FIELDS)
+        slug, name, code, description, remarks = [
+            string(i) for i in self._field_idx[idx * num_fields:(idx + 1) * num_fields]
+        ]
+        symptoms = tuple(
+            SymptomEdge(string(self._edge_slugs[jdx]), self._edge_values[jdx]) for jdx in edges
+        )
+        return ConditionRecord(
+            slug, name, description, remarks, REGISTRY.register(slug, code),
+            sex, age, race, symptoms
+        )
+
+    def records(self):
+        """Builds the records of every entry at once.
+
+        Every array of the snapshot is converted once and sliced for each entry, rather
+        than decoded entry by entry like `record` does.
+
+        Returns
+        -------
+        OrderedDict
+            the records, keyed on their slug.
+        """
+        strings = self.strings()
+        count = self._count
+        demographics = []
+        for (group, keys), (odds, probs, mask) in zip(DEMOGRAPHIC_KEYS.items(), self._groups):
+            if group not in self.fields:
+                demographics.append([None] * count)
+                continue
+            demographics.append(Demographics.build_all(
+                array("d", odds), array("d", probs), category_names(keys), bytes(mask)
+            ))
+
+        values = [strings[idx] for idx in self._field_idx]
+        offsets = self._offsets.tolist()
+        edge_slugs = [strings[idx] for idx in self._edge_slugs]
+        edge_values = self._edge_values.tolist()
+        register = REGISTRY.register
+        records = OrderedDict()
+        if self.kind == SYMPTOMS:
+            num_fields = len(_SYMPTOM_FIELDS)
+            with_description = "description" in self.fields
+            with_causes = "common_causes" in self.fields
+            if with_causes:
+                causes = [
+                    {"name": strings[name], "slug": slug, "probability": value}
+                    for name, slug, value in zip(self._edge_names, edge_slugs, edge_values)
+                ]
+            for pos, (key, sex, age, race) in enumerate(zip(self._keys, *demographics)):
+                slug, name, code, description = values[pos * num_fields:(pos + 1) * num_fields]
+                common_causes = None
+                if with_causes:
+                    common_causes = OrderedDict(
+                        (cause["slug"], cause) for cause in causes[offsets[pos]:offsets[pos + 1]]
+                    )
+                records[strings[key]] = SymptomRecord(
+                    slug, name, register(slug, code),
+                    description if with_description else None,
+                    sex, age, race, common_causes
+                )
+            return records
+
+        num_fields = len(_CONDITION_FIELDS)
+        edges = list(map(SymptomEdge, edge_slugs, edge_values))
+        for pos, (key, sex, age, race) in enumerate(zip(self._keys, *demographics)):
+            slug, name, code, description, remarks = \
+                values[pos * num_fields:(pos + 1) * num_fields]
+            records[strings[key]] = ConditionRecord(
+                slug, name, description, remarks, register(slug, code),
+                sex, age, race, tuple(edges[offsets[pos]:offsets[pos + 1]])
+            )
+        return records
+
+    def __getitem__(self, key):
+        if self._index is None:
+            self._index = {self._string(idx): pos for pos, idx in enumerate(self._keys)}
+        return self.record(self._index[key])
+
+    def __iter__(self):
+        return (self._string(idx) for idx in self._keys)
+
+    def __len__(self):
+        return self._count
+
+
+def open_snapshot(filename, fields=None):
+    """Function for mapping a snapshot file in memory, see `SnapshotView`.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the snapshot file.
+    fields : tuple
+        For symptoms, the optional fields to load (default: None).
+
+    Returns
+    -------
+    SnapshotView
+        the records of the snapshot, decoded on access.
+    """
+    with open(filename, "rb") as fp:
+        buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    return SnapshotView(buffer, fields, filename)
+
+
+def read_snapshot(filename, fields=None):
+    """Function for loading a binary snapshot written by `write_snapshot`.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the snapshot file.
+    fields : tuple
+        For symptoms, the optional fields to load (see `records.load_symptom`). All
+        the fields are loaded when None (default: None).
+
+    Returns
+    -------
+    kind: str
+        Either `SYMPTOMS` or `CONDITIONS`.
+    records: OrderedDict
+        The `SymptomRecord` or `ConditionRecord` of every entry, keyed on their slug.
+    """
+    with open(filename, "rb") as fp:
+        view = SnapshotView(fp.read(), fields, filename)
+    return view.kind, view.records()
+
+
+def load_parsed(filename):
+    """Function for loading parsed symptoms or conditions from a json, jsonl or snapshot file.
+
+    Snapshots are detected from their content, whatever the file extension.
+    """
+    if is_snapshot(filename):
+        return read_snapshot(filename)[1]
+    if os.path.splitext(filename)[1] == JSONL_EXTENSION:
+        return OrderedDict(iter_jsonl_entries(filename))
+    with open(filename) as fp:
+        return json.load(fp)
+
+
+def load_parsed_symptoms(filename, fields=None, slugs=None):
+    """Function for loading the records of parsed symptoms, keeping only some fields.
+
+    Json and jsonl files are read one symptom at a time so that the fields which are
+    not loaded (see `records.load_symptom`) are never all held in memory.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the json, jsonl or snapshot file.
+    fields : tuple
+        The optional fields to load, all of them when None (default: None).
+    slugs : set
+        If provided, only these symptoms are loaded (default: None).
+    """
+    if is_snapshot(filename):
+        records = read_snapshot(filename, fields)[1]
+        if slugs is None:
+            return records
+        return OrderedDict(
+            (slug, record) for slug, record in records.items() if slug in slugs
+        )
+    items = iter_parsed(filename)
+    if slugs is not None:
+        items = ((slug, definition) for slug, definition in items if slug in slugs)
+    return load_symptoms(items, fields)
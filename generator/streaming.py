@@ -0,0 +1,129 @@
+import json
+import os
+
+JSONL_EXTENSION = ".jsonl"
+
+_WHITESPACE = " \t\n\r"
+
+
+class _ChunkReader(object):
+    """Buffered reader handing out the text of a file chunk by chunk."""
+
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Appends the next chunk to the buffer, dropping the consumed text. False at EOF."""
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_whitespace(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return
+
+    def peek(self):
+        self.skip_whitespace()
+        if self.pos >= len(self.buffer):
+            raise ValueError("Unexpected end of json file")
+        return self.buffer[self.pos]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("Expected '%s' at '%s'" % (char, self.buffer[self.pos:self.pos + 20]))
+        self.pos += 1
+
+    def decode(self, decoder):
+        """Decodes the next json value, reading more chunks until it is complete."""
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                if not self.fill():
+                    raise
+                continue
+            # the value might continue in the next chunk (e.g a number)
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_entries(filename, chunk_size=1 << 16):
+    """Function for iterating over the entries of a top level json object without loading it.
+
+    Only one entry is held in memory at a time.
+
+    Parameters
+    ----------
+    filename : str
+        Path to a json file holding an object, e.g the parsed `conditions.json`.
+    chunk_size : int
+        Number of characters read at a time (default: 65536).
+
+    Yields
+    ------
+    tuple
+        the key and the decoded value of every entry, in the file order.
+    """
+    decoder = json.JSONDecoder()
+    with open(filename) as fp:
+        reader = _ChunkReader(fp, chunk_size)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            key = reader.decode(decoder)
+            reader.expect(":")
+            yield key, reader.decode(decoder)
+            if reader.peek() == "}":
+                return
+            reader.expect(",")
+
+
+def iter_jsonl_entries(filename):
+    """Function for iterating over the entries of a file written by `write_jsonl`."""
+    with open(filename) as fp:
+        for line in fp:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            for key, value in entry.items():
+                yield key, value
+
+
+def write_jsonl(filename, data):
+    """Function for writing parsed data with one `{slug: definition}` object per line.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the output file.
+    data : dict
+        The parsed definitions, keyed on their slug.
+    """
+    with open(filename, "w") as fp:
+        for key, value in data.items():
+            fp.write(json.dumps({key: value}))
+            fp.write("\n")
+
+
+def iter_parsed(filename):
+    """Function for iterating over the entries of a parsed json or jsonl file."""
+    if os.path.splitext(filename)[1] == JSONL_EXTENSION:
+        return iter_jsonl_entries(filename)
+    return iter_json_entries(filename)
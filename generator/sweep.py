@@ -0,0 +1,222 @@
+import copy
+import itertools
+import os
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .generator import Generator, BASIC_MODULE_GENERATOR
+from .helpers import load_config
+from .records import load_conditions, load_symptoms
+from .scheduling import shared_catalog
+from .sinks import STDOUT_FORMAT
+from .snapshot import open_snapshot
+
+# state of the worker processes, set once by `_init_worker`
+_worker = {}
+
+
+class PriorsVariant(object):
+    """
+    One of the sets of priors of a sweep.
+
+    Attributes
+    ----------
+    name: str
+        Name of the variant, which is also the name of its output directory.
+    priors: dict
+        The priors of the variant, see `helpers.load_config`.
+    """
+    __slots__ = ("name", "priors")
+
+    def __init__(self, name, priors):
+        """
+
+        Parameters
+        ----------
+        name: str
+            See class doc
+        priors: dict
+            See class doc
+        """
+        self.name = name
+        self.priors = priors
+
+
+def parse_grid(specs):
+    """Function for parsing the parameters of a sweep grid.
+
+    Every parameter is given as `<section>.<key>=<value>,<value>,...`, the section being
+    one of those of the config file, e.g `Gender.sex-male=0.45,0.5` or
+    `Conditions.appendicitis=0.1,0.2`.
+
+    Returns
+    -------
+    list
+        the (section, key, values) of every parameter.
+    """
+    grid = []
+    for spec in specs or []:
+        match = re.match(r"^\s*(\w+)\.([^=]+?)\s*=(.+)$", spec)
+        if match is None:
+            raise ValueError(
+                "Invalid grid parameter: %s. Expected <section>.<key>=<value>,<value>,..." % spec
+            )
+        values = [value.strip() for value in match.group(3).split(",") if value.strip()]
+        if not values:
+            raise ValueError("The grid parameter %s has no value" % spec)
+        grid.append((match.group(1), match.group(2).strip(), values))
+    return grid
+
+
+def variant_name(parts):
+    """Returns the name of a variant from its parts, usable as a file name."""
+    return re.sub(r"[^\w.=-]+", "-", "_".join(parts))
+
+
+def sweep_variants(config_files=None, grid=None):
+    """Function for building the variants of a sweep.
+
+    Every config file gives a variant named after the file. With a grid, every config
+    file, or the default priors when no file is given, gives a variant per combination of
+    the grid values, which replace the values of the file before the priors are
+    normalized.
+
+    Parameters
+    ----------
+    config_files : list
+        Paths of the config files of the priors (default: None).
+    grid : list
+        The (section, key, values) parameters of the grid, see `parse_grid`
+        (default: None).
+
+    Returns
+    -------
+    list
+        the `PriorsVariant` of the sweep.
+    """
+    config_files = list(config_files or [])
+    grid = grid or []
+    if not config_files and not grid:
+        raise ValueError("A sweep needs config files or a grid")
+
+    variants = []
+    names = set()
+    for config_file in config_files or [""]:
+        base = os.path.splitext(os.path.basename(config_file))[0] if config_file else "default"
+        for values in itertools.product(*[values for _, _, values in grid]):
+            overrides = {}
+            parts = [base] if config_file or not grid else []
+            for (section, key, _), value in zip(grid, values):
+                overrides.setdefault(section, {})[key] = value
+                parts.append("%s=%s" % (key, value))
+            name = variant_name(parts)
+            if name in names:
+                raise ValueError("Several variants of the sweep are named %s" % name)
+            names.add(name)
+            variants.append(PriorsVariant(name, load_config(config_file, overrides)))
+    return variants
+
+
+def variant_config(config, variant):
+    """Returns a copy of `config` generating the modules of `variant`.
+
+    The modules of a variant are written in the `<output_dir>/<variant name>` directory or,
+    for the archive formats, in the `<output_dir>/<variant name>.<format>` archive.
+    """
+    config = copy.copy(config)
+    config.priors = variant.priors
+    config.output_dir = os.path.join(config.output_dir, variant.name)
+    config.output_file = ""
+    # the variants are generated in parallel instead of their modules
+    config.num_workers = 1
+    return config
+
+
+def _generate_variant(config, symptoms, conditions, likelihoods):
+    start = time.perf_counter()
+    generator = Generator(config)
+    module_generator = generator.create_module_generator()
+    module_generator.likelihood_cache = likelihoods
+    generator.generate(symptoms, conditions, module_generator)
+    return time.perf_counter() - start
+
+
+def _init_worker(symptoms_file, conditions_file, symptom_fields):
+    # the records are decoded from the mapped snapshot on access, like in
+    # `scheduling._init_worker`, rather than copied in every worker
+    _worker["symptoms"] = open_snapshot(symptoms_file, symptom_fields)
+    _worker["conditions"] = open_snapshot(conditions_file)
+    _worker["likelihoods"] = {}
+
+
+def _generate_in_worker(config):
+    return _generate_variant(
+        config, _worker["symptoms"], _worker["conditions"], _worker["likelihoods"]
+    )
+
+
+def generate_sweep(config, variants, symptoms=None, conditions=None):
+    """Function for generating the modules of every variant of a sweep.
+
+    The catalog is loaded once for all the variants, and the likelihood tables of the
+    conditions and their symptoms, which do not depend on the priors (see
+    `AdvancedModuleGenerator.symptom_likelihoods`), are computed once and reused by every
+    variant. Only the parts of the modules which depend on the priors are computed for
+    each variant.
+
+    With `config.num_workers` workers, the variants are generated in parallel by worker
+    processes mapping the same catalog (see `scheduling.shared_catalog`). Each worker
+    computes the likelihood tables once for the variants it generates.
+
+    Parameters
+    ----------
+    config : GeneratorConfig
+        Config shared by the variants, see `variant_config`.
+    variants : list
+        The `PriorsVariant` to generate.
+    symptoms, conditions : dict
+        The parsed symptoms and conditions (definitions or records). Loaded from the
+        files of the config when not provided.
+
+    Returns
+    -------
+    OrderedDict
+        the generation time in seconds of every variant, keyed on its name.
+    """
+    if config.generator_mode == BASIC_MODULE_GENERATOR:
+        raise ValueError("The basic modules do not depend on the priors")
+    if config.output_format == STDOUT_FORMAT:
+        raise ValueError("The variants of a sweep must be written to separate outputs")
+
+    os.makedirs(config.output_dir, exist_ok=True)
+    generator = Generator(config)
+    symptom_fields = generator.create_module_generator().symptom_fields
+    if symptoms is None or conditions is None:
+        symptoms, conditions = generator.load_catalog()
+    else:
+        symptoms, conditions = load_symptoms(symptoms, symptom_fields), load_conditions(conditions)
+
+    configs = OrderedDict(
+        (variant.name, variant_config(config, variant)) for variant in variants
+    )
+    times = OrderedDict()
+    if config.num_workers <= 1 or len(configs) <= 1:
+        likelihoods = {}
+        for name, variant in configs.items():
+            times[name] = _generate_variant(variant, symptoms, conditions, likelihoods)
+        return times
+
+    with shared_catalog(symptoms, conditions) as (symptoms_file, conditions_file):
+        with ProcessPoolExecutor(
+                max_workers=min(config.num_workers, len(configs)), initializer=_init_worker,
+                initargs=(symptoms_file, conditions_file, symptom_fields)
+        ) as executor:
+            futures = {
+                executor.submit(_generate_in_worker, variant): name
+                for name, variant in configs.items()
+            }
+            for future in as_completed(futures):
+                times[futures[future]] = future.result()
+    return OrderedDict((name, times[name]) for name in configs.keys())
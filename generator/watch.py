@@ -0,0 +1,98 @@
+import os
+import time
+
+
+class FileWatcher(object):
+    """
+    Detects the changes of files from their modification time and size.
+
+    Attributes
+    ----------
+    filenames: list
+        Paths of the watched files.
+    """
+    def __init__(self, filenames):
+        """
+
+        Parameters
+        ----------
+        filenames: list
+            See class doc, empty paths are ignored
+        """
+        self.filenames = [filename for filename in filenames if filename]
+        self._versions = self._current_versions()
+
+    def _current_versions(self):
+        versions = {}
+        for filename in self.filenames:
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                # e.g replaced by an editor
+                versions[filename] = None
+                continue
+            versions[filename] = (stat.st_mtime_ns, stat.st_size)
+        return versions
+
+    def changed(self):
+        """Returns the files which changed since the previous call."""
+        versions = self._current_versions()
+        changed = [
+            filename for filename in self.filenames
+            if versions[filename] != self._versions[filename] and versions[filename] is not None
+        ]
+        self._versions = versions
+        return changed
+
+
+def watch(service, catalog_files, parse_catalog=None, interval=1.0, report=print, stop=None):
+    """Function for regenerating the modules affected by every change of the inputs.
+
+    The modules are generated once, then the catalog files and the config file of the
+    priors are checked every `interval` seconds. When one of them changes, only the
+    modules it affects are generated again, see `daemon.GenerationService`. An input
+    which cannot be read (e.g a file being written) is reported and read again on its
+    next change.
+
+    Parameters
+    ----------
+    service : GenerationService
+        The service holding the catalog and the priors in memory.
+    catalog_files : list
+        The files of the catalog, e.g the Symcat CSV exports.
+    parse_catalog : callable
+        Returns the parsed `(symptoms, conditions)` from the catalog files. When None,
+        the service loads the catalog from the files of its config (default: None).
+    interval : float
+        Number of seconds between two checks of the files (default: 1.0).
+    report : callable
+        Called with a message after every generation or error (default: print).
+    stop : callable
+        Returns whether to stop watching, checked after every interval. The function
+        watches until interrupted when None (default: None).
+    """
+    watcher = FileWatcher(list(catalog_files) + [service.config.config_file])
+    # None before the modules are first generated
+    changed = None
+    while True:
+        if changed is None or changed:
+            catalog_changed = changed is None or any(
+                filename in catalog_files for filename in changed
+            )
+            try:
+                if parse_catalog is not None and catalog_changed:
+                    service.update_catalog(*parse_catalog())
+                result = service.generate()
+            except (OSError, ValueError, KeyError, AssertionError) as error:
+                # load_config asserts that the condition priors are probabilities
+                report("Could not generate the modules: %s" % error)
+            else:
+                report("%s: generated %d modules in %.2fs" % (
+                    "inputs" if changed is None else
+                    ", ".join(os.path.basename(filename) for filename in changed),
+                    result["modules"], result["seconds"]
+                ))
+        if stop is not None and stop():
+            return
+        time.sleep(interval)
+        changed = watcher.changed()
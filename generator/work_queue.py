@@ -0,0 +1,217 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+CLAIMS_DIR = "claims"
+DONE_DIR = "done"
+
+
+class WorkQueue(object):
+    """
+    Queue of the modules to generate shared by generator processes through a directory.
+
+    Every process computes the same list of tasks from the same inputs and claims them
+    one at a time by creating a claim file, which only one process can do. Once its
+    module is written, a task is marked as done with the digest of the written module.
+    While a process runs the queue, it renews its claims every `renew_interval` seconds.
+    The claims of a process which stopped are taken over by the others once they are
+    older than `lease_timeout`, so processes on any host sharing the directory can join
+    or leave at any time. A task is identified by its module name and the digest of its
+    inputs, so the tasks of a run never collide with those of a run on other inputs.
+
+    Attributes
+    ----------
+    queue_dir: str
+        The shared directory.
+    worker_id: str
+        Identifier of the process in the claims, its host name and pid by default.
+    lease_timeout: float
+        Age in seconds after which the claim of a task which is not done is taken over.
+    poll_interval: float
+        Time in seconds between two checks of the tasks claimed by other processes.
+    renew_interval: float
+        Time in seconds between two renewals of the claims of the process, a quarter of
+        `lease_timeout` by default.
+    """
+    def __init__(self, queue_dir, worker_id=None, lease_timeout=600, poll_interval=1.0,
+                 renew_interval=None):
+        """
+
+        Parameters
+        ----------
+        queue_dir: str
+            See class doc
+        worker_id: str
+            See class doc
+        lease_timeout: float
+            See class doc (default: 600)
+        poll_interval: float
+            See class doc (default: 1.0)
+        renew_interval: float
+            See class doc (default: None)
+        """
+        self.queue_dir = queue_dir
+        self.worker_id = worker_id or "%s-%d" % (socket.gethostname(), os.getpid())
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self.renew_interval = renew_interval or lease_timeout / 4.0
+        # token written in each claim the process holds, keyed on the claim path
+        self._claims = {}
+        self._lock = threading.Lock()
+        for name in [CLAIMS_DIR, DONE_DIR]:
+            os.makedirs(os.path.join(queue_dir, name), exist_ok=True)
+
+    def _path(self, kind, module, inputs):
+        return os.path.join(self.queue_dir, kind, "%s.%s" % (module, inputs))
+
+    def done_entry(self, module, inputs):
+        """Returns the `{inputs, output}` entry of a done task, None if it is not done."""
+        try:
+            with open(self._path(DONE_DIR, module, inputs)) as fp:
+                entry = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        return {"inputs": entry["inputs"], "output": entry["output"]}
+
+    def claim(self, module, inputs):
+        """Claims a task, returns whether the calling process is to generate it.
+
+        Parameters
+        ----------
+        module : str
+            File name of the module.
+        inputs : str
+            Digest of the inputs of the module, see `manifest.inputs_digest`.
+        """
+        path = self._path(CLAIMS_DIR, module, inputs)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._take_over(path):
+                    return False
+                continue
+            token = uuid.uuid4().hex
+            with os.fdopen(fd, "w") as fp:
+                fp.write(json.dumps({
+                    "worker": self.worker_id, "time": time.time(), "token": token
+                }))
+            if self.done_entry(module, inputs) is not None:
+                # done and released by another process in the meantime
+                self._release(path)
+                return False
+            with self._lock:
+                self._claims[path] = token
+            return True
+        return False
+
+    def _take_over(self, path):
+        # returns whether the claim was released or is stale and was removed
+        try:
+            age = time.time() - os.stat(path).st_mtime
+        except FileNotFoundError:
+            return True
+        if age < self.lease_timeout:
+            return False
+        # the claim may be renewed or taken over by another process since it was checked,
+        # it is moved away in a single rename and the claim actually moved is checked
+        stale_path = "%s.%s.stale" % (path, uuid.uuid4().hex)
+        try:
+            os.rename(path, stale_path)
+        except FileNotFoundError:
+            return True
+        try:
+            age = time.time() - os.stat(stale_path).st_mtime
+        except FileNotFoundError:
+            return True
+        if age < self.lease_timeout:
+            # a live claim, put it back unless the task was claimed again meanwhile
+            try:
+                os.link(stale_path, path)
+            except FileExistsError:
+                pass
+            self._release(stale_path)
+            return False
+        self._release(stale_path)
+        return True
+
+    def _release(self, path):
+        with self._lock:
+            self._claims.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _renew_claims(self, stop):
+        # refreshes the claims of the process every `renew_interval` until `stop` is set
+        while not stop.wait(self.renew_interval):
+            with self._lock:
+                claims = list(self._claims.items())
+            for path, token in claims:
+                try:
+                    with open(path) as fp:
+                        owned = json.load(fp).get("token") == token
+                    if owned:
+                        os.utime(path)
+                except (OSError, ValueError):
+                    # moved away for a moment by a process checking whether it is stale
+                    continue
+                if not owned:
+                    # taken over by another process
+                    with self._lock:
+                        self._claims.pop(path, None)
+
+    def record(self, module, inputs, output):
+        """Marks a task as done, `output` being the digest of its module or None.
+
+        Tasks are recorded like the modules of a `manifest.Manifest`.
+        """
+        path = self._path(DONE_DIR, module, inputs)
+        tmp_path = "%s.%s.tmp" % (path, uuid.uuid4().hex)
+        with open(tmp_path, "w") as fp:
+            fp.write(json.dumps({
+                "module": module, "inputs": inputs, "output": output, "worker": self.worker_id
+            }))
+        os.replace(tmp_path, path)
+        self._release(self._path(CLAIMS_DIR, module, inputs))
+
+    def run(self, tasks):
+        """Yields the tasks the calling process claims, until every task is done.
+
+        The claims of the process are renewed in the background while it generates the
+        tasks, so that a task taking longer than `lease_timeout` is not taken over. The
+        tasks are tried in order. Those claimed by other processes are checked again
+        every `poll_interval` seconds until they are done or their claim is taken over.
+
+        Parameters
+        ----------
+        tasks : list
+            The `scheduling.ModuleTask` of the run, with their inputs digest.
+        """
+        stop = threading.Event()
+        renewer = threading.Thread(target=self._renew_claims, args=(stop,), daemon=True)
+        renewer.start()
+        try:
+            pending = list(tasks)
+            while pending:
+                waiting = []
+                for task in pending:
+                    if self.done_entry(task.module_name, task.inputs) is not None:
+                        continue
+                    if self.claim(task.module_name, task.inputs):
+                        yield task
+                    else:
+                        waiting.append(task)
+                pending = [
+                    task for task in waiting
+                    if self.done_entry(task.module_name, task.inputs) is None
+                ]
+                if pending:
+                    time.sleep(self.poll_interval)
+        finally:
+            stop.set()
+            renewer.join()
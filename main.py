@@ -2,9 +2,84 @@
 import argparse
 import json
 import os
+import shutil
+from functools import partial
 
+from generator.catalog_store import CatalogStore
+from generator.census import census_variants
+from generator.daemon import create_server, GenerationService, DEFAULT_HOST, DEFAULT_PORT
 from generator.generator import  GeneratorConfig, Generator, ADVANCED_MODULE_GENERATOR
-from parse import parse_symcat_conditions, parse_symcat_symptoms
+from generator.profiles import FULL_PROFILE, PROFILES
+from generator.serializers import BACKENDS, DEFAULT_BACKEND, get_serializer
+from generator.sharding import merge_shards, parse_shard
+from generator.sinks import DIRECTORY_FORMAT, OUTPUT_FORMATS
+from generator.snapshot import load_parsed, write_snapshot
+from generator.streaming import write_jsonl
+from generator.sweep import generate_sweep, parse_grid, sweep_variants
+from generator.watch import watch
+from parse import parse_symcat_conditions, parse_symcat_symptoms, \
+    parse_symcat_conditions_incremental, parse_symcat_symptoms_incremental
+from parse_cache import ParseCache, SYMPTOMS, CONDITIONS
+from pipeline import parse_catalog
+
+
+def build_generator_config(args, output_dir):
+    config = GeneratorConfig()
+    config.output_dir = os.path.join(output_dir, "modules/")
+    config.symptom_file = args.symptoms_json
+    config.conditions_file = args.conditions_json
+    config.config_file = args.config_file
+    config.num_history_years = args.num_history_years
+    config.min_symptoms = args.min_symptoms
+    config.prefix = args.module_prefix
+    config.generator_mode = args.generator_mode
+    config.catalog_db = args.catalog_db
+    config.stream_conditions = args.stream_conditions
+    config.use_manifest = not args.no_manifest
+    config.condition_regex = args.condition_regex
+    config.changed_priors_file = args.changed_priors
+    config.output_format = args.output_format
+    config.output_file = args.output_file
+    config.max_pending_writes = args.max_pending_writes
+    config.json_backend = args.json_backend
+    config.compact_output = args.compact
+    config.output_profile = args.output_profile
+    config.num_workers = args.workers
+    config.timing_log = args.timing_log
+    if args.shard:
+        config.shard_index, config.num_shards = parse_shard(args.shard)
+    config.balance_shards = args.balance_shards
+    config.work_queue_dir = args.work_queue
+    config.lease_timeout = args.lease_timeout
+    if args.condition_slugs:
+        config.condition_slugs = [slug.strip() for slug in args.condition_slugs.split(",")]
+    return config
+
+
+def snapshot_path(output_dir, kind):
+    return os.path.join(output_dir, "%s.snapshot" % kind)
+
+
+def jsonl_path(output_dir, kind):
+    return os.path.join(output_dir, "%s.jsonl" % kind)
+
+
+def write_catalog(catalog_db, kind, data):
+    with CatalogStore(catalog_db) as store:
+        store.write(kind, data)
+
+
+def expected_modules(args):
+    # the module of every condition of the catalog, if given
+    if args.catalog_db:
+        with CatalogStore(args.catalog_db) as store:
+            slugs = [slug for slug, _ in store.condition_names()]
+    elif args.conditions_json:
+        slugs = load_parsed(args.conditions_json).keys()
+    else:
+        return None
+    return ["%s%s.json" % (args.module_prefix, slug) for slug in slugs]
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Symcat-to-Synthea')
@@ -15,6 +90,55 @@ if __name__ == "__main__":
     parser.add_argument('--parse_symptoms', action='store_true')
     # parse conditions
     parser.add_argument('--parse_conditions', action='store_true')
+    # parse symptoms and conditions then generate modules in a single process
+    parser.add_argument('--pipeline', action='store_true')
+    parser.add_argument(
+        '--watch', action='store_true',
+        help="With --pipeline or --gen_modules, keep running and regenerate the modules affected by "
+             "every change of the input files and of --config_file"
+    )
+    # keep the catalog in memory and generate modules on request
+    parser.add_argument('--daemon', action='store_true')
+    parser.add_argument(
+        '--port', type=int, default=DEFAULT_PORT,
+        help="With --daemon, port of the local http API (default: %d)" % DEFAULT_PORT
+    )
+    # merge the modules generated by the shards of a run
+    parser.add_argument(
+        '--merge_shards', type=str, default="",
+        help="Comma separated output directories of the shards of a run, whose modules are merged "
+             "into <output>/modules. Pass --conditions_json or --catalog_db to check that every "
+             "condition was generated exactly once"
+    )
+
+    # generate the modules of several sets of priors
+    parser.add_argument(
+        '--sweep', action='store_true',
+        help="Generate the advanced modules of every variant of the priors given with "
+             "--sweep_configs and --sweep_grid, each in <output>/<variant name>. The catalog is "
+             "loaded once for all the variants"
+    )
+    parser.add_argument(
+        '--sweep_configs', type=str, default="",
+        help="With --sweep, comma separated config files, each being a variant named after the file"
+    )
+    parser.add_argument(
+        '--sweep_grid', action='append', default=[],
+        help="With --sweep, values of a prior given as <section>.<key>=<value>,<value>,... e.g "
+             "Gender.sex-male=0.45,0.5. Every combination of the values of the grid is a variant of "
+             "each sweep config file, or of --config_file. May be repeated"
+    )
+
+    parser.add_argument(
+        '--census', type=str, default="",
+        help="With --sweep, census export (e.g us_states_census_data_15.csv) whose rows give the sex, "
+             "race and age priors of a variant per state, the other priors being those of --config_file"
+    )
+    parser.add_argument(
+        '--states', type=str, default="",
+        help="With --census, comma separated names of the states to generate. Defaults to every row "
+             "of the export"
+    )
 
     parser.add_argument('--symptoms_csv', help='Symcat CSV export')
     parser.add_argument('--conditions_csv', help='Conditions CSV export')
@@ -48,50 +172,308 @@ if __name__ == "__main__":
 
     parser.add_argument('--output', help="Output directory")
 
+    parser.add_argument(
+        '--cache_dir', type=str, default="",
+        help="Directory where parsed CSV exports are cached. Parsing is skipped when "
+             "neither the CSV nor the parser changed since the last run"
+    )
+
+    parser.add_argument(
+        '--previous_csv', type=str, default="",
+        help="Previous version of the CSV export being parsed. When provided together with "
+             "--previous_json, only the entries affected by the rows which changed are parsed again"
+    )
+    parser.add_argument(
+        '--previous_json', type=str, default="",
+        help="Parsed output of the CSV export passed to --previous_csv"
+    )
+
+    parser.add_argument(
+        '--write_parsed', action='store_true',
+        help="With --pipeline, also write the parsed symptoms.json and conditions.json files"
+    )
+
+    parser.add_argument(
+        '--catalog_db', type=str, default="",
+        help="SQLite catalog. The parse commands and --pipeline write the parsed data into it, "
+             "--gen_modules reads the conditions and symptoms it needs from it"
+    )
+    parser.add_argument(
+        '--condition_slugs', type=str, default="",
+        help="Comma separated slugs or glob patterns of the conditions to generate modules for. "
+             "Defaults to all"
+    )
+    parser.add_argument(
+        '--condition_regex', type=str, default="",
+        help="Also generate the modules of the conditions whose slug matches this regular expression"
+    )
+    parser.add_argument(
+        '--changed_priors', type=str, default="",
+        help="Config file the modules were previously generated with. Also generate the modules "
+             "of the conditions whose prior differs in --config_file"
+    )
+
+    parser.add_argument(
+        '--no_manifest', action='store_true',
+        help="Write every module, even those whose inputs did not change since the last run"
+    )
+    parser.add_argument(
+        '--output_format', type=str, default=DIRECTORY_FORMAT, choices=OUTPUT_FORMATS,
+        help="Where to write the generated modules: one file per module in <output>/modules "
+             "(dir), a single zip, tar.gz or jsonl archive, or jsonl lines on stdout"
+    )
+    parser.add_argument(
+        '--output_file', type=str, default="",
+        help="Path of the archive for the zip, tar.gz and jsonl output formats. "
+             "Defaults to <output>/modules.<format>"
+    )
+    parser.add_argument(
+        '--max_pending_writes', type=int, default=16,
+        help="Number of generated modules which may wait to be written by the background writer "
+             "while the next ones are generated. 0 writes every module synchronously"
+    )
+    parser.add_argument(
+        '--json_backend', type=str, default=DEFAULT_BACKEND, choices=list(BACKENDS.keys()),
+        help="json library used to write the modules and the parsed data. Defaults to the standard "
+             "library, orjson is faster when installed"
+    )
+    parser.add_argument(
+        '--compact', action='store_true',
+        help="Write the modules and the parsed data without indentation"
+    )
+    parser.add_argument(
+        '--output_profile', type=str, default=FULL_PROFILE, choices=list(PROFILES.keys()),
+        help="Descriptive fields written in the modules: all of them (full), no remarks (lean), "
+             "or neither remarks nor code display texts (minimal)"
+    )
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help="Number of processes generating the modules, the most costly ones first"
+    )
+    parser.add_argument(
+        '--timing_log', type=str, default="",
+        help="jsonl file where the estimated cost and generation time of every module are logged"
+    )
+    parser.add_argument(
+        '--shard', type=str, default="",
+        help="Only generate the shard <index>/<number of shards> of the conditions, e.g 0/4. Only "
+             "the shard 0 writes the history module"
+    )
+    parser.add_argument(
+        '--balance_shards', action='store_true',
+        help="Assign the conditions to the shards from their estimated cost instead of a hash of "
+             "their slug. Every condition is loaded by every shard"
+    )
+    parser.add_argument(
+        '--work_queue', type=str, default="",
+        help="Directory shared by several --gen_modules processes, on any hosts, which take the "
+             "modules to generate from a common queue. Processes may join or leave during the run"
+    )
+    parser.add_argument(
+        '--lease_timeout', type=float, default=600,
+        help="Seconds after which a module claimed from the work queue by a stopped process is "
+             "generated by another one"
+    )
+    parser.add_argument(
+        '--stream_conditions', action='store_true',
+        help="Read the parsed conditions (json or jsonl) one at a time while generating modules "
+             "instead of loading the whole file"
+    )
+    parser.add_argument(
+        '--jsonl', action='store_true',
+        help="Also write the parsed data as jsonl files (symptoms.jsonl, conditions.jsonl) "
+             "with one entry per line"
+    )
+
+    parser.add_argument(
+        '--snapshot', action='store_true',
+        help="Also write the parsed data as compact binary snapshots (symptoms.snapshot, "
+             "conditions.snapshot) which can be passed to --symptoms_json and --conditions_json"
+    )
+
     args = parser.parse_args()
 
+    if bool(args.previous_csv) != bool(args.previous_json):
+        raise ValueError(
+            "You must supply both --previous_csv and --previous_json for an incremental parse"
+        )
+
+    serializer = get_serializer(args.json_backend, args.compact)
+
     if not args.output:
         output_dir = os.getcwd()
     else:
         output_dir = args.output
 
-    if not os.path.isdir(output_dir):
-        os.mkdir(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    if args.pipeline:
+        if not args.symptoms_csv or not args.conditions_csv:
+            raise ValueError(
+                "You must supply both the symcat exported symptoms and conditions CSV files"
+            )
+        if args.watch:
+            config = build_generator_config(args, output_dir)
+            # the catalog is parsed from the exports, not read from the database
+            config.catalog_db = ""
+            try:
+                watch(
+                    GenerationService(config),
+                    [args.symptoms_csv, args.conditions_csv],
+                    partial(parse_catalog, args.symptoms_csv, args.conditions_csv, args.cache_dir)
+                )
+            except KeyboardInterrupt:
+                pass
+        else:
+            symptoms, conditions = parse_catalog(
+                args.symptoms_csv, args.conditions_csv, args.cache_dir
+            )
+            if args.write_parsed:
+                with open(os.path.join(output_dir, "symptoms.json"), "w") as fp:
+                    serializer.dump(symptoms, fp)
+                with open(os.path.join(output_dir, "conditions.json"), "w") as fp:
+                    serializer.dump(conditions, fp)
+                if args.snapshot:
+                    write_snapshot(snapshot_path(output_dir, SYMPTOMS), SYMPTOMS, symptoms)
+                    write_snapshot(snapshot_path(output_dir, CONDITIONS), CONDITIONS, conditions)
+                if args.jsonl:
+                    write_jsonl(jsonl_path(output_dir, SYMPTOMS), symptoms)
+                    write_jsonl(jsonl_path(output_dir, CONDITIONS), conditions)
+            if args.catalog_db:
+                write_catalog(args.catalog_db, SYMPTOMS, symptoms)
+                write_catalog(args.catalog_db, CONDITIONS, conditions)
 
-    if args.gen_modules:
+            generator = Generator(build_generator_config(args, output_dir))
+            generator.generate(symptoms, conditions)
+    elif args.daemon:
+        if not args.catalog_db and (not args.symptoms_json or not args.conditions_json):
+            raise ValueError(
+                "You must supply both the parsed symptoms.json and conditions.json file or a catalog"
+            )
+        server = create_server(GenerationService(build_generator_config(args, output_dir)),
+                               DEFAULT_HOST, args.port)
+        print("Listening on http://%s:%d" % (DEFAULT_HOST, args.port), flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    elif args.merge_shards:
+        shard_dirs = [
+            os.path.join(shard_dir.strip(), "modules") for shard_dir in args.merge_shards.split(",")
+        ]
+        merge_shards(os.path.join(output_dir, "modules"), shard_dirs, expected_modules(args))
+    elif args.sweep:
+        if not args.catalog_db and (not args.symptoms_json or not args.conditions_json):
+            raise ValueError(
+                "You must supply both the parsed symptoms.json and conditions.json file or a catalog"
+            )
+        if args.census:
+            if args.sweep_configs or args.sweep_grid:
+                raise ValueError("The variants of a sweep come either from a census or from config files")
+            states = [state.strip() for state in args.states.split(",") if state.strip()]
+            variants = census_variants(args.census, states, args.config_file)
+        else:
+            config_files = [
+                filename.strip() for filename in args.sweep_configs.split(",") if filename.strip()
+            ]
+            if not config_files and args.config_file:
+                config_files = [args.config_file]
+            variants = sweep_variants(config_files, parse_grid(args.sweep_grid))
+        config = build_generator_config(args, output_dir)
+        config.output_dir = output_dir
+        times = generate_sweep(config, variants)
+        for name, seconds in times.items():
+            print("%s: %.2fs" % (name, seconds))
+    elif args.gen_modules:
         # we're generating modules
-        config = GeneratorConfig()
-        config.output_dir = os.path.join(output_dir, "modules/")
-        config.symptom_file = args.symptoms_json
-        config.conditions_file = args.conditions_json
-        config.config_file = args.config_file
-        config.num_history_years = args.num_history_years
-        config.min_symptoms = args.min_symptoms
-        config.prefix = args.module_prefix
-        config.generator_mode = args.generator_mode
-
-        if not args.symptoms_json or not args.conditions_json:
+        config = build_generator_config(args, output_dir)
+
+        if not args.catalog_db and (not args.symptoms_json or not args.conditions_json):
             raise ValueError(
-                "You must supply both the parsed symptoms.json and conditions.json file"
+                "You must supply both the parsed symptoms.json and conditions.json file or a catalog"
             )
-        generator = Generator(config)
-        generator.generate()
+        if args.watch:
+            try:
+                watch(
+                    GenerationService(config),
+                    [args.catalog_db] if args.catalog_db else [args.symptoms_json, args.conditions_json]
+                )
+            except KeyboardInterrupt:
+                pass
+        else:
+            generator = Generator(config)
+            generator.generate()
     elif args.parse_symptoms:
         if not args.symptoms_csv:
             raise ValueError(
                 "You must supply the symcat exported symptoms CSV file"
             )
-        symptoms = parse_symcat_symptoms(args.symptoms_csv)
-        with open(os.path.join(output_dir, "symptoms.json"), "w") as fp:
-            json.dump(symptoms, fp, indent=4)
+        output_file = os.path.join(output_dir, "symptoms.json")
+        if args.previous_csv:
+            with open(args.previous_json) as fp:
+                previous_symptoms = json.load(fp)
+            symptoms, changelog = parse_symcat_symptoms_incremental(
+                args.symptoms_csv, args.previous_csv, previous_symptoms
+            )
+            with open(output_file, "w") as fp:
+                serializer.dump(symptoms, fp)
+            with open(os.path.join(output_dir, "symptoms_changelog.json"), "w") as fp:
+                serializer.dump(changelog, fp)
+            if args.cache_dir:
+                ParseCache(args.cache_dir, serializer).store(SYMPTOMS, args.symptoms_csv, symptoms)
+        elif args.cache_dir:
+            cached = ParseCache(args.cache_dir, serializer).ensure(SYMPTOMS, args.symptoms_csv)
+            shutil.copyfile(cached, output_file)
+            if args.snapshot or args.jsonl or args.catalog_db:
+                with open(cached) as fp:
+                    symptoms = json.load(fp)
+        else:
+            symptoms = parse_symcat_symptoms(args.symptoms_csv)
+            with open(output_file, "w") as fp:
+                serializer.dump(symptoms, fp)
+        if args.snapshot:
+            write_snapshot(snapshot_path(output_dir, SYMPTOMS), SYMPTOMS, symptoms)
+        if args.jsonl:
+            write_jsonl(jsonl_path(output_dir, SYMPTOMS), symptoms)
+        if args.catalog_db:
+            write_catalog(args.catalog_db, SYMPTOMS, symptoms)
     elif args.parse_conditions:
         if not args.conditions_csv:
             raise ValueError(
                 "You must supply the symcat exported conditions CSV file")
-        conditions = parse_symcat_conditions(args.conditions_csv)
-        with open(os.path.join(output_dir, "conditions.json"), "w") as fp:
-            json.dump(conditions, fp, indent=4)
+        output_file = os.path.join(output_dir, "conditions.json")
+        if args.previous_csv:
+            with open(args.previous_json) as fp:
+                previous_conditions = json.load(fp)
+            conditions, changelog = parse_symcat_conditions_incremental(
+                args.conditions_csv, args.previous_csv, previous_conditions
+            )
+            with open(output_file, "w") as fp:
+                serializer.dump(conditions, fp)
+            with open(os.path.join(output_dir, "conditions_changelog.json"), "w") as fp:
+                serializer.dump(changelog, fp)
+            if args.cache_dir:
+                ParseCache(args.cache_dir, serializer).store(CONDITIONS, args.conditions_csv, conditions)
+        elif args.cache_dir:
+            cached = ParseCache(args.cache_dir, serializer).ensure(CONDITIONS, args.conditions_csv)
+            shutil.copyfile(cached, output_file)
+            if args.snapshot or args.jsonl or args.catalog_db:
+                with open(cached) as fp:
+                    conditions = json.load(fp)
+        else:
+            conditions = parse_symcat_conditions(args.conditions_csv)
+            with open(output_file, "w") as fp:
+                serializer.dump(conditions, fp)
+        if args.snapshot:
+            write_snapshot(snapshot_path(output_dir, CONDITIONS), CONDITIONS, conditions)
+        if args.jsonl:
+            write_jsonl(jsonl_path(output_dir, CONDITIONS), conditions)
+        if args.catalog_db:
+            write_catalog(args.catalog_db, CONDITIONS, conditions)
     else:
         raise ValueError(
-            "You must either generate modules, parse symptoms or parse conditions"
+            "You must either generate modules, parse symptoms, parse conditions, run the pipeline "
+            "merge shards or run a sweep"
         )
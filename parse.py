@@ -1,7 +1,14 @@
 import csv
+import difflib
 import hashlib
 import re
 
+from generator.registry import intern_string, slug_hash
+from generator.schema import normalize_catalog, normalize_definition, SCHEMA_VERSION
+
+# bump whenever the structure of the parsed output changes
+PARSER_VERSION = 3
+
 symcat_symptom_url_regex = re.compile(r"http://www.symcat.com/symptoms/(.*)")
 symcat_condition_url_regex = re.compile(r"http://www.symcat.com/conditions/(.*)")
 symcat_age_url_regex = re.compile(r"http://www.symcat.com/demographics/age-(.*)")
@@ -28,82 +35,113 @@ def parse_symcat_symptoms(filename):
     # let's get a unique id symptom_name, symptom_description for all of them
 
     symptom_map = {}
-    # the csv file is structured a bit weirdly. There are 105 columns,
-    # but every 21 columns is repeated but with different column name
-    # so when checking for the symptom name for instance, you would need to check all 5 different column group
-    # for a match before concluding that the target is indeed missing.
-    content_offsets = [0, 21, 42, 63, 84]
     # to keep track of the slug associated to each symtom name
     slug_dict = {}
+    seen = set()
     with open(filename, newline='') as fp:
         symptom_reader = csv.reader(fp)
         idx = 0
         for row in symptom_reader:
-            if idx == 0:
-                pass
-            else:
-                curr_offset = None
-                symptom_name = None
-                for jdx in content_offsets:
-                    symptom_name = row[jdx].strip()
-                    if len(symptom_name) == 0:
-                        continue
-                    else:
-                        curr_offset = jdx
-                        break
-
-                if curr_offset is not None:
-                    symptom_url = row[curr_offset + 1]
-                    match = symcat_symptom_url_regex.match(symptom_url)
-                    if match is None:
-                        continue
-                    symptom_slug = match.groups()[0].strip()
-                    if symptom_slug not in symptom_map:
-                        # we've not seen this symptom already
-                        # generate a hash based off this
-                        symptom_hash = hashlib.sha224(
-                            symptom_slug.encode("UTF-8")).hexdigest()
-
-                        # get the description for this symptom.
-                        symptom_description = row[curr_offset + 3]
-
-                        # saving additional infos
-                        # (common_causes, age, sex, race).
-                        symptom_map[symptom_slug] = {
-                            'name': symptom_name,
-                            'hash': symptom_hash,
-                            'description': symptom_description,
-                            'common_causes': {},
-                            'age': {},
-                            'sex': {},
-                            'race': {}
-                        }
-                        slug_dict[symptom_name.lower()] = symptom_slug
-
-                # Adding additional info present in the data base
-                info_types = ["common_causes", "age", "sex", "race"]
-                for info_type in info_types:
-                    is_valid, info_data = is_valid_symptom_infos(
-                        info_type, row
-                    )
-                    if is_valid:
-                        symptom_name = info_data.get("symptom_name")
-                        symptom_slug = slug_dict.get(symptom_name, None)
-                        if symptom_slug is None:
-                            continue
-                        grp_slug = info_data.get("grp_slug")
-                        if grp_slug not in symptom_map[symptom_slug][info_type]:
-                            label = "odds" if info_type != "common_causes" else "probability"
-                            symptom_map[symptom_slug][info_type][grp_slug] = {
-                                "name": info_data.get("grp_name"),
-                                "slug": grp_slug,
-                                label: info_data.get("grp_odds")
-                            }
-                        break
-
+            if idx != 0:
+                parse_symptom_row(row, symptom_map, slug_dict, seen)
             idx = idx + 1
 
-    return symptom_map
+    return normalize_catalog(symptom_map)
+
+
+def parse_symptom_row(row, symptom_map, slug_dict, seen, only=None):
+    """Function for parsing a single row of the symptom csv file into `symptom_map`.
+
+    Parameters
+    ----------
+    row : list
+        The csv row.
+    symptom_map : dict
+        Dictionnary of the symptoms parsed so far. It is updated in place.
+    slug_dict : dict
+        Mapping from a lower cased symptom name to its slug. It is updated in place.
+    seen : set
+        Slugs of the symptoms defined so far. It is updated in place.
+    only : set
+        If provided, only the symptoms whose slug is in this set are updated
+        (default: None).
+
+    Returns
+    -------
+    list
+        the slugs of the symptoms the row contributes to.
+    """
+    touched = []
+    # the csv file is structured a bit weirdly. There are 105 columns,
+    # but every 21 columns is repeated but with different column name
+    # so when checking for the symptom name for instance, you would need to check all 5 different column group
+    # for a match before concluding that the target is indeed missing.
+    content_offsets = [0, 21, 42, 63, 84]
+    curr_offset = None
+    symptom_name = None
+    for jdx in content_offsets:
+        symptom_name = row[jdx].strip()
+        if len(symptom_name) == 0:
+            continue
+        else:
+            curr_offset = jdx
+            break
+
+    if curr_offset is not None:
+        symptom_url = row[curr_offset + 1]
+        match = symcat_symptom_url_regex.match(symptom_url)
+        if match is None:
+            return touched
+        symptom_slug = intern_string(match.groups()[0].strip())
+        if symptom_slug not in seen:
+            # we've not seen this symptom already
+            seen.add(symptom_slug)
+            slug_dict[symptom_name.lower()] = symptom_slug
+            if only is None or symptom_slug in only:
+                # generate a hash based off this
+                symptom_hash = slug_hash(symptom_slug)
+
+                # get the description for this symptom.
+                symptom_description = row[curr_offset + 3]
+
+                # saving additional infos
+                # (common_causes, age, sex, race).
+                symptom_map[symptom_slug] = {
+                    'name': intern_string(symptom_name),
+                    'hash': symptom_hash,
+                    'description': symptom_description,
+                    'common_causes': {},
+                    'age': {},
+                    'sex': {},
+                    'race': {}
+                }
+        touched.append(symptom_slug)
+
+    # Adding additional info present in the data base
+    info_types = ["common_causes", "age", "sex", "race"]
+    for info_type in info_types:
+        is_valid, info_data = is_valid_symptom_infos(
+            info_type, row
+        )
+        if is_valid:
+            symptom_name = info_data.get("symptom_name")
+            symptom_slug = slug_dict.get(symptom_name, None)
+            if symptom_slug is None:
+                continue
+            touched.append(symptom_slug)
+            if only is not None and symptom_slug not in only:
+                break
+            grp_slug = intern_string(info_data.get("grp_slug"))
+            if grp_slug not in symptom_map[symptom_slug][info_type]:
+                label = "odds" if info_type != "common_causes" else "probability"
+                symptom_map[symptom_slug][info_type][grp_slug] = {
+                    "name": intern_string(info_data.get("grp_name")),
+                    "slug": grp_slug,
+                    label: info_data.get("grp_odds")
+                }
+            break
+
+    return touched
 
 
 def is_valid_symptom_infos(info_type, row):
@@ -359,67 +397,278 @@ def parse_symcat_conditions(filename):
         symptom_reader = csv.reader(fp)
         idx = 0
         for row in symptom_reader:
-            if idx == 0:
-                pass
-            else:
-                # check if it's a valid symptom definition
-                is_symptom, symptom_data = is_valid_symptom(row)
-                if is_symptom:
-                    condition_slug = symptom_data.get("condition_slug")
-                    if condition_slug not in condition_map:
-                        condition_map[condition_slug] = {
-                            "condition_name": symptom_data.get("condition_name"),
-                            "condition_slug": symptom_data.get("condition_slug"),
-                            "condition_description": symptom_data.get("condition_description"),
-                            "condition_remarks": symptom_data.get("condition_remarks"),
-                            "symptoms": {},
-                            "age": {},
-                            "race": {},
-                            "sex": {}
-                        }
-
-                    if condition_map[condition_slug].get("condition_description", None) is None:
-                        condition_map[condition_slug]["condition_description"] = symptom_data.get(
-                            "condition_description")
-
-                    if condition_map[condition_slug].get("condition_remarks", None) is None:
-                        condition_map[condition_slug][
-                            "condition_remarks"] = symptom_data.get("condition_remarks")
-
-                    # have we not recorded this symptom already ? then:
-                    symptom_slug = symptom_data.get("symptom_slug")
-                    if symptom_slug not in condition_map[condition_slug]["symptoms"]:
-                        condition_map[condition_slug]["symptoms"][symptom_slug] = {
-                            "slug": symptom_slug,
-                            "probability": symptom_data.get("symptom_probability")
-                        }
-                else:
-                    demo_types = ["age", "sex", "race"]
-                    for demo_type in demo_types:
-                        is_valid, demo_data = is_valid_demographics(
-                            demo_type, row)
-                        if is_valid:
-                            condition_slug = demo_data.get("condition_slug")
-                            if condition_slug not in condition_map:
-                                condition_map[condition_slug] = {
-                                    "condition_name": demo_data.get("condition_name"),
-                                    "condition_slug": demo_data.get("condition_slug"),
-                                    "condition_description": None,
-                                    "condition_remarks": None,
-                                    "symptoms": {},
-                                    "age": {},
-                                    "race": {},
-                                    "sex": {}
-                                }
-
-                            grp_slug = demo_data.get("grp_slug")
-                            if grp_slug not in condition_map[condition_slug][demo_type]:
-                                condition_map[condition_slug][demo_type][grp_slug] = {
-                                    "name": demo_data.get("grp_name"),
-                                    "slug": grp_slug,
-                                    "odds": demo_data.get("grp_odds")
-                                }
-                            break
+            if idx != 0:
+                parse_condition_row(row, condition_map)
             idx = idx + 1
 
-    return condition_map
+    return normalize_catalog(condition_map)
+
+
+def parse_condition_row(row, condition_map, only=None):
+    """Function for parsing a single row of the condition csv file into `condition_map`.
+
+    Parameters
+    ----------
+    row : list
+        The csv row.
+    condition_map : dict
+        Dictionnary of the conditions parsed so far. It is updated in place.
+    only : set
+        If provided, only the conditions whose slug is in this set are updated
+        (default: None).
+
+    Returns
+    -------
+    list
+        the slugs of the conditions the row contributes to.
+    """
+    # check if it's a valid symptom definition
+    is_symptom, symptom_data = is_valid_symptom(row)
+    if is_symptom:
+        condition_slug = intern_string(symptom_data.get("condition_slug"))
+        if only is not None and condition_slug not in only:
+            return [condition_slug]
+        if condition_slug not in condition_map:
+            condition_map[condition_slug] = {
+                "condition_name": intern_string(symptom_data.get("condition_name")),
+                "condition_slug": condition_slug,
+                "condition_hash": slug_hash(condition_slug),
+                "condition_description": symptom_data.get("condition_description"),
+                "condition_remarks": symptom_data.get("condition_remarks"),
+                "symptoms": {},
+                "age": {},
+                "race": {},
+                "sex": {}
+            }
+
+        if condition_map[condition_slug].get("condition_description", None) is None:
+            condition_map[condition_slug]["condition_description"] = symptom_data.get(
+                "condition_description")
+
+        if condition_map[condition_slug].get("condition_remarks", None) is None:
+            condition_map[condition_slug][
+                "condition_remarks"] = symptom_data.get("condition_remarks")
+
+        # have we not recorded this symptom already ? then:
+        symptom_slug = intern_string(symptom_data.get("symptom_slug"))
+        if symptom_slug not in condition_map[condition_slug]["symptoms"]:
+            condition_map[condition_slug]["symptoms"][symptom_slug] = {
+                "slug": symptom_slug,
+                "probability": symptom_data.get("symptom_probability")
+            }
+        return [condition_slug]
+
+    demo_types = ["age", "sex", "race"]
+    for demo_type in demo_types:
+        is_valid, demo_data = is_valid_demographics(
+            demo_type, row)
+        if is_valid:
+            condition_slug = intern_string(demo_data.get("condition_slug"))
+            if only is not None and condition_slug not in only:
+                return [condition_slug]
+            if condition_slug not in condition_map:
+                condition_map[condition_slug] = {
+                    "condition_name": intern_string(demo_data.get("condition_name")),
+                    "condition_slug": condition_slug,
+                    "condition_hash": slug_hash(condition_slug),
+                    "condition_description": None,
+                    "condition_remarks": None,
+                    "symptoms": {},
+                    "age": {},
+                    "race": {},
+                    "sex": {}
+                }
+
+            grp_slug = intern_string(demo_data.get("grp_slug"))
+            if grp_slug not in condition_map[condition_slug][demo_type]:
+                condition_map[condition_slug][demo_type][grp_slug] = {
+                    "name": intern_string(demo_data.get("grp_name")),
+                    "slug": grp_slug,
+                    "odds": demo_data.get("grp_odds")
+                }
+            return [condition_slug]
+
+    return []
+
+
+def row_digest(row):
+    """Function for computing a digest identifying the content of a csv row."""
+    return hashlib.sha1("\x1f".join(row).encode("utf-8")).hexdigest()
+
+
+def read_csv_rows(filename):
+    """Function for reading the rows of a Symcat csv export, without its header."""
+    with open(filename, newline='') as fp:
+        return list(csv.reader(fp))[1:]
+
+
+def diff_csv_rows(previous_rows, rows):
+    """Function for finding the rows which differ between two versions of a csv export.
+
+    Rows are compared by content digest. Since the first definition of an entry wins
+    when parsing, a row which moved relative to the others is reported as changed.
+
+    Parameters
+    ----------
+    previous_rows : list
+        The rows of the previous export.
+    rows : list
+        The rows of the new export.
+
+    Returns
+    -------
+    removed: list
+        the rows only present in the previous export.
+    added: list
+        the rows only present in the new export.
+    """
+    previous_digests = [row_digest(row) for row in previous_rows]
+    digests = [row_digest(row) for row in rows]
+
+    removed = []
+    added = []
+    matcher = difflib.SequenceMatcher(None, previous_digests, digests, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        removed.extend(previous_rows[i1:i2])
+        added.extend(rows[j1:j2])
+
+    return removed, added
+
+
+def _row_matcher(needles):
+    # a row can only contribute to an entry if it mentions the entry's slug (in an url)
+    # or its name (in a demographic definition). Checking this is a lot cheaper than
+    # parsing the row, so it is used to skip the rows of unaffected entries.
+    pattern = re.compile("|".join(
+        re.escape(needle) for needle in sorted(needles) if needle
+    ))
+    return lambda row: pattern.search("\x1f".join(row).lower()) is not None
+
+
+def _merge_incremental(previous_map, updated_map, affected):
+    # entries parsed with an older schema are upgraded so that they can be compared
+    previous_map = {
+        key: value if value.get("schema_version") == SCHEMA_VERSION else normalize_definition(dict(value))
+        for key, value in previous_map.items()
+    }
+    normalize_catalog(updated_map)
+    merged = dict(previous_map)
+    changelog = {"added": [], "removed": [], "modified": []}
+    for slug in sorted(affected):
+        if slug in updated_map:
+            if slug not in previous_map:
+                changelog["added"].append(slug)
+            elif previous_map[slug] != updated_map[slug]:
+                changelog["modified"].append(slug)
+            merged[slug] = updated_map[slug]
+        elif slug in merged:
+            changelog["removed"].append(slug)
+            del merged[slug]
+    return merged, changelog
+
+
+def parse_symcat_symptoms_incremental(filename, previous_filename, previous_map):
+    """Function for updating previously parsed symptoms from a revised csv export.
+
+    Only the symptoms contributed to by rows which changed between the two exports
+    are parsed again. The result is the same as `parse_symcat_symptoms(filename)`.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the revised csv file describing the symptoms.
+    previous_filename : str
+        Path to the csv file `previous_map` was parsed from.
+    previous_map : dict
+        The symptoms parsed from `previous_filename`.
+
+    Returns
+    -------
+    symptom_dict : dict
+        Dictionnary containing all the symptoms of the revised export.
+    changelog : dict
+        The slugs of the symptoms which were `added`, `removed` or `modified`.
+    """
+    previous_rows = read_csv_rows(previous_filename)
+    rows = read_csv_rows(filename)
+    removed, added = diff_csv_rows(previous_rows, rows)
+
+    # find the symptoms the changed rows contribute to
+    affected = set()
+    names = set()
+    for changed_rows in [removed, added]:
+        slug_dict = {
+            value.get("name").lower(): key for key, value in previous_map.items()
+        }
+        seen = set()
+        for row in changed_rows:
+            affected.update(parse_symptom_row(row, {}, slug_dict, seen, only=set()))
+        names.update(name for name, slug in slug_dict.items() if slug in affected)
+
+    if len(affected) == 0:
+        return _merge_incremental(previous_map, {}, affected)
+
+    # replay the rows of the affected symptoms only
+    needles = names.union("symptoms/%s" % slug for slug in affected)
+    is_relevant = _row_matcher(needles)
+    symptom_map = {}
+    slug_dict = {}
+    seen = set()
+    for row in rows:
+        if is_relevant(row):
+            parse_symptom_row(row, symptom_map, slug_dict, seen, only=affected)
+
+    return _merge_incremental(previous_map, symptom_map, affected)
+
+
+def parse_symcat_conditions_incremental(filename, previous_filename, previous_map):
+    """Function for updating previously parsed conditions from a revised csv export.
+
+    Only the conditions contributed to by rows which changed between the two exports
+    are parsed again. The result is the same as `parse_symcat_conditions(filename)`.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the revised csv file describing the conditions.
+    previous_filename : str
+        Path to the csv file `previous_map` was parsed from.
+    previous_map : dict
+        The conditions parsed from `previous_filename`.
+
+    Returns
+    -------
+    condition_dict : dict
+        Dictionnary containing all the conditions of the revised export.
+    changelog : dict
+        The slugs of the conditions which were `added`, `removed` or `modified`.
+    """
+    previous_rows = read_csv_rows(previous_filename)
+    rows = read_csv_rows(filename)
+    removed, added = diff_csv_rows(previous_rows, rows)
+
+    # find the conditions the changed rows contribute to
+    changed_map = {}
+    for row in removed + added:
+        parse_condition_row(row, changed_map)
+    affected = set(changed_map.keys())
+
+    if len(affected) == 0:
+        return _merge_incremental(previous_map, {}, affected)
+
+    needles = set(affected)
+    for slug in affected:
+        for known_map in [changed_map, previous_map]:
+            if slug in known_map:
+                needles.add(known_map[slug].get("condition_name").lower())
+
+    # replay the rows of the affected conditions only
+    is_relevant = _row_matcher(needles)
+    condition_map = {}
+    for row in rows:
+        if is_relevant(row):
+            parse_condition_row(row, condition_map, only=affected)
+
+    return _merge_incremental(previous_map, condition_map, affected)
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+
+import parse
+from generator import helpers, registry, schema
+from generator.serializers import get_serializer
+from parse import parse_symcat_conditions, parse_symcat_symptoms
+
+SYMPTOMS = "symptoms"
+CONDITIONS = "conditions"
+
+PARSERS = {
+    SYMPTOMS: parse_symcat_symptoms,
+    CONDITIONS: parse_symcat_conditions,
+}
+
+# the modules whose code the parsed data depends on
+PARSER_MODULES = [parse, schema, registry, helpers]
+
+
+def file_digest(filename, chunk_size=1 << 20):
+    """Function for computing the sha256 digest of a file's content.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the file to hash.
+    chunk_size : int
+        Number of bytes read at a time (default: 1MiB).
+
+    Returns
+    -------
+    str
+        the hexadecimal digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(filename, "rb") as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parser_fingerprint():
+    """Function for identifying the parsing code currently in use.
+
+    The fingerprint combines `parse.PARSER_VERSION` and `schema.SCHEMA_VERSION` with a
+    digest of the source of the parser and of the generator modules it uses to normalize
+    and hash the definitions (`PARSER_MODULES`), so that cached results are invalidated
+    whenever the parsing code changes, even if nobody remembered to bump the version.
+
+    Returns
+    -------
+    str
+        the hexadecimal fingerprint of the parser.
+    """
+    digest = hashlib.sha256(
+        ("%s-%s" % (parse.PARSER_VERSION, schema.SCHEMA_VERSION)).encode("utf-8")
+    )
+    for module in PARSER_MODULES:
+        source_file = os.path.splitext(module.__file__)[0] + ".py"
+        if os.path.isfile(source_file):
+            digest.update(file_digest(source_file).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ParseCache(object):
+    """
+    Content addressed cache for parsed Symcat CSV exports.
+
+    Entries are keyed on the kind of export (symptoms or conditions), the sha256 of
+    the CSV content, the parser fingerprint and the serializer settings. They are
+    written with the serializer `main.py` writes the parsed data with, so a hit can be
+    copied to the output directory as is.
+
+    Attributes
+    ----------
+    cache_dir: str
+        Directory where the parsed results are stored.
+    serializer: JsonSerializer
+        Serializer of the entries, see `serializers.get_serializer`.
+    """
+    def __init__(self, cache_dir, serializer=None):
+        """
+
+        Parameters
+        ----------
+        cache_dir: str
+            See class doc
+        serializer: JsonSerializer
+            See class doc (default: the default serializer)
+        """
+        self.cache_dir = cache_dir
+        self.serializer = serializer or get_serializer()
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            self._fingerprint = parser_fingerprint()
+        return self._fingerprint
+
+    def key(self, kind, filename):
+        digest = hashlib.sha256()
+        digest.update(kind.encode("utf-8"))
+        digest.update(self.fingerprint.encode("utf-8"))
+        digest.update(("%s-%s" % (self.serializer.name, self.serializer.compact)).encode("utf-8"))
+        digest.update(file_digest(filename).encode("utf-8"))
+        return digest.hexdigest()
+
+    def path_for(self, kind, filename):
+        return os.path.join(
+            self.cache_dir, "%s-%s.json" % (kind, self.key(kind, filename))
+        )
+
+    def fetch(self, kind, filename):
+        """Returns the path of the cached result for `filename` or None on a miss."""
+        path = self.path_for(kind, filename)
+        if os.path.isfile(path):
+            return path
+        return None
+
+    def store(self, kind, filename, data):
+        """Stores the parsed `data` for `filename` and returns the cache entry path."""
+        return self._write(self.path_for(kind, filename), data)
+
+    def _write(self, path, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write to a temporary file first so that concurrent runs never observe
+        # a partially written entry.
+        tmp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp_path, "w") as fp:
+            self.serializer.dump(data, fp)
+        os.replace(tmp_path, path)
+        return path
+
+    def ensure(self, kind, filename):
+        """Returns the path of the cached result for `filename`, parsing it on a miss.
+
+        Parameters
+        ----------
+        kind : str
+            Either `SYMPTOMS` or `CONDITIONS`.
+        filename : str
+            Path to the Symcat CSV export.
+
+        Returns
+        -------
+        str
+            Path of the cache entry holding the parsed data.
+        """
+        path = self.path_for(kind, filename)
+        if not os.path.isfile(path):
+            self._write(path, PARSERS[kind](filename))
+        return path
+
+    def parse(self, kind, filename):
+        """Returns the parsed content of `filename`, parsing it only on a cache miss."""
+        path = self.path_for(kind, filename)
+        if os.path.isfile(path):
+            with open(path) as fp:
+                return json.load(fp)
+        data = PARSERS[kind](filename)
+        self._write(path, data)
+        return data
@@ -0,0 +1,63 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from parse_cache import ParseCache, PARSERS, SYMPTOMS, CONDITIONS
+
+
+def parse_export(kind, filename, cache_dir=""):
+    """Function for parsing a Symcat CSV export, going through the parse cache if any.
+
+    Parameters
+    ----------
+    kind : str
+        Either `SYMPTOMS` or `CONDITIONS`.
+    filename : str
+        Path to the Symcat CSV export.
+    cache_dir : str
+        Directory of the parse cache. No cache is used when empty (default: "").
+
+    Returns
+    -------
+    dict
+        the parsed export.
+    """
+    if cache_dir:
+        return ParseCache(cache_dir).parse(kind, filename)
+    return PARSERS[kind](filename)
+
+
+def parse_catalog(symptoms_csv, conditions_csv, cache_dir="", concurrent=True):
+    """Function for parsing both Symcat CSV exports.
+
+    When `concurrent` is set, the symptoms are parsed in a worker process while the
+    conditions are parsed in the current one.
+
+    Parameters
+    ----------
+    symptoms_csv : str
+        Path to the Symcat symptoms CSV export.
+    conditions_csv : str
+        Path to the Symcat conditions CSV export.
+    cache_dir : str
+        Directory of the parse cache. No cache is used when empty (default: "").
+    concurrent : bool
+        Whether to parse both exports at the same time (default: True).
+
+    Returns
+    -------
+    symptoms: dict
+        the parsed symptoms.
+    conditions: dict
+        the parsed conditions.
+    """
+    if not concurrent:
+        return (
+            parse_export(SYMPTOMS, symptoms_csv, cache_dir),
+            parse_export(CONDITIONS, conditions_csv, cache_dir)
+        )
+
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        symptoms_future = executor.submit(parse_export, SYMPTOMS, symptoms_csv, cache_dir)
+        conditions = parse_export(CONDITIONS, conditions_csv, cache_dir)
+        symptoms = symptoms_future.result()
+
+    return symptoms, conditions
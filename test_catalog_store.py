@@ -0,0 +1,59 @@
+import pytest
+
+from generator.catalog_store import CatalogStore, CONDITIONS, SYMPTOMS
+from generator.generator import Generator, GeneratorConfig
+from generator.records import load_conditions, load_symptoms
+
+
+class TestCatalogStore(object):
+
+    def test_round_trip(self, tmpdir, catalog, as_dicts):
+        symptoms, conditions = catalog()
+        with CatalogStore(str(tmpdir.join("catalog.db"))) as store:
+            store.write(SYMPTOMS, symptoms)
+            store.write(CONDITIONS, conditions)
+
+            assert store.condition_slugs() == ["appendicitis", "flu"]
+            assert as_dicts(store.load_symptoms()) == as_dicts(load_symptoms(symptoms))
+            assert as_dicts(store.load_conditions()) == as_dicts(load_conditions(conditions))
+
+            # writing again replaces the previous content
+            del conditions["flu"]
+            store.write(CONDITIONS, conditions)
+            assert list(store.load_conditions().keys()) == ["appendicitis"]
+
+    def test_partial_loading(self, tmpdir, catalog):
+        symptoms, conditions = catalog()
+        with CatalogStore(str(tmpdir.join("catalog.db"))) as store:
+            store.write(SYMPTOMS, symptoms)
+            store.write(CONDITIONS, conditions)
+
+            loaded_symptoms, loaded_conditions = store.load_catalog(["flu", "unknown"])
+            assert list(loaded_conditions.keys()) == ["flu"]
+            assert list(loaded_symptoms.keys()) == ["fever"]
+            assert loaded_conditions["flu"].symptoms[0].probability == 90
+
+    def test_generate_from_catalog(self, tmpdir, catalog):
+        symptoms, conditions = catalog()
+        filename = str(tmpdir.join("catalog.db"))
+        with CatalogStore(filename) as store:
+            store.write(SYMPTOMS, symptoms)
+            store.write(CONDITIONS, conditions)
+
+        config = GeneratorConfig()
+        config.output_dir = str(tmpdir.join("modules"))
+        config.catalog_db = filename
+        config.condition_slugs = ["appendicitis"]
+        config.num_history_years = 0
+        Generator(config).generate()
+
+        assert tmpdir.join("modules").listdir("*.json") == [tmpdir.join("modules", "appendicitis.json")]
+
+    def test_version_mismatch(self, tmpdir):
+        filename = str(tmpdir.join("catalog.db"))
+        with CatalogStore(filename) as store:
+            with store.connection:
+                store.connection.execute("UPDATE catalog_meta SET value = '0' WHERE key = 'version'")
+
+        with pytest.raises(ValueError):
+            CatalogStore(filename)
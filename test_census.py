@@ -0,0 +1,36 @@
+import pytest
+
+from generator.census import census_variants, load_census
+from generator.helpers import load_config
+
+
+CENSUS_FILE = "us_states_census_data_15.csv"
+
+
+class TestCensus(object):
+
+    def test_load_census(self):
+        regions = load_census(CENSUS_FILE)
+        # the national row and the 50 states with the District of Columbia
+        assert len(regions) == 52
+        assert list(regions.keys())[:2] == ["USA", "Alabama"]
+        assert regions["Alabama"]["Gender"]["sex-male"] == "0.482875223493528"
+        assert regions["Alabama"]["Race"]["race-ethnicity-black"] == "0.285977566806901"
+        assert regions["Alabama"]["Age"]["age-75-years"] == "0.063509399562742"
+
+    def test_census_variants(self, tmpdir):
+        config_file = tmpdir.join("priors.ini")
+        config_file.write("[Gender]\nsex-male = 0.9\n[Conditions]\nappendicitis = 0.3\n")
+        variants = census_variants(CENSUS_FILE, ["new york", "Texas"], str(config_file))
+        assert [variant.name for variant in variants] == ["New-York", "Texas"]
+
+        # the shipped priors are those of the state of New York
+        expected = load_config("priors.ini")
+        priors = variants[0].priors
+        for section in ["Gender", "Race", "Age"]:
+            assert priors[section] == pytest.approx(expected[section])
+        assert priors["Conditions"] == {"appendicitis": 0.3}
+
+        assert len(census_variants(CENSUS_FILE)) == 52
+        with pytest.raises(ValueError):
+            census_variants(CENSUS_FILE, ["Atlantis"])
@@ -0,0 +1,106 @@
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from generator.daemon import create_server
+
+
+class TestGenerationService(object):
+
+    def test_changed_priors(self, tmpdir, service, write_priors):
+        generation = service
+        assert generation.generate(write_priors(tmpdir, 0.3))["conditions"] == 2
+        # only the condition whose prior changed is generated again
+        assert generation.generate(write_priors(tmpdir, 0.4))["conditions"] == 1
+        assert generation.generate()["conditions"] == 0
+        # the module of a selected condition is only written if its inputs changed
+        result = generation.generate(condition_slugs=["flu"])
+        assert (result["conditions"], result["modules"]) == (1, 0)
+        # a demographic prior affects every condition
+        assert generation.generate(write_priors(tmpdir, 0.4, 0.6))["conditions"] == 2
+
+        stats = generation.stats
+        assert stats["requests"] == 5
+        assert stats["catalog_loads"] == 1
+        assert stats["catalog_cache_hits"] == 4
+        assert stats["priors_cache_hits"] == 2
+        assert stats["modules_generated"] == 5
+        assert stats["modules_reused"] == 5
+
+    def test_likelihood_cache(self, tmpdir, service, write_priors, catalog):
+        generation = service
+        generation.generate(write_priors(tmpdir, 0.3))
+        module_generator = generation.module_generator
+        tables = dict(module_generator.likelihood_cache)
+        assert sorted(tables.keys()) == [
+            ("appendicitis", "nausea"), ("appendicitis", "sharp-abdominal-pain"), ("flu", "fever")
+        ]
+
+        # the tables do not depend on the priors, they are not computed again
+        assert generation.generate(write_priors(tmpdir, 0.4, 0.6))["modules"] == 2
+        assert generation.module_generator is module_generator
+        assert module_generator.priors["Gender"]["sex-male"] == 0.6
+        assert all(module_generator.likelihood_cache[key] is table for key, table in tables.items())
+
+        # unlike those of the conditions which changed
+        symptoms, conditions = catalog()
+        conditions["flu"]["condition_name"] = "Flu"
+        conditions["flu"]["symptoms"]["fever"]["probability"] = 80
+        generation.update_catalog(symptoms, conditions)
+        assert ("flu", "fever") not in module_generator.likelihood_cache
+        assert generation.generate()["modules"] == 1
+        assert module_generator.likelihood_cache[("flu", "fever")] is not tables[("flu", "fever")]
+        assert module_generator.likelihood_cache[("appendicitis", "nausea")] is \
+            tables[("appendicitis", "nausea")]
+
+    def test_catalog_change(self, tmpdir, service, catalog):
+        generation = service
+        generation.generate()
+        symptoms, conditions = catalog()
+        conditions["flu"]["condition_name"] = "Flu"
+        del conditions["appendicitis"]["symptoms"]["nausea"]
+        tmpdir.join("conditions.json").write(json.dumps(conditions))
+        assert generation.generate()["conditions"] == 1
+        assert generation.stats["catalog_loads"] == 2
+
+        # flu has a symptom which changed
+        symptoms["fever"]["name"] = "High fever"
+        tmpdir.join("symptoms.json").write(json.dumps(symptoms))
+        generation.generate()
+        assert generation.stats["modules_generated"] == 2 + 1 + 1
+        assert generation.generate(reload=True)["conditions"] == 0
+        assert generation.stats["catalog_loads"] == 4
+
+    def test_server(self, tmpdir, service, write_priors):
+        server = create_server(service, port=0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        url = "http://%s:%d" % server.server_address
+        try:
+            data = json.dumps({"config_file": write_priors(tmpdir, 0.3)}).encode("utf-8")
+            with urlopen(url + "/generate", data) as response:
+                assert json.load(response)["conditions"] == 2
+            with urlopen(url + "/stats") as response:
+                assert json.load(response)["requests"] == 1
+
+            # an invalid config file is reported, the server keeps running
+            data = json.dumps({"config_file": write_priors(tmpdir, 1.5)}).encode("utf-8")
+            with pytest.raises(HTTPError) as error:
+                urlopen(url + "/generate", data)
+            assert error.value.code == 400
+            assert "error" in json.load(error.value)
+            with urlopen(url + "/stats") as response:
+                assert json.load(response)["requests"] == 1
+
+            # so is a body which is not a json object
+            with pytest.raises(HTTPError) as error:
+                urlopen(url + "/generate", b"[]")
+            assert error.value.code == 400
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        assert tmpdir.join("modules", "flu.json").check()
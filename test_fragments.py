@@ -0,0 +1,72 @@
+import copy
+import json
+from collections import OrderedDict
+
+import pytest
+
+from generator.advanced_module_generator import AdvancedModuleGenerator
+from generator.basic_module_generator import BasicModuleGenerator, TERMINAL_STATE
+from generator.fragments import Fragment, dumps_compact, dumps_indented, freeze, shared
+from generator.generator import GeneratorConfig
+from generator.serializers import get_serializer
+
+
+def document():
+    return OrderedDict([
+        ("name", "Crème brûlée allergy"),
+        ("empty", [{}, [], ""]),
+        ("values", [0.1, 1e-05, 12, 18.0, -1 / 3, None, True, False]),
+        ("fragment", freeze({"nested": {"terminal": [1, {"a": "b"}]}})),
+        ("levels", [[freeze({"x": [1, 2]})]]),
+        (1, "int key"),
+    ])
+
+
+class TestFragments(object):
+
+    def test_read_only(self):
+        fragment = freeze({"a": {"b": 1}})
+        assert isinstance(fragment["a"], Fragment)
+        with pytest.raises(TypeError):
+            fragment["a"] = 2
+        with pytest.raises(TypeError):
+            fragment["a"].update({"c": 3})
+        assert copy.deepcopy(fragment) == {"a": {"b": 1}}
+
+    def test_shared(self):
+        built = []
+        first = shared(("test", 1), lambda: built.append(1) or {"a": 1})
+        assert shared(("test", 1), lambda: built.append(1) or {"a": 1}) is first
+        assert built == [1]
+
+    def test_dumps_indented(self):
+        assert dumps_indented(document()) == json.dumps(document(), indent=4)
+
+    def test_dumps_compact(self):
+        assert dumps_compact(document()) == json.dumps(document(), separators=(",", ":"))
+
+    @pytest.mark.parametrize("generator_class", [BasicModuleGenerator, AdvancedModuleGenerator])
+    def test_modules(self, generator_class, condition_definition, symptom_definition):
+        symptoms = {
+            "nausea": symptom_definition(),
+            "sharp-abdominal-pain": symptom_definition("sharp-abdominal-pain"),
+        }
+        module = generator_class(GeneratorConfig()).generate_module(condition_definition(), symptoms)
+        assert module["states"]["TerminalState"] is TERMINAL_STATE
+        assert dumps_indented(module) == json.dumps(module, indent=4)
+        assert dumps_compact(module) == json.dumps(module, separators=(",", ":"))
+
+    def test_default_serializer(self):
+        # the modules are written through the cached fragments by default
+        fragment = freeze({"type": "Terminal"})
+        module = {"states": {"TerminalState": fragment}}
+        data = get_serializer(GeneratorConfig.json_backend).dumps(module)
+        assert data == json.dumps(module, indent=4)
+        assert fragment._texts == {2: json.dumps(fragment, indent=4).replace("\n", "\n        ")}
+
+    def test_compact_serializer(self):
+        fragment = freeze({"type": "Terminal"})
+        module = {"states": {"TerminalState": fragment}}
+        data = get_serializer(GeneratorConfig.json_backend, compact=True).dumps(module)
+        assert data == json.dumps(module, separators=(",", ":"))
+        assert fragment._texts == {None: '{"type":"Terminal"}'}
@@ -0,0 +1,105 @@
+import json
+import os
+
+import pytest
+
+from generator.basic_module_generator import BasicModuleGenerator
+from generator.generator import GeneratorConfig
+from generator.manifest import Manifest, MANIFEST_NAME
+from generator.serializers import available_backends
+
+
+class TestManifest(object):
+
+    @pytest.fixture(autouse=True)
+    def use_catalog(self, catalog):
+        self.catalog = catalog
+
+    def generate(self, tmpdir, **options):
+        symptoms, conditions = self.catalog()
+        config = GeneratorConfig()
+        config.output_dir = str(tmpdir)
+        config.num_history_years = 0
+        for key, value in options.items():
+            setattr(config, key, value)
+        BasicModuleGenerator(config).generate(conditions, symptoms)
+
+    def mtimes(self, tmpdir):
+        return {path.basename: path.mtime() for path in tmpdir.listdir("*.json")}
+
+    def reset_mtimes(self, tmpdir):
+        for path in tmpdir.listdir("*.json"):
+            os.utime(str(path), (0, 0))
+
+    def test_skip_unchanged(self, tmpdir):
+        self.generate(tmpdir)
+        manifest = Manifest(str(tmpdir)).load()
+        assert sorted(manifest.entries.keys()) == ["appendicitis.json", "flu.json"]
+
+        self.reset_mtimes(tmpdir)
+        self.generate(tmpdir)
+        assert self.mtimes(tmpdir) == {"appendicitis.json": 0, "flu.json": 0}
+
+        # a modified or deleted module is written again
+        tmpdir.join("flu.json").write("{}")
+        os.utime(str(tmpdir.join("flu.json")), (0, 0))
+        tmpdir.join("appendicitis.json").remove()
+        self.generate(tmpdir)
+        assert self.mtimes(tmpdir)["flu.json"] != 0
+        assert tmpdir.join("appendicitis.json").check()
+
+        # so is every module once an input changes
+        self.reset_mtimes(tmpdir)
+        self.generate(tmpdir, min_symptoms=2)
+        assert 0 not in self.mtimes(tmpdir).values()
+
+        # unless the manifest is disabled
+        self.reset_mtimes(tmpdir)
+        self.generate(tmpdir, use_manifest=False)
+        assert 0 not in self.mtimes(tmpdir).values()
+
+    @pytest.mark.parametrize("options, indent", [
+        ({"json_backend": "orjson"}, '\n  "'),
+        ({"compact_output": True}, None),
+    ])
+    def test_serializer_settings(self, tmpdir, options, indent):
+        if options.get("json_backend", "json") not in available_backends():
+            pytest.skip("orjson is not installed")
+        # the layout of the modules depends on the backend and the compact mode
+        self.generate(tmpdir)
+        assert tmpdir.join("flu.json").read().startswith('{\n    "')
+
+        self.reset_mtimes(tmpdir)
+        self.generate(tmpdir, **options)
+        assert 0 not in self.mtimes(tmpdir).values()
+        for path in tmpdir.listdir("*.json"):
+            text = path.read()
+            if indent is None:
+                assert "\n" not in text and '": ' not in text
+            else:
+                assert text.startswith("{" + indent)
+
+    def test_resume(self, tmpdir):
+        self.generate(tmpdir)
+        self.reset_mtimes(tmpdir)
+
+        # an interrupted run: the flu entry is truncated
+        manifest_file = tmpdir.join(MANIFEST_NAME)
+        lines = manifest_file.read().splitlines()
+        manifest_file.write("\n".join(lines[:-1] + [lines[-1][:20]]))
+        assert list(Manifest(str(tmpdir)).load().entries.keys()) == ["appendicitis.json"]
+
+        self.generate(tmpdir)
+        assert self.mtimes(tmpdir) == {"appendicitis.json": 0, "flu.json": self.mtimes(tmpdir)["flu.json"]}
+        assert self.mtimes(tmpdir)["flu.json"] != 0
+        lines = manifest_file.read().splitlines()
+        assert len(lines) == 3
+        assert [json.loads(line)["module"] for line in lines[1:]] == ["appendicitis.json", "flu.json"]
+
+    def test_version_mismatch(self, tmpdir):
+        self.generate(tmpdir)
+        manifest_file = tmpdir.join(MANIFEST_NAME)
+        lines = manifest_file.read().splitlines()
+        manifest_file.write("\n".join([json.dumps({"version": 0})] + lines[1:]))
+
+        assert Manifest(str(tmpdir)).load().entries == {}
@@ -1,6 +1,13 @@
 import os
 
-from parse import parse_symcat_conditions, parse_symcat_symptoms, slugify_condition
+from generator.schema import DEMOGRAPHIC_KEYS
+from parse import parse_symcat_conditions, parse_symcat_symptoms, slugify_condition, \
+    parse_symcat_conditions_incremental, parse_symcat_symptoms_incremental
+
+
+def position(key):
+    # the parsed demographic groups are arrays ordered like `AttrKeys`
+    return next(keys.index(key) for keys in DEMOGRAPHIC_KEYS.values() if key in keys)
 
 
 class TestParser(object):
@@ -88,25 +95,25 @@ class TestParser(object):
             "cause-pyogenic-skin-infection"][prob] == 5
         assert symptom_map[key1][com]["cause-fluid-overload"][prob] == 5
 
-        assert len(symptom_map[key1][age]) == 8
-        assert symptom_map[key1][age]["age-1-years"][odd] == 0.8
-        assert symptom_map[key1][age]["age-1-4-years"][odd] == 0.0
-        assert symptom_map[key1][age]["age-5-14-years"][odd] == 0.0
-        assert symptom_map[key1][age]["age-15-29-years"][odd] == 0.3
-        assert symptom_map[key1][age]["age-30-44-years"][odd] == 0.8
-        assert symptom_map[key1][age]["age-45-59-years"][odd] == 1.9
-        assert symptom_map[key1][age]["age-60-74-years"][odd] == 2.4
-        assert symptom_map[key1][age]["age-75-years"][odd] == 0.3
-
-        assert len(symptom_map[key1][sex]) == 2
-        assert symptom_map[key1][sex]["sex-male"][odd] == 1.2
-        assert symptom_map[key1][sex]["sex-female"][odd] == 0.9
-
-        assert len(symptom_map[key1][race]) == 4
-        assert symptom_map[key1][race]["race-ethnicity-black"][odd] == 0.9
-        assert symptom_map[key1][race]["race-ethnicity-hispanic"][odd] == 0.5
-        assert symptom_map[key1][race]["race-ethnicity-white"][odd] == 1.2
-        assert symptom_map[key1][race]["race-ethnicity-other"][odd] == 0.5
+        assert sum(symptom_map[key1][age]["mask"]) == 8
+        assert symptom_map[key1][age][odd][position("age-1-years")] == 0.8
+        assert symptom_map[key1][age][odd][position("age-1-4-years")] == 0.0
+        assert symptom_map[key1][age][odd][position("age-5-14-years")] == 0.0
+        assert symptom_map[key1][age][odd][position("age-15-29-years")] == 0.3
+        assert symptom_map[key1][age][odd][position("age-30-44-years")] == 0.8
+        assert symptom_map[key1][age][odd][position("age-45-59-years")] == 1.9
+        assert symptom_map[key1][age][odd][position("age-60-74-years")] == 2.4
+        assert symptom_map[key1][age][odd][position("age-75-years")] == 0.3
+
+        assert sum(symptom_map[key1][sex]["mask"]) == 2
+        assert symptom_map[key1][sex][odd][position("sex-male")] == 1.2
+        assert symptom_map[key1][sex][odd][position("sex-female")] == 0.9
+
+        assert sum(symptom_map[key1][race]["mask"]) == 4
+        assert symptom_map[key1][race][odd][position("race-ethnicity-black")] == 0.9
+        assert symptom_map[key1][race][odd][position("race-ethnicity-hispanic")] == 0.5
+        assert symptom_map[key1][race][odd][position("race-ethnicity-white")] == 1.2
+        assert symptom_map[key1][race][odd][position("race-ethnicity-other")] == 0.5
 
         ##################### Test for symptom 2 ##############################
         assert key2 in symptom_map
@@ -125,25 +132,25 @@ class TestParser(object):
             "cause-foreign-body-in-the-ear"][prob] == 3
         assert symptom_map[key2][com]["cause-chronic-otitis-media"][prob] == 2
 
-        assert len(symptom_map[key2][age]) == 8
-        assert symptom_map[key2][age]["age-1-years"][odd] == 2.1
-        assert symptom_map[key2][age]["age-1-4-years"][odd] == 4.2
-        assert symptom_map[key2][age]["age-5-14-years"][odd] == 1.7
-        assert symptom_map[key2][age]["age-15-29-years"][odd] == 0.7
-        assert symptom_map[key2][age]["age-30-44-years"][odd] == 0.8
-        assert symptom_map[key2][age]["age-45-59-years"][odd] == 0.5
-        assert symptom_map[key2][age]["age-60-74-years"][odd] == 0.3
-        assert symptom_map[key2][age]["age-75-years"][odd] == 1.1
-
-        assert len(symptom_map[key2][sex]) == 2
-        assert symptom_map[key2][sex]["sex-male"][odd] == 1.3
-        assert symptom_map[key2][sex]["sex-female"][odd] == 0.8
-
-        assert len(symptom_map[key2][race]) == 4
-        assert symptom_map[key2][race]["race-ethnicity-black"][odd] == 0.9
-        assert symptom_map[key2][race]["race-ethnicity-hispanic"][odd] == 1.4
-        assert symptom_map[key2][race]["race-ethnicity-white"][odd] == 0.9
-        assert symptom_map[key2][race]["race-ethnicity-other"][odd] == 1.0
+        assert sum(symptom_map[key2][age]["mask"]) == 8
+        assert symptom_map[key2][age][odd][position("age-1-years")] == 2.1
+        assert symptom_map[key2][age][odd][position("age-1-4-years")] == 4.2
+        assert symptom_map[key2][age][odd][position("age-5-14-years")] == 1.7
+        assert symptom_map[key2][age][odd][position("age-15-29-years")] == 0.7
+        assert symptom_map[key2][age][odd][position("age-30-44-years")] == 0.8
+        assert symptom_map[key2][age][odd][position("age-45-59-years")] == 0.5
+        assert symptom_map[key2][age][odd][position("age-60-74-years")] == 0.3
+        assert symptom_map[key2][age][odd][position("age-75-years")] == 1.1
+
+        assert sum(symptom_map[key2][sex]["mask"]) == 2
+        assert symptom_map[key2][sex][odd][position("sex-male")] == 1.3
+        assert symptom_map[key2][sex][odd][position("sex-female")] == 0.8
+
+        assert sum(symptom_map[key2][race]["mask"]) == 4
+        assert symptom_map[key2][race][odd][position("race-ethnicity-black")] == 0.9
+        assert symptom_map[key2][race][odd][position("race-ethnicity-hispanic")] == 1.4
+        assert symptom_map[key2][race][odd][position("race-ethnicity-white")] == 0.9
+        assert symptom_map[key2][race][odd][position("race-ethnicity-other")] == 1.0
 
     def test_symcat_condition__parser(self, tmpdir):
         sample_conditions = [
@@ -240,25 +247,25 @@ class TestParser(object):
         assert condition_map[key1][sym]["groin-pain"][prob] == 7
         assert condition_map[key1][sym]["pallor"][prob] == 7
 
-        assert len(condition_map[key1][age]) == 8
-        assert condition_map[key1][age]["age-1-years"][odd] == 0.0
-        assert condition_map[key1][age]["age-1-4-years"][odd] == 0.0
-        assert condition_map[key1][age]["age-5-14-years"][odd] == 0.0
-        assert condition_map[key1][age]["age-15-29-years"][odd] == 0.0
-        assert condition_map[key1][age]["age-30-44-years"][odd] == 0.1
-        assert condition_map[key1][age]["age-45-59-years"][odd] == 0.4
-        assert condition_map[key1][age]["age-60-74-years"][odd] == 2.9
-        assert condition_map[key1][age]["age-75-years"][odd] == 5.0
-
-        assert len(condition_map[key1][sex]) == 2
-        assert condition_map[key1][sex]["sex-male"][odd] == 1.8
-        assert condition_map[key1][sex]["sex-female"][odd] == 0.4
-
-        assert len(condition_map[key1][race]) == 4
-        assert condition_map[key1][race]["race-ethnicity-black"][odd] == 0.4
-        assert condition_map[key1][race]["race-ethnicity-hispanic"][odd] == 0.6
-        assert condition_map[key1][race]["race-ethnicity-white"][odd] == 1.4
-        assert condition_map[key1][race]["race-ethnicity-other"][odd] == 0.1
+        assert sum(condition_map[key1][age]["mask"]) == 8
+        assert condition_map[key1][age][odd][position("age-1-years")] == 0.0
+        assert condition_map[key1][age][odd][position("age-1-4-years")] == 0.0
+        assert condition_map[key1][age][odd][position("age-5-14-years")] == 0.0
+        assert condition_map[key1][age][odd][position("age-15-29-years")] == 0.0
+        assert condition_map[key1][age][odd][position("age-30-44-years")] == 0.1
+        assert condition_map[key1][age][odd][position("age-45-59-years")] == 0.4
+        assert condition_map[key1][age][odd][position("age-60-74-years")] == 2.9
+        assert condition_map[key1][age][odd][position("age-75-years")] == 5.0
+
+        assert sum(condition_map[key1][sex]["mask"]) == 2
+        assert condition_map[key1][sex][odd][position("sex-male")] == 1.8
+        assert condition_map[key1][sex][odd][position("sex-female")] == 0.4
+
+        assert sum(condition_map[key1][race]["mask"]) == 4
+        assert condition_map[key1][race][odd][position("race-ethnicity-black")] == 0.4
+        assert condition_map[key1][race][odd][position("race-ethnicity-hispanic")] == 0.6
+        assert condition_map[key1][race][odd][position("race-ethnicity-white")] == 1.4
+        assert condition_map[key1][race][odd][position("race-ethnicity-other")] == 0.1
 
         ##################### Test for condition 2 ############################
         assert key2 in condition_map
@@ -279,22 +286,123 @@ class TestParser(object):
         assert condition_map[key2][sym]["decreased-appetite"][prob] == 11
         assert condition_map[key2][sym]["stomach-bloating"][prob] == 5
 
-        assert len(condition_map[key2][age]) == 8
-        assert condition_map[key2][age]["age-1-years"][odd] == 0.0
-        assert condition_map[key2][age]["age-1-4-years"][odd] == 0.3
-        assert condition_map[key2][age]["age-5-14-years"][odd] == 2.2
-        assert condition_map[key2][age]["age-15-29-years"][odd] == 1.9
-        assert condition_map[key2][age]["age-30-44-years"][odd] == 1.0
-        assert condition_map[key2][age]["age-45-59-years"][odd] == 0.7
-        assert condition_map[key2][age]["age-60-74-years"][odd] == 0.5
-        assert condition_map[key2][age]["age-75-years"][odd] == 0.2
-
-        assert len(condition_map[key2][sex]) == 2
-        assert condition_map[key2][sex]["sex-male"][odd] == 1.3
-        assert condition_map[key2][sex]["sex-female"][odd] == 0.8
-
-        assert len(condition_map[key2][race]) == 4
-        assert condition_map[key2][race]["race-ethnicity-black"][odd] == 0.4
-        assert condition_map[key2][race]["race-ethnicity-hispanic"][odd] == 1.5
-        assert condition_map[key2][race]["race-ethnicity-white"][odd] == 1.0
-        assert condition_map[key2][race]["race-ethnicity-other"][odd] == 1.3
+        assert sum(condition_map[key2][age]["mask"]) == 8
+        assert condition_map[key2][age][odd][position("age-1-years")] == 0.0
+        assert condition_map[key2][age][odd][position("age-1-4-years")] == 0.3
+        assert condition_map[key2][age][odd][position("age-5-14-years")] == 2.2
+        assert condition_map[key2][age][odd][position("age-15-29-years")] == 1.9
+        assert condition_map[key2][age][odd][position("age-30-44-years")] == 1.0
+        assert condition_map[key2][age][odd][position("age-45-59-years")] == 0.7
+        assert condition_map[key2][age][odd][position("age-60-74-years")] == 0.5
+        assert condition_map[key2][age][odd][position("age-75-years")] == 0.2
+
+        assert sum(condition_map[key2][sex]["mask"]) == 2
+        assert condition_map[key2][sex][odd][position("sex-male")] == 1.3
+        assert condition_map[key2][sex][odd][position("sex-female")] == 0.8
+
+        assert sum(condition_map[key2][race]["mask"]) == 4
+        assert condition_map[key2][race][odd][position("race-ethnicity-black")] == 0.4
+        assert condition_map[key2][race][odd][position("race-ethnicity-hispanic")] == 1.5
+        assert condition_map[key2][race][odd][position("race-ethnicity-white")] == 1.0
+        assert condition_map[key2][race][odd][position("race-ethnicity-other")] == 1.3
+
+    def test_symcat_symptom__incremental_parser(self, tmpdir, make_row):
+        def symptom_rows(description, male_odds):
+            return [
+                make_row(105, {}),
+                make_row(105, {
+                    0: "Abdominal distention",
+                    1: "http://www.symcat.com/symptoms/abdominal-distention",
+                    2: "Abdominal distention",
+                    3: "description_1",
+                    5: "Cirrhosis",
+                    6: "http://www.symcat.com/conditions/cirrhosis",
+                    7: "18",
+                }),
+                make_row(105, {
+                    13: "Male",
+                    14: "http://www.symcat.com/demographics/sex-male",
+                    15: male_odds,
+                    16: "Abdominal distention",
+                }),
+                make_row(105, {
+                    21: "Bleeding from ear",
+                    22: "http://www.symcat.com/symptoms/bleeding-from-ear",
+                    23: "Bleeding from ear",
+                    24: description,
+                    26: "Otitis media",
+                    27: "http://www.symcat.com/conditions/otitis-media",
+                    28: "34",
+                }),
+            ]
+
+        previous = tmpdir.join("previous.csv")
+        previous.write("\n".join(symptom_rows("description_2", "1.2x")))
+        previous_map = parse_symcat_symptoms(str(previous))
+
+        # unchanged export
+        symptom_map, changelog = parse_symcat_symptoms_incremental(
+            str(previous), str(previous), previous_map
+        )
+        assert symptom_map == previous_map
+        assert changelog == {"added": [], "removed": [], "modified": []}
+
+        # one demographic row changed
+        revised = tmpdir.join("revised.csv")
+        revised.write("\n".join(symptom_rows("description_2", "1.5x")))
+        symptom_map, changelog = parse_symcat_symptoms_incremental(
+            str(revised), str(previous), previous_map
+        )
+        assert symptom_map == parse_symcat_symptoms(str(revised))
+        assert symptom_map["abdominal-distention"]["sex"]["odds"][position("sex-male")] == 1.5
+        assert changelog == {"added": [], "removed": [], "modified": ["abdominal-distention"]}
+
+        # one symptom removed
+        rows = symptom_rows("description_2", "1.2x")
+        revised.write("\n".join(rows[:3]))
+        symptom_map, changelog = parse_symcat_symptoms_incremental(
+            str(revised), str(previous), previous_map
+        )
+        assert symptom_map == parse_symcat_symptoms(str(revised))
+        assert changelog == {"added": [], "removed": ["bleeding-from-ear"], "modified": []}
+
+    def test_symcat_condition__incremental_parser(self, tmpdir, make_row):
+        def condition_rows(symptom_probability, age_odds):
+            return [
+                make_row(175, {}),
+                make_row(175, {
+                    0: "Appendicitis",
+                    1: "http://www.symcat.com/conditions/appendicitis",
+                    2: "Appendicitis",
+                    3: "condition_description_2",
+                    4: "symptom_summary_2",
+                    5: "Abdominal distention",
+                    6: "http://www.symcat.com/symptoms/abdominal-distention",
+                    7: symptom_probability,
+                }),
+                make_row(175, {
+                    10: "< 1 years",
+                    11: "http://www.symcat.com/demographics/age-1-years",
+                    12: age_odds,
+                    13: "Appendicitis",
+                }),
+            ]
+
+        previous = tmpdir.join("previous.csv")
+        previous.write("\n".join(condition_rows("91", "0.1x")))
+        previous_map = parse_symcat_conditions(str(previous))
+        key = slugify_condition("Appendicitis")
+
+        revised = tmpdir.join("revised.csv")
+        revised.write("\n".join(condition_rows("91", "0.4x")))
+        condition_map, changelog = parse_symcat_conditions_incremental(
+            str(revised), str(previous), previous_map
+        )
+        assert condition_map == parse_symcat_conditions(str(revised))
+        assert condition_map[key]["age"]["odds"][position("age-1-years")] == 0.4
+        assert changelog == {"added": [], "removed": [], "modified": [key]}
+
+        condition_map, changelog = parse_symcat_conditions_incremental(
+            str(revised), str(revised), condition_map
+        )
+        assert changelog == {"added": [], "removed": [], "modified": []}
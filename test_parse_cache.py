@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+
+import parse_cache
+from generator.serializers import get_serializer
+from parse_cache import ParseCache, SYMPTOMS, CONDITIONS
+
+
+@pytest.fixture
+def symptom_rows(make_row):
+    def rows(description):
+        return [
+            make_row(105, {}),
+            make_row(105, {
+                0: "Abdominal distention",
+                1: "http://www.symcat.com/symptoms/abdominal-distention",
+                2: "Abdominal distention",
+                3: description,
+                5: "Cirrhosis",
+                6: "http://www.symcat.com/conditions/cirrhosis",
+                7: "18",
+            }),
+        ]
+    return rows
+
+
+class TestParseCache(object):
+
+    def write_csv(self, tmpdir, rows):
+        filename = os.path.join(tmpdir, "symptoms.csv")
+        with open(filename, "w") as fp:
+            fp.write("\n".join(rows))
+        return filename
+
+    def test_cache_hit(self, tmpdir, monkeypatch, symptom_rows):
+        filename = self.write_csv(tmpdir, symptom_rows("description_1"))
+        cache = ParseCache(os.path.join(tmpdir, "cache"))
+
+        data = cache.parse(SYMPTOMS, filename)
+        assert data["abdominal-distention"]["description"] == "description_1"
+
+        calls = []
+        monkeypatch.setitem(
+            parse_cache.PARSERS, SYMPTOMS, lambda name: calls.append(name)
+        )
+        assert cache.parse(SYMPTOMS, filename) == data
+        path = cache.ensure(SYMPTOMS, filename)
+        assert len(calls) == 0
+
+        with open(path) as fp:
+            assert json.load(fp) == data
+
+    def test_cache_invalidation(self, tmpdir, monkeypatch, symptom_rows):
+        filename = self.write_csv(tmpdir, symptom_rows("description_1"))
+        cache = ParseCache(os.path.join(tmpdir, "cache"))
+        first_path = cache.ensure(SYMPTOMS, filename)
+
+        # a different kind never shares an entry
+        assert cache.fetch(CONDITIONS, filename) is None
+
+        # a modified export is parsed again
+        self.write_csv(tmpdir, symptom_rows("description_2"))
+        assert cache.fetch(SYMPTOMS, filename) is None
+        data = cache.parse(SYMPTOMS, filename)
+        assert data["abdominal-distention"]["description"] == "description_2"
+        assert cache.fetch(SYMPTOMS, filename) != first_path
+
+        # so is an unchanged export once the parser changes
+        monkeypatch.setattr(parse_cache.parse, "PARSER_VERSION", -1)
+        assert ParseCache(cache.cache_dir).fetch(SYMPTOMS, filename) is None
+
+        # or the schema the parser normalizes the definitions with
+        monkeypatch.undo()
+        monkeypatch.setattr(parse_cache.schema, "SCHEMA_VERSION", -1)
+        assert ParseCache(cache.cache_dir).fetch(SYMPTOMS, filename) is None
+
+    def test_module_sources(self, tmpdir, monkeypatch, symptom_rows):
+        filename = self.write_csv(tmpdir, symptom_rows("description_1"))
+        cache_dir = os.path.join(tmpdir, "cache")
+        ParseCache(cache_dir).ensure(SYMPTOMS, filename)
+
+        # the source of the modules the parser uses is part of the fingerprint
+        module = tmpdir.join("normalizer.py")
+        module.write("VERSION = 1\n")
+        monkeypatch.setattr(
+            parse_cache, "PARSER_MODULES",
+            parse_cache.PARSER_MODULES + [type("Module", (), {"__file__": str(module)})]
+        )
+        assert ParseCache(cache_dir).fetch(SYMPTOMS, filename) is None
+        ParseCache(cache_dir).ensure(SYMPTOMS, filename)
+        module.write("VERSION = 2\n")
+        assert ParseCache(cache_dir).fetch(SYMPTOMS, filename) is None
+
+    def test_serializer(self, tmpdir, symptom_rows):
+        filename = self.write_csv(tmpdir, symptom_rows("description_1"))
+        cache_dir = os.path.join(tmpdir, "cache")
+        indented = ParseCache(cache_dir).ensure(SYMPTOMS, filename)
+        compact = ParseCache(cache_dir, get_serializer(compact=True)).ensure(SYMPTOMS, filename)
+        # an entry holds the exact text written with its serializer
+        assert compact != indented
+        with open(indented) as fp:
+            data = json.load(fp)
+        with open(compact) as fp:
+            assert fp.read() == get_serializer(compact=True).dumps(data)
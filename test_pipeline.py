@@ -0,0 +1,48 @@
+import os
+
+from parse import parse_symcat_conditions, parse_symcat_symptoms
+from pipeline import parse_catalog
+
+
+class TestPipeline(object):
+
+    def test_parse_catalog(self, tmpdir, make_row):
+        symptoms = tmpdir.join("symptoms.csv")
+        symptoms.write("\n".join([
+            make_row(105, {}),
+            make_row(105, {
+                0: "Abdominal distention",
+                1: "http://www.symcat.com/symptoms/abdominal-distention",
+                2: "Abdominal distention",
+                3: "description_1",
+                5: "Cirrhosis",
+                6: "http://www.symcat.com/conditions/cirrhosis",
+                7: "18",
+            }),
+        ]))
+        conditions = tmpdir.join("conditions.csv")
+        conditions.write("\n".join([
+            make_row(175, {}),
+            make_row(175, {
+                0: "Appendicitis",
+                1: "http://www.symcat.com/conditions/appendicitis",
+                2: "Appendicitis",
+                3: "condition_description_2",
+                4: "symptom_summary_2",
+                5: "Abdominal distention",
+                6: "http://www.symcat.com/symptoms/abdominal-distention",
+                7: "91",
+            }),
+        ]))
+        expected = (
+            parse_symcat_symptoms(str(symptoms)),
+            parse_symcat_conditions(str(conditions))
+        )
+
+        assert parse_catalog(str(symptoms), str(conditions)) == expected
+        assert parse_catalog(str(symptoms), str(conditions), concurrent=False) == expected
+
+        cache_dir = os.path.join(tmpdir, "cache")
+        assert parse_catalog(str(symptoms), str(conditions), cache_dir) == expected
+        assert len(os.listdir(cache_dir)) == 2
+        assert parse_catalog(str(symptoms), str(conditions), cache_dir) == expected
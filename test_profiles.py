@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from generator.advanced_module_generator import AdvancedModuleGenerator
+from generator.basic_module_generator import BasicModuleGenerator
+from generator.generator import Generator, GeneratorConfig
+from generator.profiles import get_profile
+
+
+@pytest.fixture
+def generate_module(condition_definition, symptom_definition):
+    def generate(generator_class, profile):
+        config = GeneratorConfig()
+        config.output_profile = profile
+        symptoms = {"nausea": symptom_definition()}
+        return generator_class(config).generate_module(condition_definition(), symptoms)
+    return generate
+
+
+def fields(value):
+    """Returns the keys of all the objects nested in `value`."""
+    if isinstance(value, dict):
+        return set(value.keys()).union(*[fields(item) for item in value.values()])
+    if isinstance(value, list):
+        return set().union(*[fields(item) for item in value])
+    return set()
+
+
+class TestProfiles(object):
+
+    @pytest.mark.parametrize("generator_class", [BasicModuleGenerator, AdvancedModuleGenerator])
+    def test_profiles(self, generator_class, generate_module, symptom_definition):
+        full = generate_module(generator_class, "full")
+        lean = generate_module(generator_class, "lean")
+        minimal = generate_module(generator_class, "minimal")
+
+        assert {"remarks", "display"} <= fields(full)
+        assert "remarks" not in fields(lean) and "display" in fields(lean)
+        assert not {"remarks", "display"} & fields(minimal)
+        assert len(json.dumps(minimal)) < len(json.dumps(lean)) < len(json.dumps(full))
+
+        # only the descriptive fields differ
+        for module in [lean, minimal]:
+            assert list(module["states"].keys()) == list(full["states"].keys())
+        symptom = [state for state in minimal["states"].values() if state["type"] == "Symptom"][0]
+        assert symptom["symptom_code"] == {"system": "sha224", "code": symptom_definition()["hash"]}
+
+    def test_symptom_fields(self):
+        config = GeneratorConfig()
+        config.output_profile = "lean"
+        assert AdvancedModuleGenerator(config).symptom_fields == ("sex", "age", "race")
+        assert BasicModuleGenerator(config).symptom_fields == ()
+        assert AdvancedModuleGenerator(GeneratorConfig()).symptom_fields == (
+            "description", "sex", "age", "race"
+        )
+
+    def test_generate(self, tmpdir, catalog):
+        symptoms, conditions = catalog()
+        config = GeneratorConfig()
+        config.output_dir = str(tmpdir.join("modules"))
+        config.output_profile = "minimal"
+        Generator(config).generate(symptoms, conditions)
+        for path in tmpdir.join("modules").listdir("*.json"):
+            assert '"remarks"' not in path.read() and '"display"' not in path.read()
+
+    def test_invalid_profile(self):
+        with pytest.raises(ValueError):
+            get_profile("tiny")
@@ -0,0 +1,72 @@
+import json
+
+from generator.helpers import AttrKeys, prob_val
+from generator.records import ConditionRecord, Demographics, SymptomRecord, \
+    load_condition, load_conditions, load_symptom, load_symptoms
+from generator.schema import normalize_catalog, normalize_definition
+
+
+class TestRecords(object):
+
+    def test_load_condition(self, condition_definition):
+        record = load_condition(condition_definition())
+
+        assert isinstance(record, ConditionRecord)
+        assert load_condition(record) is record
+        assert record.name == "Appendicitis"
+        assert len(record.hash) == 56
+        assert [edge.slug for edge in record.symptoms] == ["sharp-abdominal-pain", "nausea"]
+        assert list(record.sex.probs) == [prob_val(1.3), prob_val(0.8)]
+        assert record.sex.has_data
+        assert not record.age.has_data
+        assert record.race.names[AttrKeys.RACE_KEYS.index("race-ethnicity-white")] == "White"
+
+        # records have no per instance dictionary
+        assert not hasattr(record, "__dict__")
+        assert not hasattr(record.sex, "__dict__")
+
+    def test_shared_groups(self, condition_definition, symptom_definition):
+        first = load_condition(condition_definition())
+        second = load_condition(normalize_catalog({"a": condition_definition()})["a"])
+        symptom = load_symptom("nausea", symptom_definition())
+
+        # empty groups and category names are shared between definitions
+        assert first.age is second.age
+        assert first.sex.names is second.sex.names
+        assert symptom.sex is Demographics.from_compact(
+            {"odds": [0.0, 0.0], "probs": [0.0, 0.0], "mask": [0, 0]}, AttrKeys.SEX_KEYS
+        )
+
+    def test_round_trip(self, condition_definition, symptom_definition):
+        # the records are written in the current schema
+        definition = normalize_definition(condition_definition())
+        assert json.loads(json.dumps(load_condition(condition_definition()).to_dict())) == definition
+        assert json.loads(json.dumps(load_condition(definition).to_dict())) == definition
+
+        symptoms = load_symptoms({"nausea": symptom_definition(), "fever": None})
+        assert isinstance(symptoms["nausea"], SymptomRecord)
+        assert symptoms["fever"] is None
+        assert symptoms["nausea"].to_dict() == normalize_definition(symptom_definition())
+
+        conditions = load_conditions({"appendicitis": definition})
+        assert conditions["appendicitis"].slug == "appendicitis"
+
+    def test_projection(self, symptom_definition):
+        definition = symptom_definition()
+        definition["common_causes"] = {
+            "cause-appendicitis": {"name": "Appendicitis", "slug": "cause-appendicitis", "probability": 12.0}
+        }
+
+        record = load_symptom("nausea", definition, ("description",))
+        assert record.name == "Nausea"
+        assert record.description == "description"
+        assert record.sex is None and record.age is None and record.race is None
+        assert record.common_causes is None
+
+        record = load_symptom("nausea", definition, ("sex", "age", "race"))
+        assert record.description is None
+        assert record.age.has_data
+        assert record.common_causes is None
+
+        symptoms = load_symptoms(iter([("nausea", definition)]), ())
+        assert symptoms["nausea"].to_dict()["common_causes"] == {}
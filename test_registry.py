@@ -0,0 +1,62 @@
+import hashlib
+
+import pytest
+
+from generator.advanced_module_generator import AdvancedModuleGenerator
+from generator.basic_module_generator import BasicModuleGenerator
+from generator.generator import GeneratorConfig
+from generator.registry import REGISTRY, SlugRegistry, slug_hash
+from generator.records import load_condition
+from parse import parse_symcat_conditions
+
+
+class TestRegistry(object):
+
+    def test_slug_hash(self, monkeypatch):
+        registry = SlugRegistry()
+        code = registry.slug_hash("appendicitis")
+        assert code == hashlib.sha224(b"appendicitis").hexdigest()
+
+        # the code is only computed once
+        monkeypatch.setattr(hashlib, "sha224", None)
+        assert registry.slug_hash("".join(["append", "icitis"])) is code
+
+    def test_register(self, condition_definition):
+        registry = SlugRegistry()
+        slug = "".join(["nau", "sea"])
+        code = registry.register(slug, hashlib.sha224(b"nausea").hexdigest())
+        assert registry.slug_hash("nausea") is code
+        assert registry.to_dict() == {"nausea": code}
+
+        # a missing code is computed, a wrong one is rejected
+        assert registry.register("fever", None) == hashlib.sha224(b"fever").hexdigest()
+        with pytest.raises(ValueError):
+            registry.register("fever", code)
+        with pytest.raises(ValueError):
+            load_condition(dict(condition_definition("flu"), condition_hash=code))
+
+    @pytest.mark.parametrize("generator_class", [BasicModuleGenerator, AdvancedModuleGenerator])
+    def test_undefined_symptom(self, generator_class, condition_definition):
+        # a condition may reference symptoms missing from the export
+        module = generator_class(GeneratorConfig()).generate_module(condition_definition(), {})
+        codes = [
+            state["symptom_code"] for state in module["states"].values()
+            if state["type"] == "Symptom"
+        ]
+        assert sorted(code["display"] for code in codes) == ["nausea", "sharp-abdominal-pain"]
+        assert all(code["code"] == slug_hash(code["display"]) for code in codes)
+
+    def test_shared_with_parser(self, tmpdir):
+        row = [""] * 175
+        row[0] = "Appendicitis"
+        row[1] = "http://www.symcat.com/conditions/appendicitis"
+        row[5] = "Sharp abdominal pain"
+        row[6] = "http://www.symcat.com/symptoms/sharp-abdominal-pain"
+        row[7] = "86"
+        filename = tmpdir.join("conditions.csv")
+        filename.write("\n".join([",".join([""] * 175), ",".join(row)]))
+
+        definition = parse_symcat_conditions(str(filename))["appendicitis"]
+        assert definition["condition_hash"] == slug_hash("appendicitis")
+        assert definition["condition_slug"] is REGISTRY.intern("".join(["append", "icitis"]))
+        assert load_condition(definition).hash is definition["condition_hash"]
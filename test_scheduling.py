@@ -0,0 +1,79 @@
+import json
+
+from generator.advanced_module_generator import AdvancedModuleGenerator
+from generator.generator import GeneratorConfig
+from generator.records import load_condition, load_conditions, load_symptoms
+from generator.scheduling import ModuleTask, longest_first
+from generator.sinks import DirectorySink
+
+
+class TestScheduling(object):
+
+    def test_longest_first(self):
+        tasks = [ModuleTask(name, None, cost=cost) for name, cost in [("a", 1), ("b", 10), ("c", 5)]]
+        assert [task.module_name for task in longest_first(tasks)] == ["b", "c", "a"]
+
+    def test_estimate_cost(self, condition_definition, symptom_definition):
+        module_generator = AdvancedModuleGenerator(GeneratorConfig())
+        definition = condition_definition()
+        symptoms = load_symptoms({"nausea": symptom_definition()})
+        cost = module_generator.estimate_cost(load_condition(definition), symptoms)
+        # no age data for the condition, a single transition for nausea (one age group)
+        # and for the undefined symptom
+        assert cost == 0 + 1 + 1
+
+        definition["age"] = {
+            "age-1-years": {"name": "< 1 years", "slug": "age-1-years", "odds": 1.5}
+        }
+        cost = module_generator.estimate_cost(load_condition(definition), symptoms)
+        # 6 races, 2 sexes and one age group for the condition
+        assert cost == 6 * 2 * 1 + 1 + 1
+
+    def test_workers(self, tmpdir, generate):
+        expected = generate(tmpdir.join("serial"))
+        timing_log = str(tmpdir.join("timing.jsonl"))
+        assert generate(tmpdir.join("workers"), num_workers=2, timing_log=timing_log) == expected
+
+        with open(timing_log) as fp:
+            entries = [json.loads(line) for line in fp]
+        assert sorted(entry["module"] for entry in entries) == ["appendicitis.json", "flu.json"]
+        assert all(entry["cost"] > 0 and entry["seconds"] >= 0 for entry in entries)
+
+    def test_serial_timing_log(self, tmpdir, monkeypatch, generate):
+        estimated = []
+        estimate_cost = AdvancedModuleGenerator.estimate_cost
+
+        def counting_estimate_cost(module_generator, condition, symptoms):
+            estimated.append(condition.slug)
+            return estimate_cost(module_generator, condition, symptoms)
+
+        monkeypatch.setattr(AdvancedModuleGenerator, "estimate_cost", counting_estimate_cost)
+        for name, options in [("serial", {}), ("queue", {"work_queue_dir": str(tmpdir.join("jobs"))})]:
+            del estimated[:]
+            timing_log = str(tmpdir.join("%s.jsonl" % name))
+            generate(tmpdir.join(name), timing_log=timing_log, **options)
+
+            # the cost of every module is estimated once, when the run is planned
+            assert sorted(estimated) == ["appendicitis", "flu"]
+            with open(timing_log) as fp:
+                entries = [json.loads(line) for line in fp]
+            assert sorted(entry["module"] for entry in entries) == ["appendicitis.json", "flu.json"]
+            assert all(entry["cost"] > 0 for entry in entries)
+
+    def test_plan(self, tmpdir, catalog):
+        symptoms, conditions = catalog()
+        config = GeneratorConfig()
+        config.output_dir = str(tmpdir)
+        module_generator = AdvancedModuleGenerator(config)
+        sink = DirectorySink(config.output_dir)
+        symptoms = load_symptoms(symptoms)
+
+        # the tasks are streamed and their cost is only estimated to order them
+        plan = module_generator.plan(load_conditions(conditions), symptoms, sink)
+        assert not isinstance(plan.tasks, list)
+        assert [task.cost for task in plan.tasks] == [None, None]
+        assert plan.recorder is plan.manifest
+
+        config.num_workers = 2
+        plan = module_generator.plan(load_conditions(conditions), symptoms, sink)
+        assert [task.module_name for task in longest_first(plan.tasks)] == ["appendicitis.json", "flu.json"]
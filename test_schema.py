@@ -0,0 +1,77 @@
+import pytest
+
+from generator.helpers import AttrKeys, prob_val
+from generator.schema import category_names, compact_group, get_demographics, \
+    normalize_catalog, SCHEMA_VERSION, RACE_PRIOR_INDEX
+
+
+class TestSchema(object):
+
+    def test_compact_group(self):
+        group = {
+            "sex-female": {"name": "Female", "slug": "sex-female", "odds": 0.8},
+        }
+        compact = compact_group(group, AttrKeys.SEX_KEYS)
+
+        assert compact["mask"] == [0, 1]
+        assert compact["odds"] == [0.0, 0.8]
+        assert compact["probs"] == [0.0, prob_val(0.8)]
+        # the names are the same for every definition, they are not stored
+        assert "names" not in compact
+        assert category_names(AttrKeys.SEX_KEYS) == ("Male", "Female")
+
+        compact = compact_group({}, AttrKeys.RACE_KEYS)
+        assert compact["mask"] == [0, 0, 0, 0]
+
+    def test_unknown_category(self):
+        with pytest.raises(ValueError):
+            compact_group(
+                {"race-ethnicity-asian": {"name": "Asian", "slug": "race-ethnicity-asian", "odds": 1.2}},
+                AttrKeys.RACE_KEYS
+            )
+        with pytest.raises(ValueError):
+            compact_group(
+                {"sex-male": {"name": "Men", "slug": "sex-male", "odds": 1.2}}, AttrKeys.SEX_KEYS
+            )
+
+    def test_race_prior_index(self):
+        other = AttrKeys.RACE_KEYS.index("race-ethnicity-other")
+        for key, idx in zip(AttrKeys.RACE_PRIOR_KEYS, RACE_PRIOR_INDEX):
+            if key in AttrKeys.RACE_KEYS:
+                assert AttrKeys.RACE_KEYS[idx] == key
+            else:
+                assert idx == other
+
+    def test_normalize_catalog(self):
+        data = {
+            "appendicitis": {
+                "condition_name": "Appendicitis",
+                "sex": {
+                    "sex-male": {"name": "Male", "slug": "sex-male", "odds": 1.3},
+                    "sex-female": {"name": "Female", "slug": "sex-female", "odds": 0.8},
+                },
+                "age": {},
+                "race": {},
+            }
+        }
+        legacy = get_demographics(data["appendicitis"])
+        assert "mask" not in data["appendicitis"]["sex"]
+
+        normalize_catalog(data)
+        definition = data["appendicitis"]
+        assert definition["schema_version"] == SCHEMA_VERSION
+        # the nested groups are replaced by their compact form
+        assert get_demographics(definition) == legacy
+        assert get_demographics(definition)["sex"] is definition["sex"]
+        assert definition["sex"]["probs"] == [prob_val(1.3), prob_val(0.8)]
+        assert definition["age"]["mask"] == [0] * len(AttrKeys.AGE_KEYS)
+
+        # so are those of the files holding both forms
+        definition = {
+            "schema_version": 2,
+            "sex": {"sex-male": {"name": "Male", "slug": "sex-male", "odds": 1.3}},
+            "demographics": legacy,
+        }
+        normalize_catalog({"appendicitis": definition})
+        assert definition["sex"]["mask"] == [1, 0]
+        assert "demographics" not in definition
@@ -0,0 +1,84 @@
+import json
+import os
+
+from generator import generator as generator_module
+from generator.generator import Generator, GeneratorConfig
+from generator.selection import changed_condition_priors, ConditionSelection
+
+
+def write_config(tmpdir, name, conditions, male="0.5"):
+    filename = tmpdir.join(name)
+    lines = ["[Gender]", "sex-male = %s" % male, "sex-female = 0.5", "[Conditions]"]
+    lines.extend("%s = %s" % item for item in conditions.items())
+    filename.write("\n".join(lines))
+    return str(filename)
+
+
+class TestSelection(object):
+
+    def test_changed_condition_priors(self, tmpdir):
+        previous = write_config(tmpdir, "previous.ini", {"Appendicitis": "0.3", "Flu": "0.2"})
+        current = write_config(tmpdir, "current.ini", {"Appendicitis": "0.4", "Flu": "0.2", "Otitis": "0.5"})
+        assert changed_condition_priors(previous, current) == {"appendicitis"}
+
+        # the default prior is 0.5
+        current = write_config(tmpdir, "current.ini", {"Appendicitis": "0.3"})
+        assert changed_condition_priors(previous, current) == {"flu"}
+
+        current = write_config(tmpdir, "current.ini", {"Appendicitis": "0.3", "Flu": "0.2"}, male="0.6")
+        assert changed_condition_priors(previous, current) is None
+
+    def test_matches(self):
+        selection = ConditionSelection(["otitis-*", "flu"], r"^abdominal", {"appendicitis"})
+        assert selection.matches("otitis-media", "Otitis media")
+        assert selection.matches("flu", "Flu")
+        assert not selection.matches("flu-like", "Flu like")
+        assert selection.matches("abdominal-aortic-aneurysm", "Abdominal aortic aneurysm")
+        assert selection.matches("appendix", "Appendicitis")
+        assert not selection.matches("burn", "Burn")
+        assert selection.matches_definition("burn", {"condition_name": "appendicitis"})
+
+    def test_from_config(self, tmpdir):
+        config = GeneratorConfig()
+        assert ConditionSelection.from_config(config) is None
+
+        config.condition_regex = "flu"
+        assert ConditionSelection.from_config(config).matches("flu", "Flu")
+
+        config.config_file = write_config(tmpdir, "current.ini", {}, male="0.6")
+        config.changed_priors_file = write_config(tmpdir, "previous.ini", {})
+        assert ConditionSelection.from_config(config) is None
+
+    def test_targeted_generation(self, tmpdir, monkeypatch, catalog):
+        symptoms, conditions = catalog()
+        symptoms_file = tmpdir.join("symptoms.json")
+        symptoms_file.write(json.dumps(symptoms))
+        conditions_file = tmpdir.join("conditions.json")
+        conditions_file.write(json.dumps(conditions))
+
+        config = GeneratorConfig()
+        config.symptom_file = str(symptoms_file)
+        config.conditions_file = str(conditions_file)
+        config.output_dir = str(tmpdir.join("modules"))
+        Generator(config).generate()
+        history_file = os.path.join(config.output_dir, "1_aaaa_update_age_time_to_the_end.json")
+        os.utime(history_file, (0, 0))
+
+        loaded = []
+        load_parsed_symptoms = generator_module.load_parsed_symptoms
+
+        def load_symptoms(filename, fields, slugs):
+            loaded.append(slugs)
+            return load_parsed_symptoms(filename, fields, slugs)
+
+        monkeypatch.setattr(generator_module, "load_parsed_symptoms", load_symptoms)
+        config.condition_slugs = ["fl*"]
+        Generator(config).generate()
+
+        assert loaded == [{"fever"}]
+        # the history module did not change
+        assert os.path.getmtime(history_file) == 0
+
+        config.num_history_years = 2
+        Generator(config).generate()
+        assert os.path.getmtime(history_file) != 0
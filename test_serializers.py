@@ -0,0 +1,52 @@
+import json
+from collections import OrderedDict
+
+import pytest
+
+from generator.serializers import available_backends, benchmark, get_serializer, JsonSerializer
+
+
+def document():
+    return OrderedDict([
+        ("name", "Crème brûlée allergy"),
+        ("states", {"Initial": {"type": "Initial", "direct_transition": "Terminal"}}),
+        ("probabilities", [0.1, 1e-05, 1 / 3, 0, 12, 18.0]),
+        ("remarks", ["a/b", "\"quoted\"", None, True]),
+    ])
+
+
+class TestSerializers(object):
+
+    @pytest.mark.parametrize("backend", available_backends())
+    @pytest.mark.parametrize("compact", [False, True])
+    def test_same_values(self, backend, compact):
+        data = get_serializer(backend, compact).dumps(document())
+        assert json.loads(data) == json.loads(json.dumps(document()))
+        assert list(json.loads(data).keys()) == list(document().keys())
+        assert ("\n" in data) != compact
+
+    def test_stdlib_layout(self):
+        assert get_serializer("json").dumps(document()) == json.dumps(document(), indent=4)
+        assert get_serializer("json", compact=True).dumps({"a": [1, 2]}) == '{"a":[1,2]}'
+
+    def test_default(self):
+        # the default does not depend on the installed libraries
+        assert get_serializer().name == JsonSerializer.name
+        assert get_serializer().dumps(document()) == json.dumps(document(), indent=4)
+
+    @pytest.mark.parametrize("backend", available_backends())
+    @pytest.mark.parametrize("compact", [False, True])
+    @pytest.mark.parametrize("value", [float("nan"), float("inf"), -float("inf")])
+    def test_non_finite(self, backend, compact, value):
+        with pytest.raises(ValueError):
+            get_serializer(backend, compact).dumps({"states": [None, {"distribution": value}]})
+
+    def test_invalid_backend(self):
+        with pytest.raises(ValueError):
+            get_serializer("pickle")
+
+    def test_benchmark(self):
+        results = benchmark([document()] * 3, repeat=1)
+        assert len(results) == 2 * len(available_backends())
+        sizes = dict(((name, compact), size) for name, compact, _, _, size in results)
+        assert sizes[("json", True)] < sizes[("json", False)]
@@ -0,0 +1,65 @@
+import pytest
+
+from generator.sharding import assign_balanced, merge_shards, parse_shard, Shard
+
+
+def generate_shards(generate, tmpdir, num_shards, balanced=False, shared_dir=False):
+    shard_dirs = []
+    for index in range(num_shards):
+        shard_dir = tmpdir.join("shared" if shared_dir else "shard-%d" % index)
+        generate(shard_dir, shard_index=index, num_shards=num_shards, balance_shards=balanced)
+        shard_dirs.append(str(shard_dir))
+    return shard_dirs
+
+
+class TestSharding(object):
+
+    def test_parse_shard(self):
+        assert parse_shard("1/4") == (1, 4)
+        for text in ["4/4", "1", "a/2", "0/0"]:
+            with pytest.raises(ValueError):
+                parse_shard(text)
+
+    def test_owns(self):
+        slugs = ["slug-%d" % idx for idx in range(100)]
+        shards = [Shard(index, 3) for index in range(3)]
+        for slug in slugs:
+            assert sum(shard.owns(slug) for shard in shards) == 1
+        assert all(any(shard.owns(slug) for slug in slugs) for shard in shards)
+
+    def test_assign_balanced(self):
+        costs = {"a": 10, "b": 6, "c": 5, "d": 4, "e": 1}
+        assert assign_balanced(costs, 2) == {"a": 0, "b": 1, "c": 1, "d": 0, "e": 1}
+
+    @pytest.mark.parametrize("balanced,shared_dir", [(False, False), (True, True)])
+    def test_merge(self, tmpdir, generate, balanced, shared_dir):
+        expected = generate(tmpdir.join("single"))
+        shard_dirs = generate_shards(generate, tmpdir, 2, balanced, shared_dir)
+        # only the first shard writes the history module
+        assert "1_aaaa_update_age_time_to_the_end.json" not in tmpdir.join(
+            "shared" if shared_dir else "shard-1").listdir()
+
+        output_dir = tmpdir.join("merged")
+        manifest = merge_shards(str(output_dir), shard_dirs, ["appendicitis.json", "flu.json"])
+        assert sorted(manifest.entries.keys()) == ["appendicitis.json", "flu.json"]
+        assert {path.basename: path.read() for path in output_dir.listdir("*.json")} == expected
+        assert output_dir.join(".symcat_manifest.jsonl").check()
+
+    def test_merge_errors(self, tmpdir, generate):
+        shard_dirs = generate_shards(generate, tmpdir, 2)
+        with pytest.raises(ValueError, match="Missing"):
+            merge_shards(str(tmpdir.join("merged")), shard_dirs[:1])
+        with pytest.raises(ValueError, match="no shard"):
+            merge_shards(str(tmpdir.join("merged")), shard_dirs, ["appendicitis.json", "cold.json"])
+
+        # every module recorded by both shards
+        manifests = [
+            tmpdir.join("shard-%d" % index, ".symcat_manifest.shard-%d-of-2.jsonl" % index)
+            for index in range(2)
+        ]
+        header, = set(manifest.read().splitlines()[0] for manifest in manifests)
+        lines = [header] + [line for manifest in manifests for line in manifest.read().splitlines()[1:]]
+        for manifest in manifests:
+            manifest.write("\n".join(lines) + "\n")
+        with pytest.raises(ValueError, match="several shards"):
+            merge_shards(str(tmpdir.join("merged")), shard_dirs)
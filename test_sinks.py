@@ -0,0 +1,139 @@
+import json
+import tarfile
+import threading
+import zipfile
+
+import pytest
+
+from generator.generator import Generator, GeneratorConfig
+from generator.sinks import open_sink, DirectorySink, OutputSink, QueuedSink
+
+
+class ListSink(OutputSink):
+
+    def __init__(self, fail_on=None, gate=None):
+        self.written = []
+        self.fail_on = fail_on
+        self.gate = gate
+
+    def write(self, name, data):
+        if self.gate is not None:
+            self.gate.wait()
+        if name == self.fail_on:
+            raise IOError("disk full")
+        self.written.append((name, data))
+
+
+def generate(catalog, tmpdir, output_format, output_file=""):
+    symptoms, conditions = catalog()
+    config = GeneratorConfig()
+    config.output_dir = str(tmpdir.join("modules"))
+    config.output_format = output_format
+    config.output_file = output_file
+    Generator(config).generate(symptoms, conditions)
+    return config
+
+
+def directory_modules(tmpdir):
+    output_dir = tmpdir.join("modules")
+    return {path.basename: path.read() for path in output_dir.listdir("*.json")}
+
+
+class TestSinks(object):
+
+    def test_zip(self, tmpdir, catalog):
+        generate(catalog, tmpdir.mkdir("dir"), "dir")
+        expected = directory_modules(tmpdir.join("dir"))
+
+        generate(catalog, tmpdir, "zip")
+        with zipfile.ZipFile(str(tmpdir.join("modules.zip"))) as archive:
+            assert {name: archive.read(name).decode("utf-8") for name in archive.namelist()} == expected
+        assert not tmpdir.join("modules").check()
+
+    def test_tar(self, tmpdir, catalog):
+        generate(catalog, tmpdir.mkdir("dir"), "dir")
+        expected = directory_modules(tmpdir.join("dir"))
+
+        output_file = str(tmpdir.join("out.tar.gz"))
+        generate(catalog, tmpdir, "tar.gz", output_file)
+        with tarfile.open(output_file) as archive:
+            assert {
+                member.name: archive.extractfile(member).read().decode("utf-8")
+                for member in archive.getmembers()
+            } == expected
+
+    def test_jsonl(self, tmpdir, catalog):
+        generate(catalog, tmpdir.mkdir("dir"), "dir")
+        expected = {
+            name: json.loads(data) for name, data in directory_modules(tmpdir.join("dir")).items()
+        }
+
+        generate(catalog, tmpdir, "jsonl")
+        with open(str(tmpdir.join("modules.jsonl"))) as fp:
+            lines = [json.loads(line) for line in fp]
+        assert {line["name"]: line["module"] for line in lines} == expected
+
+    def test_stdout(self, tmpdir, capsys, catalog):
+        generate(catalog, tmpdir, "stdout")
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 3
+        assert all(set(json.loads(line).keys()) == {"name", "module"} for line in lines)
+        assert not tmpdir.join("modules").check()
+
+    def test_directory_unchanged(self, tmpdir):
+        sink = DirectorySink(str(tmpdir.join("modules")))
+        assert not sink.is_unchanged("a.json", "{}")
+        sink.write("a.json", "{}")
+        assert sink.is_unchanged("a.json", "{}")
+        assert not sink.is_unchanged("a.json", "[]")
+
+    def test_invalid_format(self, tmpdir):
+        with pytest.raises(ValueError):
+            open_sink("rar", str(tmpdir))
+
+    def test_queued_order(self):
+        sink = ListSink()
+        written = []
+        with QueuedSink(sink, max_pending=2) as queued:
+            for idx in range(10):
+                queued.write_module("%d.json" % idx, {"idx": idx}, written.append)
+            queued.flush()
+            assert len(written) == 10
+        assert [name for name, _ in sink.written] == ["%d.json" % idx for idx in range(10)]
+        assert sink.written[3][1] == json.dumps({"idx": 3}, indent=4)
+
+    def test_queued_backpressure(self):
+        gate = threading.Event()
+        queued = QueuedSink(ListSink(gate=gate), max_pending=2)
+        # the writer holds one module, two more fill the queue
+        for idx in range(3):
+            queued.write_module("%d.json" % idx, {})
+        blocked = threading.Thread(target=queued.write_module, args=("3.json", {}))
+        blocked.start()
+        blocked.join(0.2)
+        assert blocked.is_alive()
+        gate.set()
+        blocked.join()
+        queued.close()
+        assert len(queued.sink.written) == 4
+
+    def test_queued_error(self):
+        queued = QueuedSink(ListSink(fail_on="1.json"), max_pending=1)
+        with pytest.raises(IOError):
+            for idx in range(5):
+                queued.write_module("%d.json" % idx, {})
+            queued.flush()
+        # the modules queued after the failure are dropped
+        queued.close()
+        assert [name for name, _ in queued.sink.written] == ["0.json"]
+
+    def test_queued_manifest(self, tmpdir, catalog):
+        generate(catalog, tmpdir, "dir")
+        manifest = tmpdir.join("modules", ".symcat_manifest.jsonl").read()
+        assert len(manifest.splitlines()) == 3
+
+        # nothing is written again by the next run
+        for path in tmpdir.join("modules").listdir("*.json"):
+            path.setmtime(0)
+        generate(catalog, tmpdir, "dir")
+        assert all(path.mtime() == 0 for path in tmpdir.join("modules").listdir("*.json"))
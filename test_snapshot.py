@@ -0,0 +1,124 @@
+import json
+import os
+import struct
+import time
+
+import pytest
+
+from generator.records import load_conditions, load_symptoms
+from generator.schema import normalize_catalog
+from generator.snapshot import is_snapshot, load_parsed, open_snapshot, read_snapshot, \
+    write_snapshot, CONDITIONS, SYMPTOMS
+
+
+class TestSnapshot(object):
+
+    def test_round_trip(self, tmpdir, as_dicts, condition_definition, symptom_definition):
+        symptom = symptom_definition()
+        symptom["common_causes"] = {
+            "appendicitis": {"name": "Appendicitis", "slug": "appendicitis", "probability": 12.0}
+        }
+        symptoms = {"nausea": symptom}
+        conditions = {"appendicitis": condition_definition(), "flu": condition_definition("flu")}
+        conditions["flu"]["condition_remarks"] = None
+
+        filename = str(tmpdir.join("symptoms.snapshot"))
+        write_snapshot(filename, SYMPTOMS, symptoms)
+        kind, records = read_snapshot(filename)
+        assert kind == SYMPTOMS
+        assert as_dicts(records) == as_dicts(load_symptoms(symptoms))
+
+        filename = str(tmpdir.join("conditions.snapshot"))
+        write_snapshot(filename, CONDITIONS, conditions)
+        kind, records = read_snapshot(filename)
+        assert kind == CONDITIONS
+        assert records["flu"].remarks is None
+        assert records["flu"].symptoms[0].probability == 86
+        assert as_dicts(records) == as_dicts(load_conditions(conditions))
+
+    def test_load_parsed(self, tmpdir, as_dicts, condition_definition):
+        conditions = {"appendicitis": condition_definition()}
+        json_file = tmpdir.join("conditions.json")
+        json_file.write(json.dumps(conditions))
+        snapshot_file = str(tmpdir.join("conditions.bin"))
+        write_snapshot(snapshot_file, CONDITIONS, conditions)
+
+        assert not is_snapshot(str(json_file))
+        assert is_snapshot(snapshot_file)
+        assert load_parsed(str(json_file)) == conditions
+        assert as_dicts(load_parsed(snapshot_file)) == normalize_catalog(conditions)
+
+    def test_version_mismatch(self, tmpdir, condition_definition):
+        filename = str(tmpdir.join("conditions.snapshot"))
+        write_snapshot(filename, CONDITIONS, {"appendicitis": condition_definition()})
+        with open(filename, "r+b") as fp:
+            fp.seek(8)
+            fp.write(struct.pack("<H", 0))
+
+        with pytest.raises(ValueError):
+            read_snapshot(filename)
+
+    def test_projection(self, tmpdir, symptom_definition):
+        symptom = symptom_definition()
+        symptom["common_causes"] = {
+            "appendicitis": {"name": "Appendicitis", "slug": "appendicitis", "probability": 12.0}
+        }
+        filename = str(tmpdir.join("symptoms.snapshot"))
+        write_snapshot(filename, SYMPTOMS, {"nausea": symptom})
+
+        _, records = read_snapshot(filename, ("description",))
+        assert records["nausea"].description == "description"
+        assert records["nausea"].common_causes is None
+        assert records["nausea"].age is None
+
+        _, records = read_snapshot(filename, ("age",))
+        assert records["nausea"].age.has_data
+        assert records["nausea"].sex is None
+
+    def test_view(self, tmpdir, as_dicts, condition_definition):
+        conditions = {"appendicitis": condition_definition(), "flu": condition_definition("flu")}
+        conditions["flu"]["condition_name"] = "Grippe \u00e9t\u00e9"
+        filename = str(tmpdir.join("conditions.snapshot"))
+        write_snapshot(filename, CONDITIONS, conditions)
+
+        view = open_snapshot(filename)
+        assert view.kind == CONDITIONS
+        assert list(view) == ["appendicitis", "flu"]
+        assert len(view) == 2
+        assert view["flu"].name == "Grippe \u00e9t\u00e9"
+        assert view.get("cold") is None
+        assert as_dicts(view) == as_dicts(read_snapshot(filename)[1])
+
+    def test_groups_not_loaded(self, tmpdir, symptom_definition):
+        symptoms = load_symptoms({"nausea": symptom_definition()}, ("description",))
+        filename = str(tmpdir.join("symptoms.snapshot"))
+        write_snapshot(filename, SYMPTOMS, symptoms)
+
+        view = open_snapshot(filename, ("description",))
+        assert view["nausea"].description == "description"
+        assert view["nausea"].age is None
+        assert not open_snapshot(filename)["nausea"].age.has_data
+
+    def test_size_and_load_time(self, tmpdir, condition_definition):
+        conditions = {"condition-%d" % idx: condition_definition("condition-%d" % idx)
+                      for idx in range(300)}
+        json_file = tmpdir.join("conditions.json")
+        json_file.write(json.dumps(conditions, indent=4))
+        snapshot_file = str(tmpdir.join("conditions.snapshot"))
+        write_snapshot(snapshot_file, CONDITIONS, conditions)
+
+        assert os.path.getsize(snapshot_file) * 2 < json_file.size()
+
+        def load_json():
+            with open(str(json_file)) as fp:
+                load_conditions(json.load(fp))
+
+        def best_of(function, rounds=5):
+            timings = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                function()
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+
+        assert best_of(lambda: read_snapshot(snapshot_file)) * 2 < best_of(load_json)
@@ -0,0 +1,43 @@
+import json
+from collections import OrderedDict
+
+import pytest
+
+from generator.snapshot import load_parsed
+from generator.streaming import iter_json_entries, iter_parsed, write_jsonl
+
+
+def sample():
+    return OrderedDict([
+        ("appendicitis", {"condition_name": "A {tricky}, \"name\"", "odds": 12345.678e-3}),
+        ("flu", {"symptoms": {"fever": {"slug": "fever", "probability": 90}}, "remarks": None}),
+        ("empty", {}),
+        ("number", 1234567890),
+    ])
+
+
+class TestStreaming(object):
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 1 << 16])
+    def test_iter_json_entries(self, tmpdir, chunk_size):
+        filename = tmpdir.join("conditions.json")
+        filename.write(json.dumps(sample(), indent=4))
+
+        entries = list(iter_json_entries(str(filename), chunk_size=chunk_size))
+        assert entries == list(sample().items())
+
+    def test_empty_and_invalid(self, tmpdir):
+        filename = tmpdir.join("conditions.json")
+        filename.write(" { } ")
+        assert list(iter_json_entries(str(filename))) == []
+
+        filename.write('{"flu": {"remarks": null}')
+        with pytest.raises(ValueError):
+            list(iter_json_entries(str(filename)))
+
+    def test_jsonl(self, tmpdir):
+        filename = str(tmpdir.join("conditions.jsonl"))
+        write_jsonl(filename, sample())
+
+        assert list(iter_parsed(filename)) == list(sample().items())
+        assert load_parsed(filename) == sample()
@@ -0,0 +1,105 @@
+import pytest
+
+from generator import generator, sweep as sweep_module
+from generator.generator import Generator, GeneratorConfig
+from generator.scheduling import shared_catalog
+from generator.snapshot import SnapshotView
+from generator.sweep import generate_sweep, parse_grid, sweep_variants, variant_config
+
+
+@pytest.fixture
+def age_catalog(catalog):
+    # the modules of conditions with age data depend on the priors
+    def build():
+        symptoms, conditions = catalog()
+        conditions["flu"]["condition_name"] = "Flu"
+        for condition in conditions.values():
+            condition["age"] = {
+                "age-75-years": {"name": "75+ years", "slug": "age-75-years", "odds": 1.5}
+            }
+        return symptoms, conditions
+    return build
+
+
+def modules(output_dir):
+    return {path.basename: path.read() for path in output_dir.listdir("*.json")}
+
+
+def generate(age_catalog, output_dir, config_file):
+    config = GeneratorConfig()
+    config.output_dir = str(output_dir)
+    config.config_file = config_file
+    Generator(config).generate(*age_catalog())
+    return modules(output_dir)
+
+
+def sweep(age_catalog, output_dir, variants, **options):
+    symptoms, conditions = age_catalog()
+    config = GeneratorConfig()
+    config.output_dir = str(output_dir)
+    for key, value in options.items():
+        setattr(config, key, value)
+    times = generate_sweep(config, variants, symptoms, conditions)
+    return {
+        name: modules(output_dir.join(name)) for name in times.keys()
+    }
+
+
+class TestSweep(object):
+
+    def test_parse_grid(self):
+        assert parse_grid(["Gender.sex-male=0.4, 0.5", "Conditions.appendicitis = 0.1"]) == [
+            ("Gender", "sex-male", ["0.4", "0.5"]),
+            ("Conditions", "appendicitis", ["0.1"]),
+        ]
+        with pytest.raises(ValueError):
+            parse_grid(["sex-male=0.4"])
+
+    def test_variants(self, tmpdir, write_priors):
+        config_file = write_priors(tmpdir, 0.3)
+        variants = sweep_variants([config_file], parse_grid(["Conditions.appendicitis=0.1,0.2"]))
+        assert [variant.name for variant in variants] == [
+            "priors_appendicitis=0.1", "priors_appendicitis=0.2"
+        ]
+        assert variants[1].priors["Conditions"]["appendicitis"] == 0.2
+        # the values of the file which are not in the grid are kept
+        assert variants[1].priors["Gender"]["sex-male"] == 0.5
+
+        variants = sweep_variants(grid=parse_grid(["Gender.sex-male=0.4"]))
+        assert [variant.name for variant in variants] == ["sex-male=0.4"]
+        with pytest.raises(ValueError):
+            sweep_variants([config_file, config_file])
+
+    def test_sweep(self, tmpdir, write_priors, age_catalog):
+        first = write_priors(tmpdir.mkdir("first"), 0.3)
+        second = write_priors(tmpdir.mkdir("second"), 0.6, 0.4)
+        variants = sweep_variants([first]) + sweep_variants([second])
+        variants[1].name = "second"
+
+        # every variant is generated as by a run with its config file
+        expected = {
+            "priors": generate(age_catalog, tmpdir.join("first_run"), first),
+            "second": generate(age_catalog, tmpdir.join("second_run"), second),
+        }
+        assert expected["priors"] != expected["second"]
+        assert sweep(age_catalog, tmpdir.join("sweep"), variants) == expected
+        assert sweep(age_catalog, tmpdir.join("workers"), variants, num_workers=2) == expected
+
+    def test_worker_catalog(self, tmpdir, monkeypatch, write_priors, age_catalog):
+        config_file = write_priors(tmpdir, 0.3)
+        expected = generate(age_catalog, tmpdir.join("run"), config_file)
+
+        # the workers generate from the mapped snapshots without copying the symptoms
+        config = GeneratorConfig()
+        config.output_dir = str(tmpdir.join("sweep"))
+        variant = sweep_variants([config_file])[0]
+        fields = Generator(config).create_module_generator().symptom_fields
+        with shared_catalog(*age_catalog()) as (symptoms_file, conditions_file):
+            sweep_module._init_worker(symptoms_file, conditions_file, fields)
+            try:
+                assert isinstance(sweep_module._worker["symptoms"], SnapshotView)
+                monkeypatch.setattr(generator, "load_symptoms", None)
+                sweep_module._generate_in_worker(variant_config(config, variant))
+            finally:
+                sweep_module._worker.clear()
+        assert modules(tmpdir.join("sweep", variant.name)) == expected
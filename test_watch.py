@@ -0,0 +1,54 @@
+import os
+
+from generator.watch import FileWatcher, watch
+
+
+def touch(filename, offset):
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + offset))
+
+
+class TestWatch(object):
+
+    def test_file_watcher(self, tmpdir):
+        first = tmpdir.join("first")
+        first.write("first")
+        second = str(tmpdir.join("second"))
+        watcher = FileWatcher([str(first), second, ""])
+        assert watcher.changed() == []
+
+        first.write("changed")
+        assert watcher.changed() == [str(first)]
+        assert watcher.changed() == []
+        # a file which appears is a change
+        tmpdir.join("second").write("second")
+        assert watcher.changed() == [second]
+
+    def test_watch(self, tmpdir, service, write_priors):
+        generation = service
+        generation.config.config_file = write_priors(tmpdir, 0.3)
+        catalog_files = [generation.config.symptom_file, generation.config.conditions_file]
+
+        def edit_priors():
+            write_priors(tmpdir, 0.4)
+            touch(generation.config.config_file, 10 ** 9)
+
+        def edit_priors_badly():
+            tmpdir.join("priors.ini").write("[Conditions]\nappendicitis = 2\n")
+            touch(generation.config.config_file, 2 * 10 ** 9)
+
+        edits = iter([edit_priors, lambda: None, edit_priors_badly])
+
+        def stop():
+            edit = next(edits, None)
+            if edit is None:
+                return True
+            edit()
+            return False
+
+        messages = []
+        watch(generation, catalog_files, interval=0, report=messages.append, stop=stop)
+        assert len(messages) == 3
+        assert messages[0].startswith("inputs: generated 2 modules")
+        assert messages[1].startswith("priors.ini: generated 1 modules")
+        assert messages[2].startswith("Could not generate the modules")
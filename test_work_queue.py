@@ -0,0 +1,133 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from generator.scheduling import ModuleTask
+from generator.sinks import DirectorySink
+from generator.work_queue import WorkQueue, CLAIMS_DIR
+
+
+class TestWorkQueue(object):
+
+    def test_claim(self, tmpdir):
+        first = WorkQueue(str(tmpdir), "first")
+        second = WorkQueue(str(tmpdir), "second")
+        assert first.claim("flu.json", "inputs")
+        assert not second.claim("flu.json", "inputs")
+        # a task of other inputs is another task
+        assert second.claim("flu.json", "other")
+
+        first.record("flu.json", "inputs", "output")
+        assert second.done_entry("flu.json", "inputs") == {"inputs": "inputs", "output": "output"}
+        assert not second.claim("flu.json", "inputs")
+
+    def test_stale_claim(self, tmpdir):
+        first = WorkQueue(str(tmpdir), "first")
+        second = WorkQueue(str(tmpdir), "second", lease_timeout=60)
+        assert first.claim("flu.json", "inputs")
+        assert not second.claim("flu.json", "inputs")
+
+        claim = os.path.join(str(tmpdir), CLAIMS_DIR, "flu.json.inputs")
+        past = time.time() - 120
+        os.utime(claim, (past, past))
+        assert second.claim("flu.json", "inputs")
+        assert not first.claim("flu.json", "inputs")
+
+    def test_take_over_race(self, tmpdir, monkeypatch):
+        first = WorkQueue(str(tmpdir), "first")
+        second = WorkQueue(str(tmpdir), "second", lease_timeout=60)
+        third = WorkQueue(str(tmpdir), "third", lease_timeout=60)
+        assert first.claim("flu.json", "inputs")
+        claim = os.path.join(str(tmpdir), CLAIMS_DIR, "flu.json.inputs")
+        past = time.time() - 120
+        os.utime(claim, (past, past))
+
+        rename = os.rename
+
+        def racing_rename(src, dst):
+            monkeypatch.setattr(os, "rename", rename)
+            # another process takes the claim over between the check and the rename
+            assert third.claim("flu.json", "inputs")
+            rename(src, dst)
+
+        monkeypatch.setattr(os, "rename", racing_rename)
+        # the claim moved is a live one, it is put back
+        assert not second.claim("flu.json", "inputs")
+        with open(claim) as fp:
+            assert json.load(fp)["worker"] == "third"
+        assert not [name for name in os.listdir(os.path.dirname(claim)) if name.endswith(".stale")]
+
+    def test_lease_renewal(self, tmpdir):
+        tasks = [ModuleTask("flu.json", None, "inputs")]
+        first = WorkQueue(str(tmpdir), "first", lease_timeout=0.4, renew_interval=0.05)
+        second = WorkQueue(str(tmpdir), "second", lease_timeout=0.4)
+        run = first.run(tasks)
+        task = next(run)
+        # the claim is renewed while the module takes longer than the lease to generate
+        time.sleep(1.0)
+        assert not second.claim("flu.json", "inputs")
+        first.record(task.module_name, task.inputs, None)
+        assert list(run) == []
+
+        # a stopped process does not renew its claims
+        assert first.claim("flu.json", "other")
+        time.sleep(0.5)
+        assert second.claim("flu.json", "other")
+
+    def test_run(self, tmpdir):
+        tasks = [ModuleTask("%s.json" % name, None, "inputs") for name in ["a", "b", "c"]]
+        first = WorkQueue(str(tmpdir), "first", poll_interval=0.01)
+        second = WorkQueue(str(tmpdir), "second", poll_interval=0.01)
+        assert second.claim("b.json", "inputs")
+
+        claimed = []
+        for task in first.run(tasks):
+            claimed.append(task.module_name)
+            first.record(task.module_name, task.inputs, None)
+            if task.module_name == "c.json":
+                # the other process completes its task while this one waits for it
+                second.record("b.json", "inputs", None)
+        assert claimed == ["a.json", "c.json"]
+
+    def test_generate(self, tmpdir, generate):
+        expected = generate(tmpdir.join("single"))
+        queue_dir = str(tmpdir.join("queue"))
+        assert generate(tmpdir.join("queued"), work_queue_dir=queue_dir) == expected
+        assert tmpdir.join("queued", ".symcat_manifest.jsonl").read() == \
+            tmpdir.join("single", ".symcat_manifest.jsonl").read()
+        assert len(os.listdir(os.path.join(queue_dir, "done"))) == 2
+        # a process joining once every task is done has nothing left to generate
+        assert generate(tmpdir.join("queued"), work_queue_dir=queue_dir) == expected
+
+    def test_concurrent_processes(self, tmpdir, generate, catalog):
+        # processes joining at the same time all create the missing output directory
+        symptoms, conditions = catalog()
+        tmpdir.join("symptoms.json").write(json.dumps(symptoms))
+        tmpdir.join("conditions.json").write(json.dumps(conditions))
+        output = tmpdir.join("output")
+        command = [
+            sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"),
+            "--gen_modules", "--symptoms_json", str(tmpdir.join("symptoms.json")),
+            "--conditions_json", str(tmpdir.join("conditions.json")),
+            "--work_queue", str(tmpdir.join("queue")), "--output", str(output)
+        ]
+        processes = [subprocess.Popen(command, stderr=subprocess.PIPE) for _ in range(4)]
+        for process in processes:
+            _, error = process.communicate(timeout=60)
+            assert process.returncode == 0, error.decode("utf-8")
+        assert sorted(path.basename for path in output.join("modules").listdir("*.json")) == \
+            sorted(generate(tmpdir.join("single")).keys())
+
+    def test_directory_created_meanwhile(self, tmpdir, monkeypatch):
+        # another process creates the output directory right before this one does
+        mkdir = os.mkdir
+
+        def concurrent_mkdir(path, *args):
+            mkdir(path)
+            mkdir(path, *args)
+
+        monkeypatch.setattr(os, "mkdir", concurrent_mkdir)
+        DirectorySink(str(tmpdir.join("output")))
+        assert tmpdir.join("output").isdir()